@@ -0,0 +1,161 @@
+"""
+Adaptive scan scheduling.
+
+Every scan costs radio time: the interface leaves its channel to listen on the
+other ones, which disrupts the throughput of the connected link. Watching the
+networks at a fixed interval scans far too often in a stable environment, and
+too rarely while moving or roaming. AdaptiveScanScheduler compares every scan
+with the previous one and measures the churn: BSSes that appeared or
+disappeared and BSSes whose RSSI changed by <rssi_threshold> dB or more.
+
+ - After a scan with churn, the next scan follows after <min_interval>.
+ - After a scan without churn, the interval is multiplied by <backoff>, up to
+   <max_interval>.
+ - A signal_quality_change or roaming_end notification triggers a scan right
+   away, though never sooner than <min_interval> after the previous scan.
+
+    python pywinwifi.py --scan --adaptive 5:300
+"""
+import threading
+import time
+
+from notifications import guid_key
+
+TRIGGER_CODES = ('signal_quality_change', 'roaming_end')
+
+
+def bss_snapshot(networks):
+    """Returns the (interface GUID, BSSID) -> RSSI dict of the BSSes of <networks> (ExtWirelessNetworks)."""
+    snapshot = {}
+    for network in networks:
+        interface = getattr(network, 'interface', None)
+        key = guid_key(interface.guid_string) if interface is not None else None
+        for bss in network.bsss:
+            snapshot[(key, bss.bssid)] = bss.rssi
+    return snapshot
+
+
+def churn(previous, current, rssi_threshold=6):
+    """Returns the BSSes added, removed and changed (RSSI) between two snapshots."""
+    added = sum(1 for key in current if key not in previous)
+    removed = sum(1 for key in previous if key not in current)
+    changed = sum(1 for key, rssi in current.items()
+                  if key in previous and abs(rssi - previous[key]) >= rssi_threshold)
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+
+class AdaptiveScanScheduler(object):
+    """
+    Calls <scan> (returns the ExtWirelessNetwork list) at an adaptive interval.
+
+    :Args:
+     - scan:            (callable) Scans, returns the networks.
+     - min_interval:    (float) Seconds between scans while the environment changes.
+     - max_interval:    (float) Upper bound of the interval in a stable environment.
+     - backoff:         (float) Interval factor after a scan without churn.
+     - rssi_threshold:  (int) RSSI change (dB) counted as churn.
+     - manager:         (NotificationManager) Source of the triggering notifications.
+     - interfaces:      (list) GUIDs of the interfaces whose notifications
+                        trigger a scan, default any interface.
+    """
+    def __init__(self, scan, min_interval=5., max_interval=300., backoff=2., rssi_threshold=6, manager=None,
+                 interfaces=None):
+        if not 0 < min_interval <= max_interval:
+            raise ValueError(f'Invalid interval bounds: {min_interval}:{max_interval}')
+        self.scan = scan
+        self.min_interval = float(min_interval)
+        self.max_interval = float(max_interval)
+        self.backoff = float(backoff)
+        self.rssi_threshold = rssi_threshold
+        self.manager = manager
+        self.interfaces = interfaces
+        self.interval = self.min_interval
+        self._snapshot = None
+        self._wake_event = threading.Event()
+        self._stop_event = threading.Event()
+        self._subscription = None
+        self.scans = 0
+        self.triggered = 0  # Scans brought forward by a notification
+        self.last_churn = None
+
+    def _on_notification(self, event):
+        # Called on the notification thread
+        self._wake_event.set()
+
+    def trigger(self):
+        """Brings the next scan forward (to <min_interval> after the previous one)."""
+        self._wake_event.set()
+
+    def stop(self):
+        self._stop_event.set()
+        self._wake_event.set()
+
+    def update(self, networks):
+        """Measures the churn of <networks> against the previous scan and adapts the interval."""
+        snapshot = bss_snapshot(networks)
+        if self._snapshot is None:
+            self.last_churn = None
+            self.interval = self.min_interval  # No reference yet
+        else:
+            self.last_churn = churn(self._snapshot, snapshot, self.rssi_threshold)
+            if any(self.last_churn.values()):
+                self.interval = self.min_interval
+            else:
+                self.interval = min(self.max_interval, self.interval * self.backoff)
+        self._snapshot = snapshot
+        return self.last_churn
+
+    def _wait(self, started, end):
+        """Waits until the next scan is due, returns False when stopped or at <end> first."""
+        due = started + self.interval
+        while not self._stop_event.is_set():
+            if self._wake_event.is_set():
+                self._wake_event.clear()
+                if due > started + self.min_interval:
+                    due = started + self.min_interval  # Right away when already past
+                    self.triggered += 1
+            now = time.monotonic()
+            target = due if end is None else min(due, end)
+            if now >= target:
+                return now >= due
+            self._wake_event.wait(target - now)
+        return False
+
+    def run(self, count=None, duration=None, on_scan=None):
+        """
+        Scans <count> times (or until stopped, or for <duration> seconds),
+        calls <on_scan>(networks, churn) after every scan.
+        """
+        if self.manager is not None and self._subscription is None:
+            self._subscription = self.manager.subscribe(callback=self._on_notification, codes=TRIGGER_CODES,
+                                                        interfaces=self.interfaces)
+        end = None if duration is None else time.monotonic() + duration
+        self._stop_event.clear()
+        try:
+            while not self._stop_event.is_set():
+                started = time.monotonic()
+                networks = self.scan()
+                self.scans += 1
+                changes = self.update(networks)
+                if on_scan is not None:
+                    on_scan(networks, changes)
+                if count is not None and self.scans >= count:
+                    break
+                if not self._wait(started, end):
+                    break
+        finally:
+            self.close()
+
+    def close(self):
+        if self._subscription is not None:
+            self._subscription.close()
+            self._subscription = None
+
+    def summary(self):
+        return {
+            'scans': self.scans,
+            'triggered': self.triggered,
+            'interval': self.interval,
+            'min_interval': self.min_interval,
+            'max_interval': self.max_interval,
+        }
@@ -0,0 +1,122 @@
+"""
+Batch scripts: many commands executed by one process.
+
+Starting Python, importing the modules, detecting the locale and opening the
+handles costs more than most commands themselves. A batch script lists the
+commands in the command line syntax, one per line, and runs them in one
+process that shares its handles, caches and logger:
+
+    # demo.txt
+    --scan
+    sleep 5
+    repeat 3
+        --status -v 1
+        sleep 1
+    end
+    --connect ${SSID} ${PASSWD}
+
+    python pywinwifi.py --batch demo.txt
+
+Lines are split like a shell command line, environment variables ($VAR,
+${VAR}, and %VAR% on Windows) are expanded, text after # is a comment. Besides
+the commands, a script knows two directives:
+ - sleep SECONDS:   waits
+ - repeat N:        runs the lines up to the matching "end" N times
+
+The whole script is parsed before the first command runs, an invalid line
+raises BatchError.
+"""
+import os
+import shlex
+
+
+class BatchError(ValueError):
+    pass
+
+
+class Command(object):
+    def __init__(self, line_number, text, args):
+        self.line_number = line_number
+        self.text = text
+        self.args = args  # As parsed by the <parse> function of parse_script()
+
+
+class Sleep(object):
+    def __init__(self, line_number, seconds):
+        self.line_number = line_number
+        self.seconds = seconds
+
+
+class Repeat(object):
+    def __init__(self, line_number, count, steps):
+        self.line_number = line_number
+        self.count = count
+        self.steps = steps
+
+
+def _split(line):
+    try:
+        return shlex.split(os.path.expandvars(line), comments=True)
+    except ValueError as ex:  # e.g. No closing quotation
+        raise BatchError(str(ex))
+
+
+def _number(value, directive, convert):
+    try:
+        number = convert(value)
+    except ValueError:
+        number = -1
+    if number < 0:
+        raise BatchError(f'{directive} expects a non-negative number, not "{value}"')
+    return number
+
+
+def parse_script(lines, parse, name='<batch>'):
+    """
+    Returns the steps (Commands, Sleeps and Repeats) of the script <lines>.
+    <parse> turns the arguments of a command into its Command.args, and
+    raises an exception (any) for an invalid command.
+    """
+    root = []
+    blocks = [(None, root)]  # (Repeat, steps) of the open repeat blocks
+    for line_number, line in enumerate(lines, 1):
+        try:
+            words = _split(line)
+            if not words:
+                continue
+            steps = blocks[-1][1]
+            keyword = words[0].lower()
+            if keyword == 'sleep':
+                if len(words) != 2:
+                    raise BatchError('sleep expects one argument (seconds)')
+                steps.append(Sleep(line_number, _number(words[1], 'sleep', float)))
+            elif keyword == 'repeat':
+                if len(words) != 2:
+                    raise BatchError('repeat expects one argument (count)')
+                repeat = Repeat(line_number, _number(words[1], 'repeat', int), [])
+                steps.append(repeat)
+                blocks.append((repeat, repeat.steps))
+            elif keyword == 'end':
+                if len(words) != 1 or len(blocks) == 1:
+                    raise BatchError('end without repeat')
+                blocks.pop()
+            else:
+                steps.append(Command(line_number, shlex.join(words), parse(words)))
+        except BatchError as ex:
+            raise BatchError(f'{name}:{line_number}: {ex}') from None
+        except (Exception, SystemExit) as ex:  # argparse exits on invalid arguments (and shows why)
+            reason = '' if isinstance(ex, SystemExit) else f' ({ex})'
+            raise BatchError(f'{name}:{line_number}: invalid command: {line.strip()}{reason}') from ex
+    if len(blocks) > 1:
+        raise BatchError(f'{name}:{blocks[-1][0].line_number}: repeat without end')
+    return root
+
+
+def iterate_script(steps):
+    """Yields the Commands and Sleeps of <steps> in execution order, with the repeats unrolled."""
+    for step in steps:
+        if isinstance(step, Repeat):
+            for _ in range(step.count):
+                yield from iterate_script(step.steps)
+        else:
+            yield step
@@ -0,0 +1,63 @@
+"""
+Runs the adaptive scan scheduler (see adaptive.py) against a scripted
+simulated environment: stable, then moving (RSSI change with a
+signal_quality_change notification), then losing a network, then stable
+again. Checks that the interval backs off while nothing changes, drops to the
+minimum on churn and that the notification brings the next scan forward, and
+compares the number of scans with a fixed interval.
+"""
+import time
+
+from benchmarks.common import *
+
+import pywinwifi
+from adaptive import AdaptiveScanScheduler
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.set_defaults(networks=10, bsss=2)
+    parser.add_argument('--min-interval', type=float, default=0.05, help='minimum scan interval (seconds)')
+    parser.add_argument('--max-interval', type=float, default=0.4, help='maximum scan interval (seconds)')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    environment = setup_environment(args)
+    guid = pywinwifi.getWirelessInterfaces()[0].guid
+    low, high = args.min_interval, args.max_interval
+
+    # Scan index -> step of the script, applied after that scan
+    script = {
+        5: lambda: environment.move(guid, -10),  # Notified, the next scan is brought forward
+        7: lambda: environment.networks.pop(),  # Not notified, seen by the next scan
+    }
+    scans = []  # (time, churn, interval)
+
+    def on_scan(networks, churn):
+        scans.append((time.monotonic(), churn, scheduler.interval))
+        step = script.get(len(scans))
+        if step:
+            step()
+
+    scheduler = AdaptiveScanScheduler(pywinwifi.scan_networks, low, high, manager=pywinwifi.notification_manager)
+    start = time.monotonic()
+    scheduler.run(count=12, on_scan=on_scan)
+    duration = time.monotonic() - start
+
+    intervals = [round(interval / low) for _, _, interval in scans]
+    print(f'{len(scans)} scans in {duration:.2f} s ({scheduler.triggered} triggered), '
+          f'{int(duration / low) + 1} at the minimum interval')
+    print('intervals (x min):', intervals)
+    expected = [1, 2, 4, 8, 8,  # Stable, backing off up to the maximum
+                1, 2,  # Moved
+                1, 2, 4, 8, 8]  # Network lost, then stable again
+    expected = [min(i, round(high / low)) for i in expected]
+    assert intervals == expected, f'expected {expected}'
+    assert scans[5][1]['changed'] == args.networks * args.bsss, scans[5][1]
+    assert scans[7][1]['removed'] == args.bsss, scans[7][1]
+    assert scheduler.triggered == 1
+    assert scans[5][0] - scans[4][0] < (low + high) / 2, 'notification did not bring the scan forward'
+    assert scheduler._on_notification not in [s.callback for s in pywinwifi.notification_manager.subscriptions]
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,69 @@
+"""
+Runs a sequence of commands as one process per command (like demo.bat did)
+and as a single --batch process against the simulated backend, checks that
+both produce the same command output and reports the durations.
+"""
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+from benchmarks.common import *
+
+SCRIPT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'pywinwifi.py')
+
+
+def _commands(ssid):
+    return (
+        ['--scan'],
+        ['--scan', ssid, '-v', '1'],
+        ['--history', '-v', '1'],
+        ['--status', '-v', '1'],
+        ['--scan', '-v', '2', '--json'],
+        ['--history', '--details'],
+        ['--status'],
+    )
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.set_defaults(repeat=3, networks=20, latency=0)
+    parser.add_argument('--iterations', type=int, default=2, help='number of times the commands are run')
+    args = parser.parse_args()
+    if args.replay:
+        parser.error('--replay is not supported, the commands run in new processes')
+
+    env = dict(os.environ, PYWINWIFI_BACKEND='fake',
+               PYWINWIFI_FAKE=f'interfaces={args.interfaces},networks={args.networks},bsss={args.bsss},'
+                              f'latency={args.latency},seed={args.seed}')
+    commands = _commands('Network-002') * args.iterations
+    directory = tempfile.mkdtemp(prefix='pywinwifi-bench-')  # No logs folder: no log files
+    script = os.path.join(directory, 'commands.txt')
+    with open(script, 'w', encoding='utf-8') as f:
+        f.writelines(' '.join(command) + '\n' for command in commands)
+
+    def run(argv):
+        return subprocess.run([sys.executable, SCRIPT] + argv, cwd=directory, env=env, stdout=subprocess.PIPE,
+                              stderr=subprocess.PIPE, encoding='utf-8', check=True).stdout
+
+    def processes():
+        return [run(command) for command in commands]
+
+    def batch():
+        return run(['--batch', script, '--json'])
+
+    separate = processes()
+    lines = batch().splitlines()
+    results = [json.loads(line) for line in lines if line.startswith('{"line":')]
+    assert len(results) == len(commands) and all(r['result'] for r in results), results
+    output = [line for line in lines if not line.startswith('{"line":')]
+    assert output == ''.join(separate).splitlines(), 'outputs differ'
+
+    print_header(f'{len(commands)} commands ({describe_environment(args)})')
+    print_result('process per command', timed(processes, args.repeat, warmup=0))
+    print_result('--batch', timed(batch, args.repeat, warmup=0))
+
+
+if __name__ == '__main__':
+    main()
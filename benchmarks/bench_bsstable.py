@@ -0,0 +1,73 @@
+"""
+Decodes synthetic WLAN_BSS_LIST buffers (1k and 10k entries by default) into
+WirelessNetworkBss objects, as getWirelessNetworkBssList() does, and into a
+BssTable (NumPy structured view), checks that both agree and reports their
+durations.
+"""
+from ctypes import POINTER, addressof, c_char, cast
+
+from benchmarks.common import *
+
+import fakewifi
+from wlantypes import WLAN_BSS_LIST
+
+try:
+    import bsstable
+except ImportError:
+    bsstable = None  # NumPy is not installed
+
+
+def bss_list_buffer(entries, seed):
+    """Returns a ctypes buffer holding a WLAN_BSS_LIST of (about) <entries> entries."""
+    environment = fakewifi.FakeEnvironment(interfaces=1, networks=max(1, entries // 4), bsss=4,
+                                           latency=0, seed=seed)
+    data = environment.bss_list(environment.interfaces[0].guid)
+    return (c_char * len(data)).from_buffer_copy(data)
+
+
+def decode_objects(bss_list):
+    contents = bss_list.contents
+    entries = (contents.wlanBssEntries._type_ * contents.NumberOfItems).from_address(
+        addressof(contents.wlanBssEntries))
+    return [fakewifi.WirelessNetworkBss(entry) for entry in entries]
+
+
+def decode_table(bss_list):
+    table = bsstable.BssTable.from_bss_list(bss_list)
+    return table, table.bssid, table.rssi, table.link_quality, table.frequency, table.phy_type
+
+
+def decode_table_strings(bss_list):
+    table = bsstable.BssTable.from_bss_list(bss_list)
+    return table, table.bssid_strings(), table.phy_type_names()
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.add_argument('--entries', type=int, nargs='+', default=[1000, 10000],
+                        help='number of entries of the synthetic BSS lists')
+    args = parser.parse_args()
+    if bsstable is None:
+        print('NumPy is not installed, see requirements.txt')
+        return
+
+    print_header('WLAN_BSS_LIST decoding')
+    for entries in args.entries:
+        buffer = bss_list_buffer(entries, args.seed)
+        bss_list = cast(buffer, POINTER(WLAN_BSS_LIST))
+        objects = decode_objects(bss_list)
+        table = bsstable.BssTable.from_bss_list(bss_list)
+        assert table.bssid_strings() == [o.bssid for o in objects], 'BSSIDs differ'
+        assert table.rssi.tolist() == [o.rssi for o in objects], 'RSSIs differ'
+        assert table.phy_type_names() == [o.phy_type for o in objects], 'PHY types differ'
+        count = len(objects)
+        print_result(f'WirelessNetworkBss objects ({count})', timed(lambda: decode_objects(bss_list), args.repeat))
+        print_result(f'BssTable columns ({count})', timed(lambda: decode_table(bss_list), args.repeat))
+        print_result(f'BssTable + BSSID/PHY strings ({count})',
+                     timed(lambda: decode_table_strings(bss_list), args.repeat))
+        print_result(f'BssTable + IEs of strongest ({count})',
+                     timed(lambda: table.information_elements(int(table.rssi.argmax())), args.repeat))
+
+
+if __name__ == '__main__':
+    main()
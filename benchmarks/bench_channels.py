@@ -0,0 +1,49 @@
+"""
+Aggregates a long recording (the BSSes of <scans> scans) into the channel
+congestion report, with the vectorized (NumPy, when installed) and the plain
+list implementation, checks that both agree and reports their durations.
+"""
+from benchmarks.common import *
+
+import channels
+import pywinwifi
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.set_defaults(networks=100, latency=0)
+    parser.add_argument('--scans', type=int, default=1000, help='number of recorded scans')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    setup_environment(args)
+    bsss = []
+    for interface in pywinwifi.interface_registry.interfaces():
+        bsss.extend(pywinwifi.ExtWirelessNetworkBss.cast(b) for b in pywinwifi.getWirelessNetworkBssList(interface))
+    report = channels.ChannelReport()
+    for scan in range(args.scans):
+        for bss in bsss:
+            bss.rssi += 1 if scan % 2 else -1  # Fluctuating signal, distinct weights
+        report.add(bsss)
+
+    implementations = [('plain lists', None)]
+    if channels.numpy is not None:
+        implementations.append(('numpy', channels.numpy))
+    else:
+        print('NumPy is not installed, only the plain list aggregation is measured')
+
+    print_header(f'Channel report ({len(report)} BSS records)')
+    results = []
+    numpy = channels.numpy
+    try:
+        for name, module in implementations:
+            channels.numpy = module
+            results.append(report.to_dict())
+            print_result(name, timed(report.to_dict, args.repeat))
+    finally:
+        channels.numpy = numpy
+    for result in results[1:]:
+        assert result == results[0], 'reports differ'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""Times every CLI command of pywinwifi against the simulated backend."""
+import sys
+
+from benchmarks.common import *
+
+import pywinwifi
+
+
+def _commands(ssid):
+    return (
+        ['--status'],
+        ['--status', '-v', '1'],
+        ['--scan'],
+        ['--scan', ssid],
+        ['--scan', '-v', '1'],
+        ['--scan', '-v', '2'],
+        ['--scan', '-v', '2', '--json'],
+        ['--scan', '--cached', '-v', '2'],
+        ['--history'],
+        ['--history', '-v', '1'],
+        ['--history', '-v', '1', '--json'],
+        ['--connect', ssid, 'password'],
+        ['--disconnect'],
+        ['--forget', ssid],
+    )
+
+
+def run_command(argv):
+    sys.argv = ['pywinwifi.py'] + list(argv)
+    with captured_output():
+        pywinwifi.main()
+
+
+def main():
+    parser = create_parser(__doc__)
+    args = parser.parse_args()
+    setup_logger(args.log)
+
+    setup_environment(args)
+    interface = pywinwifi.getWirelessInterfaces()[0]
+    ssid = pywinwifi.getWirelessAvailableNetworkList(interface)[-1].ssid.decode('utf-8')
+
+    argv = sys.argv
+    print_header(f'CLI ({describe_environment(args)})')
+    try:
+        for command in _commands(ssid):
+            try:
+                durations = timed(lambda: run_command(command), repeat=args.repeat)
+            except Exception as ex:
+                durations = ex
+            print_result(' '.join(command), durations)
+    finally:
+        sys.argv = argv
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,84 @@
+"""
+Fires synthetic notifications straight into the notification manager with
+a mix of filtered subscribers and reports the dispatch rate, the slowest
+dispatch (time the native callback thread is held) and the drop counters.
+Checks that a blocked callback subscriber does not hold up the dispatch or
+the other callback subscribers.
+"""
+import threading
+import time
+
+from benchmarks.common import *
+
+from fakewifi import ACMConnectionNotificationData, WlanEvent
+from notifications import NotificationManager
+from wlantypes import GUID, WLAN_CONNECTION_NOTIFICATION_DATA
+
+
+def synthetic_events(count, interfaces=4):
+    guids = [GUID('%08x-0000-4000-8000-%012x' % (0x5eed0000, i)) for i in range(interfaces)]
+    codes = ('wlan_notification_acm_scan_complete', 'wlan_notification_acm_connection_start',
+             'wlan_notification_acm_connection_complete', 'wlan_notification_acm_disconnected')
+    raw_data = WLAN_CONNECTION_NOTIFICATION_DATA()
+    raw_data.dot11BssType = 1
+    data = ACMConnectionNotificationData(raw_data)
+    return [WlanEvent(None, 'WLAN_NOTIFICATION_SOURCE_ACM', codes[i % len(codes)], guids[i % interfaces],
+                      data if i % len(codes) else None)
+            for i in range(count)]
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.add_argument('--events', type=int, default=100000, help='number of synthetic notifications')
+    parser.add_argument('--subscribers', type=int, default=16, help='number of (queued) subscribers')
+    parser.add_argument('--maxsize', type=int, default=4096, help='buffer size of each subscriber')
+    args = parser.parse_args()
+    setup_logger(args.log)
+
+    registrations = []
+    manager = NotificationManager(lambda callback: registrations.append(callback) or callback,
+                                        lambda obj: registrations.remove(obj))
+    events = synthetic_events(args.events)
+    guids = sorted({str(e.interfaceGuid) for e in events})
+    subscriptions = []
+    for i in range(args.subscribers):
+        filters = ({}, {'codes': ['scan_complete']}, {'interfaces': [guids[i % len(guids)]]},
+                   {'sources': ['MSM']})[i % 4]
+        subscriptions.append(manager.subscribe(maxsize=args.maxsize, drop_oldest=bool(i % 2), **filters))
+    counted = []
+    subscriptions.append(manager.subscribe(callback=counted.append, codes=['disconnected']))
+
+    slowest = 0.
+    start = time.perf_counter()
+    for event in events:
+        t = time.perf_counter()
+        manager.dispatch(event)
+        slowest = max(slowest, time.perf_counter() - t)
+    duration = time.perf_counter() - start
+
+    delivered = sum(s.delivered for s in subscriptions)
+    print(f'Dispatched {manager.dispatched} events to {len(subscriptions)} subscribers '
+          f'in {duration * 1000:.1f} ms ({manager.dispatched / duration:.0f} events/s, '
+          f'slowest {slowest * 1e6:.1f} us)')
+    print(f'Delivered {delivered}, dropped {manager.dropped} (buffers of {args.maxsize}), '
+          f'callback errors {manager.errors}')
+
+    # A blocked callback only holds up its own subscription
+    release = threading.Event()
+    blocked = manager.subscribe(callback=lambda event: release.wait(), maxsize=16)
+    received = threading.Semaphore(0)
+    other = manager.subscribe(callback=lambda event: received.release(), codes=['scan_complete'])
+    start = time.perf_counter()
+    for event in events[:1000]:
+        manager.dispatch(event)
+    duration = time.perf_counter() - start
+    assert all(received.acquire(timeout=5) for _ in range(250)), 'callback held up by a blocked callback'
+    print(f'Dispatched 1000 events with a blocked callback subscriber in {duration * 1000:.1f} ms, '
+          f'{blocked.dropped} dropped by it, {other.delivered} delivered to another callback')
+    release.set()
+    manager.close()
+    assert not registrations, 'native registration left after closing all subscriptions'
+
+
+if __name__ == '__main__':
+    main()
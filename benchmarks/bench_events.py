@@ -0,0 +1,66 @@
+"""
+Pushes simulated notifications through the --events stream and reports the
+throughput, the time spent in the notification callback and the number of
+dropped events, with a fast and with a slow output stream.
+"""
+import io
+import threading
+import time
+
+from benchmarks.common import *
+
+import pywinwifi
+from events import EventStream
+from wlantypes import WLAN_NOTIFICATION_ACM_ENUM, WLAN_NOTIFICATION_SOURCE_ACM
+
+
+class SlowOutput(io.StringIO):
+    def __init__(self, delay):
+        super().__init__()
+        self.delay = delay
+
+    def flush(self):
+        time.sleep(self.delay)
+
+
+def run(environment, events, output, maxsize):
+    stream = EventStream(pywinwifi.notification_manager, output=output, maxsize=maxsize,
+                         encode=pywinwifi._to_json).start()
+    guid = environment.interfaces[0].guid
+    code = WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_scan_complete
+    callback_time = []
+
+    def produce():
+        for _ in range(events):
+            start = time.perf_counter()
+            environment.deliver(WLAN_NOTIFICATION_SOURCE_ACM, code, guid)
+            callback_time.append(time.perf_counter() - start)
+        stream.stop()
+
+    producer = threading.Thread(target=produce)
+    start = time.perf_counter()
+    producer.start()
+    stream.run()
+    producer.join()
+    duration = time.perf_counter() - start
+    return stream, duration, max(callback_time)
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.add_argument('--events', type=int, default=20000, help='number of notifications')
+    parser.add_argument('--maxsize', type=int, default=1024, help='event buffer size')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    environment = setup_environment(args)
+
+    print(f'{"Output":<20} {"events/s":>10} {"written":>9} {"dropped":>9} {"max callback (ms)":>18}')
+    print('-' * 70)
+    for name, output in (('memory', io.StringIO()), ('slow (1 ms/line)', SlowOutput(0.001))):
+        stream, duration, max_callback = run(environment, args.events, output, args.maxsize)
+        print(f'{name:<20} {stream.received / duration:>10.0f} {stream.written:>9} '
+              f'{stream.dropped:>9} {max_callback * 1000:>18.3f}')
+
+
+if __name__ == '__main__':
+    main()
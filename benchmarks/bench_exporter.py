@@ -0,0 +1,37 @@
+"""Times the metrics collection and the scrapes of the Prometheus exporter."""
+import urllib.request
+
+from benchmarks.common import *
+
+import pywinwifi
+from exporter import MetricsExporter, WifiCollector
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.add_argument('--scrapes', type=int, default=100, help='number of scrapes per timed run')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    setup_environment(args)
+
+    exporter = MetricsExporter(WifiCollector(pywinwifi), interval=3600, port=0).start()
+    url = f'http://{exporter.address[0]}:{exporter.address[1]}/metrics'
+
+    def scrape():
+        for _ in range(args.scrapes):
+            with urllib.request.urlopen(url) as response:
+                response.read()
+
+    print_header(f'Exporter ({describe_environment(args)})')
+    try:
+        for name, func in (('refresh (scan + collect + render)', exporter.refresh),
+                           (f'{args.scrapes} scrapes (cached)', scrape)):
+            with captured_output():
+                durations = timed(func, repeat=args.repeat)
+            print_result(name, durations)
+    finally:
+        exporter.stop()
+
+
+if __name__ == '__main__':
+    main()
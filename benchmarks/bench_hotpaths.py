@@ -0,0 +1,55 @@
+"""Times the individual hot paths of pywinwifi against the simulated backend."""
+from benchmarks.common import *
+
+import pywinwifi
+from logger import Logger
+from profiler import Profiler
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.add_argument('--profile', action='store_true',
+                        help='run with the profiler installed and print its timing tree')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    setup_environment(args)
+
+    interface = pywinwifi.getWirelessInterfaces()[0]
+
+    def decode_bss_list():
+        return [pywinwifi.ExtWirelessNetworkBss.cast(b) for b in pywinwifi.getWirelessNetworkBssList(interface)]
+
+    benchmarks = (
+        ('getWirelessInterfaces', pywinwifi.getWirelessInterfaces),
+        ('getWirelessAvailableNetworkList', lambda: pywinwifi.getWirelessAvailableNetworkList(interface)),
+        ('getWirelessNetworkBssList', lambda: pywinwifi.getWirelessNetworkBssList(interface)),
+        ('BSS list + IE/channel decode', decode_bss_list),
+        ('scan_networks', pywinwifi.scan_networks),
+        ('scan_networks (cached)', lambda: pywinwifi.scan_networks(cached=True)),
+        ('_get_parsed_ap_history', pywinwifi._get_parsed_ap_history),
+        ('do_get_ap_history (v1, json)', lambda: pywinwifi.do_get_ap_history(1, json=True, log=False)),
+        ('get_ap_details (cached)', pywinwifi.get_ap_details),
+        ('get_ap_details (uncached)', lambda: pywinwifi.profile_parser.clear() or pywinwifi.get_ap_details()),
+        ('Logger.info x100', lambda: [Logger.info('benchmark') for _ in range(100)]),
+    )
+
+    if args.profile:
+        pywinwifi._install_profiler()
+
+    print_header(f'Hot paths ({describe_environment(args)})')
+    for name, func in benchmarks:
+        try:
+            with captured_output():
+                durations = timed(func, repeat=args.repeat)
+        except Exception as ex:
+            durations = ex
+        print_result(name, durations)
+
+    if args.profile:
+        Profiler.disable()
+        print()
+        print(Profiler.report())
+
+
+if __name__ == '__main__':
+    main()
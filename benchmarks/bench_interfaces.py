@@ -0,0 +1,71 @@
+"""
+Scans (and reports the status) on a simulated multi-adapter environment,
+once on every interface and once targeting a single interface with
+--interface, and reports the durations. Checks that only the selected
+interface issues scans and that its results only list that interface, and
+that an arrival/removal during an enumeration of the interface registry is
+not lost.
+"""
+from benchmarks.common import *
+
+import pywinwifi
+from interfaces import InterfaceRegistry
+
+
+def check_invalidation():
+    registry = None
+    enumerations = {'interfaces': 0, 'names': 0}
+
+    def enumerating(kind, result):
+        def enumerate_():
+            enumerations[kind] += 1
+            if enumerations[kind] == 1:
+                registry.invalidate()  # Arrival notified while enumerating
+            return result()
+        return enumerate_
+
+    registry = InterfaceRegistry(enumerating('interfaces', pywinwifi.getWirelessInterfaces),
+                                 enumerating('names', list))
+    for _ in range(3):
+        registry.interfaces()
+        registry.names()
+    assert enumerations == {'interfaces': 2, 'names': 2}, f'stale enumeration cached: {enumerations}'
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.set_defaults(interfaces=4, networks=20, latency=0.02)
+    args = parser.parse_args()
+    if args.interfaces < 2:
+        parser.error('--interfaces must be at least 2')
+    setup_logger(args.log)
+    setup_environment(args)
+    check_invalidation()
+    selected = pywinwifi.interface_registry.get(args.interfaces - 1)
+
+    scanned = []
+    issue_scan = pywinwifi._wlan_issue_scan
+
+    def counting_scan(interface, timeout, ssid):
+        scanned.append(pywinwifi.guid_key(interface.guid_string))
+        return issue_scan(interface, timeout, ssid)
+
+    pywinwifi._wlan_issue_scan = counting_scan
+    networks = pywinwifi.scan_networks(interface=selected)
+    assert set(scanned) == {pywinwifi.guid_key(selected.guid_string)}, scanned
+    assert networks and all(n.interface is selected for n in networks)
+    with captured_output() as output:
+        pywinwifi.do_get_connected_ap(json=True, interface=selected)
+    assert len(output.getvalue().splitlines()) == 1, output.getvalue()
+
+    print_header(f'Scans ({describe_environment(args)}, scan latency {args.latency * 1000:.0f} ms)')
+    print_result('every interface', timed(lambda: pywinwifi.scan_networks(), args.repeat))
+    print_result('--interface', timed(lambda: pywinwifi.scan_networks(interface=selected), args.repeat))
+    with captured_output():
+        every = timed(lambda: pywinwifi.do_get_connected_ap(json=True), args.repeat)
+        single = timed(lambda: pywinwifi.do_get_connected_ap(json=True, interface=selected), args.repeat)
+    print_result('status, every interface', every)
+    print_result('status, --interface', single)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Times the scan result formatting per verbosity level and JSON encoder, and
+checks that the encoders produce the same output.
+"""
+from benchmarks.common import *
+
+import pywinwifi
+
+
+def main():
+    parser = create_parser(__doc__)
+    args = parser.parse_args()
+    setup_logger(args.log)
+    setup_environment(args)
+
+    networks = pywinwifi.scan_networks()
+    # Time the formatting only, not the scan itself
+    pywinwifi.scan_networks = lambda ssid=None, **kwargs: networks
+    pywinwifi._get_parsed_ap_history = lambda interface=None: {}
+
+    encoders = [('json', None)]
+    if pywinwifi.orjson is not None:
+        encoders.append(('orjson', pywinwifi.orjson))
+
+    outputs = set()
+    for encoder, module in encoders:
+        pywinwifi.orjson = module
+        with captured_output() as output:
+            pywinwifi.do_scan_networks(None, 2, json=True)
+        outputs.add(output.getvalue())
+    assert len(outputs) == 1, 'the JSON encoders produce different output'
+
+    print_header(f'Scan output ({describe_environment(args)})')
+    for encoder, module in encoders:
+        pywinwifi.orjson = module
+        for verbosity in range(3):
+            for as_json in (False, True):
+                name = f'{encoder}: -v {verbosity}{" --json" if as_json else ""}'
+                with captured_output():
+                    durations = timed(lambda: pywinwifi.do_scan_networks(None, verbosity, json=as_json),
+                                      repeat=args.repeat)
+                print_result(name, durations)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+"""
+Runs netsh commands through a persistent session pool (see
+hotfixes/winwifi/session.py) and as one process per command, against a
+stand-in shell script emulating netsh (netsh_standin.sh), checks that both
+return the same output, that a hung command times out and restarts the
+session, that an abandoned response does not desynchronize the session, that
+the failure of a configuration command is detected from its response and
+that concurrent callers get their own responses, and reports the durations.
+"""
+import os
+import subprocess
+import threading
+import time
+
+from benchmarks.common import *
+
+from hotfixes.winwifi.session import NetshPool, NetshSession
+
+STANDIN = ['sh', os.path.join(os.path.dirname(__file__), 'netsh_standin.sh')]
+
+
+def run_process(args, timeout=3):
+    cp = subprocess.run(STANDIN + args, stdin=subprocess.DEVNULL, stdout=subprocess.PIPE, timeout=timeout,
+                        encoding='utf-8', check=True)
+    return cp.stdout
+
+
+def check_session(pool):
+    for args in (['wlan', 'show', 'interfaces'], ['wlan', 'show', 'profiles']):
+        assert pool.run(args).stdout.strip() == run_process(args).strip(), f'outputs differ: {args}'
+    # Arguments with spaces are quoted
+    assert 'name="My AP"' in pool.run(['wlan', 'connect', 'name=My AP']).stdout
+
+    # A hung command times out and kills the session, the next command restarts it
+    start = time.monotonic()
+    try:
+        pool.run(['sleep', '5'], timeout=0.3)
+        raise AssertionError('no timeout')
+    except subprocess.TimeoutExpired:
+        pass
+    assert time.monotonic() - start < 2, 'timeout not enforced'
+    assert 'Stand-in' in pool.run(['wlan', 'show', 'interfaces']).stdout
+    assert pool.stats()['restarts'] == 1, pool.stats()
+
+    # A response read partially is skipped, the session stays in sync
+    lines = pool.lines(['wlan', 'show', 'profiles'])
+    next(lines)
+    lines.close()
+    assert 'Stand-in' in pool.run(['wlan', 'show', 'interfaces']).stdout
+    assert pool.stats()['restarts'] == 1, 'session restarted after an abandoned response'
+
+    # Configuration commands are checked by their success line ('' for none, a tuple for several)
+    pool.run(['wlan', 'connect', 'name=My AP'], expect='connection request was completed successfully')
+    for path in ('profile.xml', 'existing.xml'):
+        pool.run(['wlan', 'add', 'profile', f'filename={path}'],
+                 expect=('is added on interface', 'is updated on interface'))
+    pool.run(['interface', 'set', 'interface', 'name=Wi-Fi', 'admin=enabled'], expect='')
+    for args, expect in ((['wlan', 'delete', 'profile', 'My AP'], 'is deleted from interface'),
+                         (['wlan', 'show', 'interfaces'], '')):
+        try:
+            pool.run(args, expect=expect)
+            raise AssertionError(f'failure not detected: {args}')
+        except subprocess.CalledProcessError as e:
+            assert e.returncode == 1 and e.output.strip(), e
+    assert 'Stand-in' in pool.run(['wlan', 'show', 'interfaces']).stdout
+
+
+def check_concurrency(pool, threads=8, commands=50):
+    errors = []
+
+    def worker(index):
+        for i in range(commands):
+            probe = f'probe-{index}-{i}'
+            if probe not in pool.run([probe]).stdout:
+                errors.append(probe)
+    workers = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    assert not errors, f'{len(errors)} mismatched responses'
+    assert pool.stats()['sessions'] <= pool.size
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.add_argument('--commands', type=int, default=50, help='number of commands per timed run')
+    parser.add_argument('--startup', type=float, default=0.05,
+                        help='emulated start-up time (seconds) of netsh, 0.05-0.2 on Windows')
+    parser.add_argument('--sessions', type=int, default=2, help='size of the session pool')
+    args = parser.parse_args()
+    os.environ['NETSH_STARTUP'] = str(args.startup)
+
+    pool = NetshPool(size=args.sessions, command=STANDIN, encoding='utf-8')
+    try:
+        check_session(pool)
+        check_concurrency(pool)
+
+        command = ['wlan', 'show', 'interfaces']
+        print_header(f'netsh x{args.commands} (start-up {args.startup * 1000:.0f} ms)')
+        print_result('process per command', timed(lambda: [run_process(command) for _ in range(args.commands)],
+                                                  args.repeat))
+        print_result('session pool', timed(lambda: [pool.run(command) for _ in range(args.commands)],
+                                           args.repeat))
+        print(pool.stats())
+    finally:
+        pool.close()
+    assert not pool.stats()['sessions']
+
+    # A single session outside of a pool, closed gracefully
+    session = NetshSession(STANDIN, encoding='utf-8')
+    session.run(command)
+    process = session.process
+    session.close()
+    assert process.returncode == 0, 'not exited gracefully'
+
+
+if __name__ == '__main__':
+    main()
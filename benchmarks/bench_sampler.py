@@ -0,0 +1,72 @@
+"""
+Samples the connection as fast as possible with the connection sampler and,
+for comparison, with queryInterface() calls, and reports the samples per
+second, the native buffers allocated per sample and the Python memory blocks
+still allocated per sample afterwards (leaks).
+"""
+import sys
+import time
+
+from benchmarks.common import *
+
+import fakewifi
+import pywinwifi
+from sampler import ConnectionSampler
+
+
+def measure(func, samples):
+    """Returns (samples/s, native allocations/sample, leaked blocks/sample) of <samples> calls of <func>."""
+    allocations = [0]
+    allocate = fakewifi._allocate
+
+    def counting_allocate(data, typ):
+        allocations[0] += 1
+        return allocate(data, typ)
+
+    fakewifi._allocate = counting_allocate
+    try:
+        func(1)  # Warm up
+        allocations[0] = 0
+        blocks = sys.getallocatedblocks()
+        start = time.perf_counter()
+        func(samples)
+        duration = time.perf_counter() - start
+        leaked = sys.getallocatedblocks() - blocks
+    finally:
+        fakewifi._allocate = allocate
+    return samples / duration, allocations[0] / samples, leaked / samples
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.add_argument('--samples', type=int, default=20000, help='number of samples per run')
+    parser.add_argument('--capacity', type=int, default=4096, help='ring buffer size of the sampler')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    setup_environment(args)
+    interface = pywinwifi._wlan_get_interfaces('connected')[0]
+
+    sampler = ConnectionSampler(pywinwifi, interface, rate=0, capacity=args.capacity)
+
+    def sample(count):
+        with sampler:
+            for _ in range(count):
+                sampler.sample()
+
+    def query(count):
+        # Same fields as a sample: connection attributes and RSSI
+        for _ in range(count):
+            pywinwifi.queryInterface(interface, 'current_connection')
+            pywinwifi.queryInterface(interface, 'rssi')
+
+    print(f'{"Connection sampling (" + describe_environment(args) + ")":<40} '
+          f'{"samples/s":>10} {"native/s.":>10} {"leak/s.":>10}')
+    print('-' * 73)
+    for name, func in (('ConnectionSampler.sample', sample), ('queryInterface (connection + rssi)', query)):
+        rate, allocations, leaked = measure(func, args.samples)
+        print(f'{name:<40} {rate:>10.0f} {allocations:>10.2f} {leaked:>10.3f}')
+    assert sampler.count == args.samples + 1 and not sampler.failed, 'sampling failed'
+
+
+if __name__ == '__main__':
+    main()
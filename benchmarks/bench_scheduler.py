@@ -0,0 +1,81 @@
+"""
+Runs commands through the fixed-rate scheduler (see scheduler.py) and through
+a sleep-after-run loop (the former --repeat/--interval loop) against the
+simulated backend, and reports the drift of their start times. Checks that
+the scheduled start times do not drift, that an overrunning job skips its
+missed runs and reports them, and that several jobs keep their own periods.
+"""
+import time
+
+from benchmarks.common import *
+
+import pywinwifi
+from scheduler import FixedRateScheduler
+
+
+def drift(starts, period):
+    """Returns the lag of the last start time behind its ideal time (seconds)."""
+    return starts[-1] - (starts[0] + (len(starts) - 1) * period)
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.set_defaults(networks=20, latency=0.03)
+    parser.add_argument('--period', type=float, default=0.1, help='period of the scans (seconds)')
+    parser.add_argument('--runs', type=int, default=20, help='number of scans')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    setup_environment(args)
+
+    def scan():
+        starts.append(time.monotonic())
+        pywinwifi.scan_networks()
+
+    # Sleep after every run: the period is the runtime plus the interval
+    starts = []
+    for _ in range(args.runs):
+        scan()
+        time.sleep(args.period)
+    sleeping = drift(starts, args.period)
+
+    starts = []
+    scheduler = FixedRateScheduler()
+    scheduler.add('scan', args.period, scan, count=args.runs)
+    scheduler.run()
+    scheduled = drift(starts, args.period)
+    lags = [start - (starts[0] + i * args.period) for i, start in enumerate(starts)]
+
+    print(f'{args.runs} scans every {args.period * 1000:.0f} ms (scan latency {args.latency * 1000:.0f} ms)')
+    print(f'{"sleep after run":<40} drift {sleeping * 1000:8.1f} ms')
+    print(f'{"fixed rate":<40} drift {scheduled * 1000:8.1f} ms, max lag {max(lags) * 1000:.1f} ms')
+    assert sleeping > (args.runs - 1) * args.latency * 0.9, 'expected the sleeping loop to drift'
+    assert max(lags) < args.period / 2, 'scheduled scans drift'
+
+    # An overrunning job skips its missed runs
+    overruns = []
+    scheduler = FixedRateScheduler(on_overrun=lambda job, missed: overruns.append(missed))
+    job = scheduler.add('slow', args.period, lambda: time.sleep(args.period * 2.5), count=3)
+    scheduler.run()
+    print(f'{"overrunning job":<40} {job.overruns} overruns, {job.skipped} runs skipped')
+    assert job.overruns == 2 and overruns == [2, 2], overruns
+
+    # Several jobs, each on its own period, sharing the process
+    runs = {'status': [], 'scan': [], 'history': []}
+    scheduler = FixedRateScheduler()
+    scheduler.add('status', args.period / 2, lambda: runs['status'].append(pywinwifi.get_connected_ap()))
+    scheduler.add('scan', args.period * 2, lambda: runs['scan'].append(pywinwifi.scan_networks()))
+    scheduler.add('history', args.period * 5, lambda: runs['history'].append(pywinwifi._get_parsed_ap_history()))
+    duration = args.period * 10
+    scheduler.run(duration=duration)
+    stats = scheduler.stats()
+    for name, job_stats in stats.items():
+        print(f'{name:<40} {job_stats["runs"]} runs every {job_stats["period"] * 1000:.0f} ms, '
+              f'max {job_stats["max_late"] * 1000:.1f} ms late')
+    for job in scheduler.jobs:
+        expected = round(duration / job.period)
+        assert abs(job.runs - expected) <= 1, f'{job.name}: {job.runs} runs, expected {expected}'
+        assert len(runs[job.name]) == job.runs and not job.errors
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""
+Scores the candidates of an SSID with the vectorized (NumPy, when installed)
+and the plain list implementation of the AP selection, checks that both
+select the same BSS and reports their durations.
+"""
+from benchmarks.common import *
+
+import pywinwifi
+import selection
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.set_defaults(networks=500, bsss=8, latency=0)
+    parser.add_argument('--ssid', default='Network-001', help='SSID to select a BSS of')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    setup_environment(args)
+    networks = pywinwifi.scan_networks()
+    # The same SSID on every network, every BSS is a candidate
+    ssid = args.ssid
+    for network in networks:
+        network.ssid = ssid
+
+    implementations = [('plain lists', None)]
+    if selection.numpy is not None:
+        implementations.append(('numpy', selection.numpy))
+    else:
+        print('NumPy is not installed, only the plain list scoring is measured')
+
+    print_header(f'AP selection ({describe_environment(args)})')
+    results = []
+    numpy = selection.numpy
+    try:
+        for name, module in implementations:
+            selection.numpy = module
+            results.append(selection.select_ap(networks, ssid).candidates())
+            print_result(name, timed(lambda: selection.select_ap(networks, ssid), args.repeat))
+    finally:
+        selection.numpy = numpy
+    for candidates in results[1:]:
+        assert [c['bssid'] for c in candidates[:10]] == [c['bssid'] for c in results[0][:10]], 'selections differ'
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""
+Shared helpers of the benchmark suite.
+
+Benchmarks run against the simulated backend (see fakewifi.py), so they can run
+on any platform. Run them from the repository root, e.g.:
+    python -m benchmarks.bench_cli --networks 100 --bsss 4
+
+or replay a capture of a real environment (see capture.py) with --replay:
+    python -m benchmarks.bench_hotpaths --replay office.jsonl.gz --replay-speed 0
+"""
+import argparse
+import contextlib
+import io
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('PYWINWIFI_BACKEND', 'fake')
+
+
+def create_parser(description=None):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument('--interfaces', type=int, default=1, help='number of simulated interfaces')
+    parser.add_argument('--networks', type=int, default=50, help='number of simulated networks')
+    parser.add_argument('--bsss', type=int, default=3, help='number of BSSes per network')
+    parser.add_argument('--latency', type=float, default=0.01, help='simulated scan/notification latency')
+    parser.add_argument('--seed', type=int, default=0, help='seed of the simulated environment')
+    parser.add_argument('--repeat', type=int, default=5, help='number of timed runs per benchmark')
+    parser.add_argument('--log', action='store_true', help='enable (temporary) file logging')
+    parser.add_argument('--replay', metavar='FILE', help='replay a capture instead of a generated environment')
+    parser.add_argument('--replay-speed', type=float, default=0,
+                        help='replay speed factor of the capture (0 replays without delays)')
+    return parser
+
+
+def setup_environment(args):
+    """Installs a fresh simulated environment based on the parsed <args>."""
+    import fakewifi
+    if args.replay:
+        from capture import ReplayEnvironment
+        return fakewifi.set_environment(ReplayEnvironment.load(args.replay, speed=args.replay_speed))
+    return fakewifi.set_environment(fakewifi.FakeEnvironment(interfaces=args.interfaces,
+                                                             networks=args.networks,
+                                                             bsss=args.bsss,
+                                                             latency=args.latency,
+                                                             seed=args.seed))
+
+
+def describe_environment(args):
+    if args.replay:
+        return f'replay of {os.path.basename(args.replay)}'
+    return f'{args.interfaces} interfaces, {args.networks}x{args.bsss} BSSes'
+
+
+def setup_logger(enabled):
+    from logger import Logger
+    if not enabled:
+        Logger.disable()
+        return None
+    directory = tempfile.mkdtemp(prefix='pywinwifi-bench-')
+    Logger._configure_logger(directory=directory, filename='bench.log', console=None, force=True)
+    return directory
+
+
+@contextlib.contextmanager
+def captured_output():
+    stdout, stderr = sys.stdout, sys.stderr
+    sys.stdout, sys.stderr = io.StringIO(), io.StringIO()
+    try:
+        yield sys.stdout
+    finally:
+        sys.stdout, sys.stderr = stdout, stderr
+
+
+def timed(func, repeat=5, warmup=1):
+    """Returns the durations (seconds) of <repeat> calls of <func>."""
+    for _ in range(warmup):
+        func()
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        durations.append(time.perf_counter() - start)
+    return durations
+
+
+def print_header(title):
+    print(f'{title:<40} {"min (ms)":>10} {"median":>10} {"max":>10}')
+    print('-' * 73)
+
+
+def print_result(name, durations):
+    if isinstance(durations, Exception):
+        # e.g. a command missing from a replayed capture
+        print(f'{name:<40} {"failed: " + type(durations).__name__:>32}')
+        return
+    durations = [d * 1000 for d in durations]
+    print(f'{name:<40} {min(durations):>10.2f} {statistics.median(durations):>10.2f} {max(durations):>10.2f}')
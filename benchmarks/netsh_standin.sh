@@ -0,0 +1,76 @@
+#!/bin/sh
+# Stand-in for netsh on platforms without it (see bench_netsh_session.py).
+#
+# With arguments it runs one command and exits, like "netsh wlan show
+# interfaces". Without arguments it is interactive: it prints the "netsh>"
+# prompt (without line break), reads a command per line from stdin and
+# answers an unknown command with "The following command was not found:
+# <command>.", which is what the sentinels of hotfixes/winwifi/session.py
+# rely on. The configuration commands answer as netsh does on success (the
+# profile of "wlan add profile filename=existing.xml" is updated), except
+# "wlan delete profile", which fails as for an unknown profile. "sleep
+# <seconds>" emulates a hung command. NETSH_STARTUP (seconds) emulates the
+# start-up cost of netsh (loading its helpers).
+
+sleep "${NETSH_STARTUP:-0}"
+
+respond() {
+    case "$1" in
+        'wlan show interfaces')
+            printf '\nThere is 1 interface on the system:\n\n'
+            printf '    Name                   : Wi-Fi\n'
+            printf '    Description            : Stand-in Wireless Adapter\n'
+            printf '    GUID                   : 00000000-0000-0000-0000-000000000001\n'
+            printf '    State                  : disconnected\n'
+            printf '    Radio status           : Hardware On\n'
+            printf '                             Software On\n\n'
+            ;;
+        'wlan show profiles')
+            printf '\nProfiles on interface Wi-Fi:\n\n'
+            printf 'Group policy profiles (read only)\n---------------------------------\n    <None>\n\n'
+            printf 'User profiles\n-------------\n'
+            for i in 1 2 3 4 5 6 7 8; do
+                printf '    All User Profile     : Network-00%s\n' "$i"
+            done
+            printf '\n'
+            ;;
+        'wlan connect '*)
+            printf 'Connection request was completed successfully (%s).\n' "${1#wlan connect }"
+            ;;
+        'wlan add profile filename=existing.xml'*)
+            printf 'Profile Network-001 is updated on interface Wi-Fi.\n'
+            ;;
+        'wlan add profile '*)
+            printf 'Profile Network-001 is added on interface Wi-Fi.\n'
+            ;;
+        'wlan delete profile '*)
+            printf 'Profile "%s" is not found on any interface.\n' "${1#wlan delete profile }"
+            ;;
+        'interface set interface '*)
+            ;;
+        'sleep '*)
+            sleep "${1#sleep }"
+            ;;
+        '')
+            ;;
+        *)
+            printf 'The following command was not found: %s.\n' "$1"
+            ;;
+    esac
+}
+
+if [ $# -gt 0 ]; then
+    respond "$*"
+    exit 0
+fi
+
+printf 'netsh>'
+while IFS= read -r line; do
+    case "$line" in
+        exit|bye|quit)
+            exit 0
+            ;;
+    esac
+    respond "$line"
+    printf 'netsh>'
+done
@@ -0,0 +1,78 @@
+"""
+Runs a large number of WlanApi backed operations (interface, BSS, network and
+profile lists, interface queries, profile details, failing calls) against the
+simulated backend and checks that every buffer returned by the WlanApi has
+been freed and every handle closed afterwards (see allocation_stats()), and
+that the number of simulated allocations does not grow.
+"""
+import time
+
+from benchmarks.common import *
+
+import fakewifi
+import pywinwifi
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.set_defaults(networks=10, latency=0)
+    parser.add_argument('--operations', type=int, default=100000, help='number of operations')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    environment = setup_environment(args)
+    interface = pywinwifi.getWirelessInterfaces()[0]
+    profile_name = environment.profiles()[0]
+
+    def failing(func, *args):
+        def call():
+            try:
+                func(*args)
+            except Exception:
+                pass  # The handle must be closed anyway
+        return call
+
+    operations = [
+        pywinwifi.getWirelessInterfaces,
+        lambda: pywinwifi.getWirelessNetworkBssList(interface),
+        lambda: pywinwifi.getWirelessAvailableNetworkList(interface),
+        lambda: pywinwifi.queryInterface(interface, 'interface_state'),
+        lambda: pywinwifi.queryInterface(interface, 'current_connection'),
+        lambda: pywinwifi.getWirelessProfiles(interface),
+        pywinwifi.get_ap_details,
+        lambda: pywinwifi.getWirelessProfileXML(interface, profile_name),
+        failing(pywinwifi.getWirelessProfileXML, interface, 'No such profile'),
+        failing(pywinwifi.deleteProfile, interface, 'No such profile'),
+    ]
+    try:
+        import bsstable  # NumPy
+        operations.append(lambda: pywinwifi._wlan_get_bss_table(interface))
+    except ImportError:
+        pass
+
+    for operation in operations:
+        operation()  # Long lived handles (e.g. of the notification manager) are opened here
+    before = pywinwifi.allocation_stats()
+    start = time.perf_counter()
+    for i in range(args.operations):
+        operations[i % len(operations)]()
+        if i == args.operations // 2:
+            halfway = len(fakewifi._allocations)
+    duration = time.perf_counter() - start
+    stats = pywinwifi.allocation_stats()
+
+    allocations = stats['allocations'] - before['allocations']
+    handles = stats['handles_opened'] - before['handles_opened']
+    print(f'{args.operations} operations in {duration * 1000:.1f} ms '
+          f'({duration / args.operations * 1e6:.1f} us per operation)')
+    print(f'{allocations} allocations, {handles} handles, {stats["outstanding"]} outstanding allocations, '
+          f'{stats["open_handles"]} open handles')
+
+    assert allocations and handles, 'no native allocation made'
+    assert stats['outstanding'] == 0, 'allocations not freed'
+    assert not fakewifi._allocations, 'simulated buffers left'
+    assert halfway == 0, 'simulated buffers accumulate'
+    assert stats['open_handles'] == before['open_handles'], 'handles not closed'
+
+
+if __name__ == '__main__':
+    main()
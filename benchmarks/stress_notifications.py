@@ -0,0 +1,77 @@
+"""
+Registers and unregisters notification subscriptions through the shared
+notification manager against the simulated backend, while notifications are
+being delivered, and checks that no subscription, native registration or
+handle is left behind and that the cost per operation does not grow.
+"""
+import threading
+import time
+
+from benchmarks.common import *
+
+import fakewifi
+import pywinwifi
+from wlantypes import WLAN_NOTIFICATION_ACM_ENUM, WLAN_NOTIFICATION_SOURCE_ACM
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.add_argument('--operations', type=int, default=10000, help='number of register/unregister pairs')
+    parser.add_argument('--held', type=int, default=32, help='number of subscriptions held open meanwhile')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    environment = setup_environment(args)
+    manager = pywinwifi.notification_manager
+    guid = pywinwifi.getWirelessInterfaces()[0].guid
+
+    # Keep notifications flowing while subscriptions come and go
+    stop_event = threading.Event()
+
+    def notify():
+        while not stop_event.is_set():
+            environment.notify(WLAN_NOTIFICATION_SOURCE_ACM,
+                               WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_scan_complete, guid)
+            time.sleep(0.001)
+    notifier = threading.Thread(target=notify, daemon=True)
+    notifier.start()
+
+    held = [manager.subscribe(maxsize=16, drop_oldest=True) for _ in range(args.held)]
+    block = max(1, args.operations // 10)
+    durations = []
+    start = time.perf_counter()
+    for i in range(args.operations):
+        if i % block == 0:
+            durations.append(time.perf_counter())
+        if i % 2:
+            handle = manager.register(lambda event: None, codes=['scan_complete'], interfaces=[guid])
+            assert manager.unregister(handle)
+        else:
+            with manager.subscribe(interfaces=[guid]) as subscription:
+                subscription.get(0)
+    durations.append(time.perf_counter())
+    duration = durations[-1] - start
+    for subscription in held:
+        subscription.close()
+    stop_event.set()
+    notifier.join()
+    time.sleep(args.latency * 2)  # Pending deliveries
+
+    blocks = [(b - a) / block * 1e6 for a, b in zip(durations, durations[1:])]
+    print(f'{args.operations} register/unregister pairs ({args.held} held) in {duration * 1000:.1f} ms '
+          f'({duration / args.operations * 1e6:.1f} us per pair, '
+          f'first {blocks[0]:.1f} us, last {blocks[-1]:.1f} us)')
+    print(f'Native registrations {manager.registrations}, dispatched {manager.dispatched}, '
+          f'callback errors {manager.errors}')
+
+    assert not manager.subscriptions, 'subscriptions left after unregistering'
+    assert not manager.registered, 'native registration left after closing all subscriptions'
+    assert not fakewifi.global_notifications, 'notification objects left'
+    assert not environment._handles, 'native handles left'
+    assert blocks[-1] < blocks[0] * 3 + 50, 'cost per operation grows with the number of operations'
+    # Closing is idempotent and a stale handle is ignored
+    assert not manager.unregister(1)
+    manager.close()
+
+
+if __name__ == '__main__':
+    main()
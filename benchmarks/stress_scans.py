@@ -0,0 +1,89 @@
+"""
+Calls scan_networks() from many threads at the same moment against the
+simulated backend and checks that the concurrent scans of an interface are
+coalesced into a single WlanScan (see singleflight.py), that every caller gets
+the complete result, and that a failing scan fails every caller attached to
+it without blocking the next scan.
+"""
+import threading
+import time
+
+from benchmarks.common import *
+
+import pywinwifi
+
+
+def concurrent_scans(callers):
+    barrier = threading.Barrier(callers)
+    results = [None] * callers
+    errors = []
+
+    def caller(index):
+        barrier.wait()
+        try:
+            results[index] = sorted(n.ssid for n in pywinwifi.scan_networks())
+        except Exception as ex:
+            errors.append(ex)
+    threads = [threading.Thread(target=caller, args=(index,)) for index in range(callers)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors, time.perf_counter() - start
+
+
+def main():
+    parser = create_parser(__doc__)
+    parser.set_defaults(networks=20, latency=0.2)
+    parser.add_argument('--callers', type=int, default=100, help='number of concurrent callers')
+    args = parser.parse_args()
+    setup_logger(args.log)
+    environment = setup_environment(args)
+    interfaces = pywinwifi.getWirelessInterfaces()
+
+    scans = []
+    scan = environment.scan
+
+    def counting_scan(guid, ssid=None):
+        scans.append(guid)
+        return scan(guid, ssid)
+    environment.scan = counting_scan
+
+    expected = sorted(n.ssid for n in pywinwifi.scan_networks())
+    before = pywinwifi.scan_stats()
+    del scans[:]
+
+    results, errors, duration = concurrent_scans(args.callers)
+    stats = pywinwifi.scan_stats()
+    issued = stats['issued'] - before['issued']
+    coalesced = stats['coalesced'] - before['coalesced']
+    print(f'{args.callers} concurrent callers in {duration * 1000:.1f} ms: '
+          f'{len(scans)} WlanScan calls, {issued} scans issued, {coalesced} coalesced')
+    assert not errors, errors[0]
+    assert all(r == expected for r in results), 'incomplete result'
+    assert len(scans) == issued
+    # The callers start the scan of the first interface together, the next interfaces are reached
+    # at different times (after decoding the lists), so their scans may be issued more than once
+    first = pywinwifi.scan_flights.stats((pywinwifi.guid_key(interfaces[0].guid_string), None))
+    assert first['issued'] == 2, 'concurrent scans not coalesced'  # The initial scan and the concurrent one
+    assert issued + coalesced == args.callers * len(interfaces)
+    assert not stats['in_flight']
+
+    # A failing scan fails its attached callers, the next scan is issued again
+    def failing_scan(guid, ssid=None):
+        scans.append(guid)
+        time.sleep(args.latency)
+        raise RuntimeError('scan failed')
+    environment.scan = failing_scan
+    del scans[:]
+    results, errors, duration = concurrent_scans(args.callers)
+    print(f'{args.callers} concurrent callers of a failing scan in {duration * 1000:.1f} ms: '
+          f'{len(errors)} errors, {len(scans)} WlanScan calls')
+    assert len(errors) == args.callers and len(scans) == 1  # The scan of the first interface failed
+    environment.scan = counting_scan
+    assert sorted(n.ssid for n in pywinwifi.scan_networks()) == expected
+
+
+if __name__ == '__main__':
+    main()
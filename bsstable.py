@@ -0,0 +1,151 @@
+"""
+Columnar (NumPy) view of a WLAN_BSS_LIST.
+
+getWirelessNetworkBssList() builds a WirelessNetworkBss object per entry:
+formatting the BSSID, looking up the BSS and PHY type names and copying and
+splitting the information elements of every entry. BssTable instead copies
+the native buffer once and views its entries through a structured dtype
+matching WLAN_BSS_ENTRY, so the BSSIDs, RSSIs, link qualities, frequencies
+and PHY types of all the entries are columns (arrays) extracted in one step.
+The information elements of an entry are only decoded when asked for:
+
+    table = BssTable.from_bss_list(WlanGetNetworkBssList(handle, guid))
+    strongest = table.rssi.argmax()
+    print(table.bssid_strings()[strongest], table.information_elements(strongest))
+
+Requires NumPy.
+"""
+from ctypes import addressof, c_char, sizeof
+
+import numpy
+
+from wlantypes import (DOT11_BSS_TYPE_DICT_KV, DOT11_PHY_TYPE_DICT, DOT11_SSID_MAX_LENGTH, LIST_HEADER_SIZE,
+                       WLAN_BSS_ENTRY, WLAN_BSS_LIST)
+
+
+def _field_offset(name):
+    return getattr(WLAN_BSS_ENTRY, name).offset
+
+
+# The WLAN_BSS_ENTRY fields used, at their native offsets (the other bytes are skipped)
+BSS_ENTRY_DTYPE = numpy.dtype({
+    'names': ['ssid_length', 'ssid', 'bssid', 'bss_type', 'phy_type', 'rssi', 'link_quality',
+              'timestamp', 'host_timestamp', 'frequency', 'ie_offset', 'ie_size'],
+    'formats': ['<u4', f'S{DOT11_SSID_MAX_LENGTH}', ('u1', 6), '<u4', '<u4', '<i4', '<u4',
+                '<u8', '<u8', '<u4', '<u4', '<u4'],
+    'offsets': [_field_offset('dot11Ssid'), _field_offset('dot11Ssid') + 4, _field_offset('dot11Bssid'),
+                _field_offset('dot11BssType'), _field_offset('dot11BssPhyType'), _field_offset('Rssi'),
+                _field_offset('LinkQuality'), _field_offset('Timestamp'), _field_offset('HostTimestamp'),
+                _field_offset('ChCenterFrequency'), _field_offset('IeOffset'), _field_offset('IeSize')],
+    'itemsize': sizeof(WLAN_BSS_ENTRY),
+})
+ENTRIES_OFFSET = WLAN_BSS_LIST.wlanBssEntries.offset
+
+
+class BssTable(object):
+    """
+    The entries of a WLAN_BSS_LIST as columns. The buffer is copied, so the
+    native list can be freed right after the table is created.
+    """
+    def __init__(self, buffer, count):
+        self._buffer = buffer
+        self.entries = numpy.frombuffer(buffer, dtype=BSS_ENTRY_DTYPE, count=count, offset=ENTRIES_OFFSET)
+        self._positions = numpy.arange(count)  # Index of each entry in the buffer
+
+    @classmethod
+    def from_bss_list(cls, bss_list):
+        """Returns the table of a WLAN_BSS_LIST pointer (as returned by WlanGetNetworkBssList)."""
+        contents = bss_list.contents
+        total_size = max(contents.TotalSize, LIST_HEADER_SIZE)
+        buffer = bytes((c_char * total_size).from_address(addressof(contents)))
+        return cls(buffer, contents.NumberOfItems)
+
+    @classmethod
+    def from_bytes(cls, data):
+        """Returns the table of a WLAN_BSS_LIST buffer (bytes)."""
+        return cls(bytes(data), int.from_bytes(data[4:8], 'little'))
+
+    def __len__(self):
+        return len(self.entries)
+
+    """ Columns """
+
+    @property
+    def bssid(self):
+        """(N, 6) uint8 array of the BSSIDs."""
+        return self.entries['bssid']
+
+    @property
+    def rssi(self):
+        return self.entries['rssi']
+
+    @property
+    def link_quality(self):
+        return self.entries['link_quality']
+
+    @property
+    def frequency(self):
+        """Center frequencies (kHz)."""
+        return self.entries['frequency']
+
+    @property
+    def phy_type(self):
+        return self.entries['phy_type']
+
+    @property
+    def bss_type(self):
+        return self.entries['bss_type']
+
+    @property
+    def band(self):
+        """Array of the bands ('2.4' or '5')."""
+        return numpy.where(self.frequency >= 5000000, '5', '2.4')
+
+    def bssid_strings(self):
+        """Returns the BSSIDs formatted as "AA:BB:CC:DD:EE:FF"."""
+        hex_string = numpy.ascontiguousarray(self.bssid).tobytes().hex().upper()
+        return [':'.join((h[0:2], h[2:4], h[4:6], h[6:8], h[8:10], h[10:12]))
+                for h in (hex_string[i:i + 12] for i in range(0, len(hex_string), 12))]
+
+    def phy_type_names(self):
+        # Looked up once per distinct PHY type
+        phy_types, inverse = numpy.unique(self.phy_type, return_inverse=True)
+        names = numpy.array([DOT11_PHY_TYPE_DICT.get(t, 'dot11_phy_type_unknown') for t in phy_types.tolist()],
+                            dtype=object)
+        return names[inverse.reshape(-1)].tolist()
+
+    def bss_type_names(self):
+        return [DOT11_BSS_TYPE_DICT_KV.get(t) for t in self.bss_type.tolist()]
+
+    def ssids(self):
+        """Returns the SSIDs (bytes)."""
+        lengths = numpy.minimum(self.entries['ssid_length'], DOT11_SSID_MAX_LENGTH).tolist()
+        return [ssid[:length] for ssid, length in zip(self.entries['ssid'].tolist(), lengths)]
+
+    def select(self, mask_or_indices):
+        """Returns a table of the selected entries (sharing the buffer)."""
+        table = BssTable.__new__(BssTable)
+        table._buffer = self._buffer
+        table.entries = self.entries[mask_or_indices]
+        table._positions = self._positions[mask_or_indices]
+        return table
+
+    """ Per entry, on demand """
+
+    def ie_blob(self, index):
+        """Returns the information element blob (bytes) of entry <index>."""
+        entry = self.entries[index]
+        # IeOffset is relative to the start of the entry
+        start = ENTRIES_OFFSET + int(self._positions[index]) * BSS_ENTRY_DTYPE.itemsize + int(entry['ie_offset'])
+        return self._buffer[start:start + int(entry['ie_size'])]
+
+    def information_elements(self, index):
+        """Returns the (element id, body) tuples of entry <index>."""
+        blob = self.ie_blob(index)
+        elements = []
+        offset = 0
+        while offset + 2 <= len(blob):
+            element_id, length = blob[offset], blob[offset + 1]
+            elements.append((element_id, blob[offset + 2:offset + 2 + length]))
+            offset += 2 + length
+        return elements
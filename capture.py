@@ -0,0 +1,377 @@
+"""
+Record and replay of the native WLAN API responses.
+
+Recorder wraps the WlanApi functions of a backend module (win32wifi.Win32Wifi
+or fakewifi) and the WinWiFi.netsh command runner, and writes every raw
+response buffer (interface, network and BSS lists including the information
+elements, connection attributes, profiles), every notification and every
+netsh invocation to a capture file:
+
+    python pywinwifi.py --scan --capture scan.jsonl
+
+A capture is a JSON Lines file (gzip compressed when its name ends with .gz),
+a header line followed by one line per record, with binary data encoded as
+base64 and "t" the offset (seconds) from the start of the capture.
+
+ReplayEnvironment serves a capture through the simulated WlanApi of
+fakewifi, so every command and benchmark can run against a real environment
+on any OS, at the original or at an accelerated speed:
+
+    PYWINWIFI_BACKEND=replay PYWINWIFI_REPLAY=scan.jsonl python pywinwifi.py --scan
+"""
+import base64
+import functools
+import gzip
+import json
+import threading
+import time
+from ctypes import addressof, sizeof, string_at
+
+from fakewifi import SimulatedEnvironment
+from wlantypes import GUID, WLAN_INTF_OPCODE_DICT, list_size
+
+
+CAPTURE_FORMAT = 'pywinwifi-capture'
+CAPTURE_VERSION = 1
+
+# Records triggering notifications (the notifications following them in a
+# capture are replayed relative to them)
+TRIGGER_KINDS = ('scan', 'netsh')
+
+
+def _open(path, mode):
+    if str(path).endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+def _encode(data):
+    return base64.b64encode(bytes(data)).decode('ascii')
+
+
+def _decode(data):
+    return base64.b64decode(data) if data else b''
+
+
+def _guid(guid):
+    # Formats both the portable and the win32wifi GUID structures
+    return str(GUID.from_buffer_copy(bytes(guid))) if guid is not None else None
+
+
+def _netsh_key(args):
+    # Temporary file names (wlan add profile filename=...) differ per run
+    return ' '.join(a.split('=', 1)[0] + '=' if a.lower().startswith('filename=') else a
+                    for a in args).lower()
+
+
+class Recorder(object):
+    """
+    Records the native responses of a backend to a capture file.
+
+    install() wraps the WlanApi functions found in each of the given modules
+    (the backend module and, as pywinwifi calls some of them directly, the
+    pywinwifi module) and the netsh runner of a WinWiFi class, uninstall()
+    restores them and closes the capture.
+    """
+    WRAPPED = ('WlanEnumInterfaces', 'WlanGetAvailableNetworkList', 'WlanGetNetworkBssList',
+               'WlanQueryInterface', 'WlanGetProfileList', 'WlanGetProfile', 'WlanScan',
+               'OnWlanNotification')
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        self._file = None
+        self._start = None
+        self._patched = []
+        self.count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.uninstall()
+
+    def install(self, *modules, winwifi=None):
+        self._file = _open(self.path, 'w')
+        self._start = time.monotonic()
+        self._write_line({'format': CAPTURE_FORMAT, 'version': CAPTURE_VERSION, 'created': time.time()})
+        for module in modules:
+            for name in self.WRAPPED:
+                original = getattr(module, name, None)
+                if original is None or getattr(original, '_recorded', False):
+                    continue
+                wrapper = getattr(self, f'_wrap_{name}')(original)
+                wrapper._recorded = True
+                self._patch(module, name, wrapper)
+        if winwifi is not None:
+            self._patch(winwifi, 'netsh', classmethod(self._wrap_netsh(winwifi.netsh)), vars(winwifi)['netsh'])
+            if 'netsh_lines' in vars(winwifi):
+                self._patch(winwifi, 'netsh_lines', classmethod(self._wrap_netsh_lines(winwifi.netsh_lines)),
+                            vars(winwifi)['netsh_lines'])
+        return self
+
+    def uninstall(self):
+        for obj, name, original in reversed(self._patched):
+            setattr(obj, name, original)
+        del self._patched[:]
+        with self._lock:
+            if self._file:
+                self._file.close()
+                self._file = None
+
+    def _patch(self, obj, name, replacement, original=None):
+        self._patched.append((obj, name, original if original is not None else getattr(obj, name)))
+        setattr(obj, name, replacement)
+
+    def _write_line(self, record):
+        self._file.write(json.dumps(record, separators=(',', ':')) + '\n')
+
+    def record(self, kind, start=None, **fields):
+        """Writes a record, <start> is the monotonic time of the call."""
+        now = time.monotonic()
+        with self._lock:
+            if not self._file:
+                return
+            record = {'t': round((start if start is not None else now) - self._start, 6), 'kind': kind}
+            if start is not None:
+                record['duration'] = round(now - start, 6)
+            record.update(fields)
+            self._write_line(record)
+            self.count += 1
+
+    """ Wrappers """
+
+    def _wrap_list(self, original, kind):
+        @functools.wraps(original)
+        def wrapper(hClientHandle, pInterfaceGuid=None, *args):
+            start = time.monotonic()
+            if pInterfaceGuid is None:
+                result = original(hClientHandle)
+            else:
+                result = original(hClientHandle, pInterfaceGuid, *args)
+            self.record(kind, start, guid=_guid(pInterfaceGuid), data=_encode(string_at(result, list_size(result))))
+            return result
+        return wrapper
+
+    def _wrap_WlanEnumInterfaces(self, original):
+        return self._wrap_list(original, 'interfaces')
+
+    def _wrap_WlanGetAvailableNetworkList(self, original):
+        return self._wrap_list(original, 'networks')
+
+    def _wrap_WlanGetNetworkBssList(self, original):
+        return self._wrap_list(original, 'bss')
+
+    def _wrap_WlanGetProfileList(self, original):
+        return self._wrap_list(original, 'profiles')
+
+    def _wrap_WlanQueryInterface(self, original):
+        @functools.wraps(original)
+        def wrapper(hClientHandle, pInterfaceGuid, OpCode):
+            start = time.monotonic()
+            result = original(hClientHandle, pInterfaceGuid, OpCode)
+            opcode = getattr(OpCode, 'value', OpCode)
+            self.record('query', start, guid=_guid(pInterfaceGuid),
+                        opcode=WLAN_INTF_OPCODE_DICT.get(opcode, opcode),
+                        data=_encode(string_at(addressof(result.contents), sizeof(result.contents))))
+            return result
+        return wrapper
+
+    def _wrap_WlanGetProfile(self, original):
+        @functools.wraps(original)
+        def wrapper(hClientHandle, pInterfaceGuid, profileName):
+            start = time.monotonic()
+            result = original(hClientHandle, pInterfaceGuid, profileName)
+            name = profileName if isinstance(profileName, str) else \
+                bytes(profileName).decode('utf-16-le', 'replace').split('\0', 1)[0]
+            self.record('profile', start, guid=_guid(pInterfaceGuid), name=name, xml=result.value)
+            return result
+        return wrapper
+
+    def _wrap_WlanScan(self, original):
+        @functools.wraps(original)
+        def wrapper(hClientHandle, pInterfaceGuid, *args, **kwargs):
+            start = time.monotonic()
+            result = original(hClientHandle, pInterfaceGuid, *args, **kwargs)
+            ssid = args[0] if args else kwargs.get('ssid', '')
+            if isinstance(ssid, bytes):
+                ssid = ssid.decode('utf-8', 'replace')
+            self.record('scan', start, guid=_guid(pInterfaceGuid), ssid=ssid or '')
+            return result
+        return wrapper
+
+    def _wrap_OnWlanNotification(self, original):
+        @functools.wraps(original)
+        def wrapper(callback, wlan_notification_data, p):
+            actual = wlan_notification_data.contents
+            size = actual.dwDataSize
+            pData = actual.pData
+            self.record('notification', source=actual.NotificationSource, code=actual.NotificationCode,
+                        guid=_guid(actual.InterfaceGuid),
+                        data=_encode(string_at(pData, size) if size and pData else b''))
+            return original(callback, wlan_notification_data, p)
+        return wrapper
+
+    def _wrap_netsh(self, original):
+        recorder = self
+
+        @functools.wraps(original)
+        def netsh(cls, args, timeout=3, check=True):
+            start = time.monotonic()
+            cp = original(args, timeout=timeout, check=False)
+            recorder.record('netsh', start, args=list(args), returncode=cp.returncode, stdout=cp.stdout)
+            if check:
+                cp.check_returncode()
+            return cp
+        return netsh
+
+    def _wrap_netsh_lines(self, original):
+        recorder = self
+
+        @functools.wraps(original)
+        def netsh_lines(cls, args, timeout=3):
+            # Recorded as a (successful) netsh call once the output is consumed
+            start = time.monotonic()
+            lines = []
+            for line in original(args, timeout=timeout):
+                lines.append(line)
+                yield line
+            recorder.record('netsh', start, args=list(args), returncode=0, stdout='\n'.join(lines) + '\n')
+        return netsh_lines
+
+
+def load_capture(path):
+    """Returns the records of a capture file."""
+    with _open(path, 'r') as f:
+        header = json.loads(f.readline() or '{}')
+        if header.get('format') != CAPTURE_FORMAT:
+            raise ValueError(f'{path} is not a pywinwifi capture')
+        if header.get('version', 0) > CAPTURE_VERSION:
+            raise ValueError(f'Unsupported capture version {header["version"]}')
+        return [json.loads(line) for line in f if line.strip()]
+
+
+class ReplayEnvironment(SimulatedEnvironment):
+    """
+    Serves the records of a capture through the simulated WlanApi.
+
+    Every (kind, interface) and netsh command has its own cursor over the
+    recorded responses, cycling when exhausted, so a capture can be replayed
+    any number of times. The notifications recorded after a scan or netsh
+    command are replayed with their original delay divided by <speed>
+    (0 delivers them immediately), as are the recorded call durations.
+    """
+    def __init__(self, records, speed=1.0):
+        super().__init__()
+        self.speed = float(speed)
+        self._responses = {}
+        self._triggered = {}  # id(trigger record) -> [(delay, notification record)]
+        self._untriggered = []
+        self._cursors = {}
+        self._cursor_lock = threading.Lock()
+        self._started = False
+
+        trigger = None
+        for record in records:
+            kind = record['kind']
+            if kind == 'notification':
+                if trigger is None:
+                    self._untriggered.append((record['t'], record))
+                else:
+                    delay = record['t'] - trigger['t']
+                    self._triggered.setdefault(id(trigger), []).append((delay, record))
+                continue
+            if kind == 'netsh':
+                key = (kind, _netsh_key(record['args']))
+            elif kind == 'query':
+                key = (kind, record['guid'], record['opcode'])
+            elif kind == 'profile':
+                key = (kind, record['guid'], record['name'])
+            else:
+                key = (kind, record.get('guid'))
+            self._responses.setdefault(key, []).append(record)
+            if kind in TRIGGER_KINDS:
+                trigger = record
+
+    @classmethod
+    def load(cls, path, speed=1.0):
+        return cls(load_capture(path), speed)
+
+    def _scaled(self, seconds):
+        return max(0., seconds) / self.speed if self.speed > 0 else 0.
+
+    def _next(self, *key, default=KeyError):
+        responses = self._responses.get(key)
+        if not responses:
+            if default is not KeyError:
+                return default
+            raise RuntimeError(f'Not in the capture: {" ".join(str(k) for k in key)}')
+        with self._cursor_lock:
+            index = self._cursors.get(key, 0)
+            self._cursors[key] = (index + 1) % len(responses)
+        record = responses[index]
+        self._replay_notifications(record)
+        if record.get('duration'):
+            time.sleep(self._scaled(record['duration']))
+        return record
+
+    def _replay_notifications(self, trigger):
+        for delay, record in self._triggered.get(id(trigger), ()):
+            self.notify(record['source'], record['code'], GUID(record['guid']),
+                        _decode(record.get('data')), self._scaled(delay))
+
+    def register(self, handle, callback):
+        super().register(handle, callback)
+        with self._cursor_lock:
+            started, self._started = self._started, True
+        if not started:
+            # Notifications preceding any scan or netsh command
+            for t, record in self._untriggered:
+                self.notify(record['source'], record['code'], GUID(record['guid']),
+                            _decode(record.get('data')), self._scaled(t))
+
+    """ Native buffers """
+
+    def interface_info_list(self):
+        return _decode(self._next('interfaces', None)['data'])
+
+    def available_network_list(self, guid):
+        return _decode(self._next('networks', _guid(guid))['data'])
+
+    def bss_list(self, guid):
+        return _decode(self._next('bss', _guid(guid))['data'])
+
+    def profile_info_list(self, guid):
+        return _decode(self._next('profiles', _guid(guid))['data'])
+
+    def profile_xml(self, guid, name):
+        return self._next('profile', _guid(guid), name)['xml']
+
+    def rssi(self, guid):
+        return _decode(self._next('query', _guid(guid), 'wlan_intf_opcode_rssi')['data'])
+
+    def connection_attributes(self, guid):
+        guid = _guid(guid)
+        record = self._next('query', guid, 'wlan_intf_opcode_current_connection', default=None) or \
+            self._next('query', guid, 'wlan_intf_opcode_interface_state')
+        return _decode(record['data'])
+
+    """ Operations """
+
+    def scan(self, guid, ssid=None):
+        self._next('scan', _guid(guid))
+
+    def connect(self, guid, ssid, bssids=None, hidden=False):
+        raise RuntimeError('Native connections are not part of captures')
+
+    def disconnect(self, guid):
+        raise RuntimeError('Native disconnections are not part of captures')
+
+    def delete_profile(self, name):
+        raise RuntimeError('Native profile deletions are not part of captures')
+
+    def netsh(self, args):
+        record = self._next('netsh', _netsh_key(args), default=None)
+        if record is None:
+            return 1, f'The following command was not found: {" ".join(args)}.\n'
+        return record['returncode'], record['stdout']
@@ -0,0 +1,225 @@
+"""
+Channel congestion report.
+
+ChannelReport aggregates the BSSes of one or more scans (of every interface,
+a BSS seen by several interfaces is counted once per scan) into the
+occupancy of every 2.4 and 5 GHz channel:
+ - bsss:        BSSes using the channel as primary channel,
+ - overlapping: other BSSes whose (20, 40, 80 or 160 MHz) span overlaps the
+                channel, including the overlapping 2.4 GHz channels,
+ - load:        sum of the RSSI weights (0-1, see selection.py) of all the
+                BSSes overlapping the channel,
+ - utilisation: mean channel utilisation (%) reported by the BSSes of the
+                channel in their QBSS Load element (IE 11), if any,
+ - stations:    mean station count reported in the same element.
+The counts and the load are averaged over the scans. The least congested
+channel (load plus utilisation) of each band is recommended, among the
+channels a 20 MHz BSS would use (1, 6 and 11 for 2.4 GHz).
+
+    report = ChannelReport()
+    report.add(bsss)  # Once per scan
+    print(report.to_dict()['recommended'])
+
+The BSSes are stored as columns (arrays), so the aggregation stays fast over
+long recordings; it is vectorized when NumPy is installed.
+"""
+import array
+import math
+
+from selection import RSSI_FLOOR, RSSI_RANGE
+
+try:
+    import numpy  # Optional, vectorized aggregation
+except ImportError:
+    numpy = None
+
+
+CHANNELS = {
+    '2.4': tuple(range(1, 14)),
+    '5': (36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112, 116, 120, 124, 128, 132, 136, 140, 144,
+          149, 153, 157, 161, 165),
+}
+RECOMMENDED_CHANNELS = {
+    '2.4': (1, 6, 11),
+    '5': CHANNELS['5'],
+}
+CHANNEL_WIDTH = 20  # MHz, span of a reported channel
+
+
+def channel_band(channel):
+    return '2.4' if channel <= 14 else '5'
+
+
+def channel_frequency(channel):
+    """Returns the center frequency (MHz) of a 2.4 or 5 GHz channel."""
+    if channel == 14:
+        return 2484.
+    if channel < 14:
+        return 2407. + 5 * channel
+    return 5000. + 5 * channel
+
+
+def frequency_channel(frequency):
+    """Returns the channel of a center frequency (kHz), 0 outside 2.4 and 5 GHz."""
+    frequency /= 1000.
+    if frequency == 2484:
+        return 14
+    if 2412 <= frequency < 2484:
+        return int(round((frequency - 2407) / 5))
+    if 5000 < frequency < 5900:
+        return int(round((frequency - 5000) / 5))
+    return 0
+
+
+class ChannelReport(object):
+    def __init__(self):
+        self.scans = 0
+        self.primary = array.array('H')
+        self.low = array.array('d')  # MHz
+        self.high = array.array('d')  # MHz
+        self.weight = array.array('d')
+        self.utilisation = array.array('d')  # %, NaN without QBSS Load element
+        self.stations = array.array('d')
+
+    def __len__(self):
+        return len(self.primary)
+
+    def add(self, bsss):
+        """Adds the BSSes (ExtWirelessNetworkBss, of every interface) of one scan."""
+        strongest = {}
+        for bss in bsss:
+            if bss.bssid not in strongest or bss.rssi > strongest[bss.bssid].rssi:
+                strongest[bss.bssid] = bss
+        for bss in strongest.values():
+            primary = bss.channels[0] if bss.channels and bss.channels[0] else \
+                frequency_channel(bss.ch_center_frequency)
+            if not primary:
+                continue  # e.g. 6 GHz
+            width = getattr(bss, 'width', CHANNEL_WIDTH) if bss.channels[0] else CHANNEL_WIDTH
+            center = channel_frequency(bss._get_center_channel_from_information_elements()) \
+                if bss.channels[0] else channel_frequency(primary)
+            qbss_load = bss._get_qbss_load_from_information_elements()
+            self.primary.append(primary)
+            self.low.append(center - width / 2)
+            self.high.append(center + width / 2)
+            self.weight.append(min(1., max(0., (bss.rssi - RSSI_FLOOR) / RSSI_RANGE)))
+            self.utilisation.append(qbss_load[1] * 100. / 255 if qbss_load else math.nan)
+            self.stations.append(qbss_load[0] if qbss_load else math.nan)
+        self.scans += 1
+        return self
+
+    def _channels(self):
+        channels = set(CHANNELS['2.4'] + CHANNELS['5'])
+        channels.update(self.primary)
+        return sorted(channels)
+
+    def _aggregate_numpy(self, channels):
+        np = numpy
+        primary = np.frombuffer(self.primary, dtype=np.uint16).astype(np.int64)
+        low = np.frombuffer(self.low, dtype=float)
+        high = np.frombuffer(self.high, dtype=float)
+        weight = np.frombuffer(self.weight, dtype=float)
+        utilisation = np.frombuffer(self.utilisation, dtype=float)
+        stations = np.frombuffer(self.stations, dtype=float)
+        grid = np.asarray(channels, dtype=np.int64)
+        frequency = np.array([channel_frequency(c) for c in channels])
+
+        # Distinct spans (primary channel, low, high in half MHz): the overlap is computed once per span
+        keys = primary << 40 | np.rint(low * 2).astype(np.int64) << 20 | np.rint(high * 2).astype(np.int64)
+        spans, inverse = np.unique(keys, return_inverse=True)
+        inverse = inverse.reshape(-1)
+        span_count = np.bincount(inverse, minlength=len(spans))
+        span_weight = np.bincount(inverse, weights=weight, minlength=len(spans))
+        span_primary = spans >> 40
+        span_low = (spans >> 20 & 0xfffff) / 2.
+        span_high = (spans & 0xfffff) / 2.
+        overlap = (span_low < frequency[:, None] + CHANNEL_WIDTH / 2) & \
+                  (span_high > frequency[:, None] - CHANNEL_WIDTH / 2)
+        other = overlap & (span_primary != grid[:, None])
+
+        index = np.searchsorted(grid, primary)
+        bsss = np.bincount(index, minlength=len(grid))
+        has_qbss = ~np.isnan(utilisation)
+        qbss = np.bincount(index[has_qbss], minlength=len(grid))
+        with np.errstate(invalid='ignore', divide='ignore'):
+            mean_utilisation = np.bincount(index[has_qbss], weights=utilisation[has_qbss], minlength=len(grid)) / qbss
+            mean_stations = np.bincount(index[has_qbss], weights=stations[has_qbss], minlength=len(grid)) / qbss
+        return (bsss.tolist(), (other @ span_count).tolist(), (overlap @ span_weight).tolist(),
+                mean_utilisation.tolist(), mean_stations.tolist())
+
+    def _aggregate_python(self, channels):
+        spans = {}  # (primary, low, high) -> [count, weight]
+        per_channel = {}  # primary -> [count, qbss count, utilisation, stations]
+        for primary, low, high, weight, utilisation, stations in zip(
+                self.primary, self.low, self.high, self.weight, self.utilisation, self.stations):
+            span = spans.setdefault((primary, low, high), [0, 0.])
+            span[0] += 1
+            span[1] += weight
+            channel = per_channel.setdefault(primary, [0, 0, 0., 0.])
+            channel[0] += 1
+            if not math.isnan(utilisation):
+                channel[1] += 1
+                channel[2] += utilisation
+                channel[3] += stations
+        bsss, overlapping, load, mean_utilisation, mean_stations = [], [], [], [], []
+        for c in channels:
+            frequency = channel_frequency(c)
+            other = total = 0.
+            for (primary, low, high), (count, weight) in spans.items():
+                if low < frequency + CHANNEL_WIDTH / 2 and high > frequency - CHANNEL_WIDTH / 2:
+                    total += weight
+                    if primary != c:
+                        other += count
+            count, qbss, utilisation, stations = per_channel.get(c, (0, 0, 0., 0.))
+            bsss.append(count)
+            overlapping.append(other)
+            load.append(total)
+            mean_utilisation.append(utilisation / qbss if qbss else math.nan)
+            mean_stations.append(stations / qbss if qbss else math.nan)
+        return bsss, overlapping, load, mean_utilisation, mean_stations
+
+    def aggregate(self):
+        """Returns the occupancy of every channel, as dicts sorted by channel."""
+        channels = self._channels()
+        if not len(self):
+            columns = ([0] * len(channels), [0] * len(channels), [0.] * len(channels),
+                       [math.nan] * len(channels), [math.nan] * len(channels))
+        elif numpy is not None:
+            columns = self._aggregate_numpy(channels)
+        else:
+            columns = self._aggregate_python(channels)
+        scans = self.scans or 1
+        rows = []
+        for channel, bsss, overlapping, load, utilisation, stations in zip(channels, *columns):
+            has_qbss = not math.isnan(utilisation)
+            rows.append({
+                'band': channel_band(channel),
+                'channel': channel,
+                'bsss': round(bsss / scans, 2),
+                'overlapping': round(overlapping / scans, 2),
+                'load': round(load / scans, 3),
+                'utilisation': round(utilisation, 1) if has_qbss else None,
+                'stations': round(stations, 1) if has_qbss else None,
+                'congestion': round(load / scans + (utilisation / 100 if has_qbss else 0.), 3),
+            })
+        return rows
+
+    @staticmethod
+    def recommend(rows):
+        """Returns the least congested channel per band of the aggregated <rows>."""
+        recommended = {}
+        for band, candidates in RECOMMENDED_CHANNELS.items():
+            band_rows = [r for r in rows if r['band'] == band and r['channel'] in candidates]
+            if band_rows:
+                best = min(band_rows, key=lambda r: (r['congestion'], r['bsss'] + r['overlapping'], r['channel']))
+                recommended[band] = best['channel']
+        return recommended
+
+    def to_dict(self):
+        rows = self.aggregate()
+        return {
+            'scans': self.scans,
+            'bsss': round(len(self) / (self.scans or 1), 2),
+            'channels': rows,
+            'recommended': self.recommend(rows),
+        }
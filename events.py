@@ -0,0 +1,133 @@
+"""
+Push based stream of the WLAN notifications.
+
+EventStream subscribes to a NotificationManager (see notifications.py) and
+writes every decoded WlanEvent as one JSON object per line (NDJSON) to an
+output stream:
+
+    {"time": 1700000000.123, "source": "ACM", "code": "connection_complete",
+     "interface": "{...}", "data": {"ssid": "...", ...}}
+
+The native callback only hands the event to the bounded buffer of the
+subscription without blocking; the events are decoded and written on the
+calling thread. When the writer falls behind and the buffer is full, new
+events are dropped and reported by an {"overflow": {"dropped": N}} line.
+"""
+import json
+import sys
+import threading
+import time
+
+from notifications import short_code, short_source
+
+
+def _decode(value):
+    if isinstance(value, bytes):
+        try:
+            return value.decode('utf-8')
+        except UnicodeDecodeError:
+            return value.hex()
+    return value
+
+
+def event_data_to_dict(data):
+    """Returns the (MSM/ACM) notification data of an event as dict."""
+    if data is None:
+        return None
+    if isinstance(data, dict):
+        return data
+    if hasattr(data, '__dict__'):
+        return {k: _decode(v) for k, v in vars(data).items() if not k.startswith('_')}
+    return str(data)
+
+
+def event_to_dict(timestamp, source, code, interface, data):
+    return {
+        'time': round(timestamp, 6),
+        'source': short_source(source),
+        'code': short_code(code),
+        'interface': interface,
+        'data': event_data_to_dict(data),
+    }
+
+
+class EventStream(object):
+    """
+    Streams notifications as NDJSON to <output>.
+
+    :Args:
+     - manager:     (NotificationManager) Source of the notifications.
+     - output:      (file) Destination of the NDJSON lines.
+     - maxsize:     (int) Maximum number of buffered events.
+     - encode:      (callable) Encodes a dict to a JSON string.
+     - filters:     Subscription filters (sources, codes, interfaces).
+    """
+    def __init__(self, manager, output=None, maxsize=1024, encode=json.dumps, **filters):
+        self.manager = manager
+        self.output = output or sys.stdout
+        self.encode = encode
+        self.maxsize = maxsize
+        self.filters = filters
+        self._subscription = None
+        self._stop_event = threading.Event()
+        self.written = 0
+        self._reported_dropped = 0
+
+    @property
+    def received(self):
+        return self._subscription.delivered + self._subscription.dropped if self._subscription is not None else 0
+
+    @property
+    def dropped(self):
+        return self._subscription.dropped if self._subscription is not None else 0
+
+    def start(self):
+        self._subscription = self.manager.subscribe(maxsize=self.maxsize, **self.filters)
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._subscription is not None:
+            self._subscription.close()
+
+    def _write(self, record):
+        self.output.write(self.encode(record) + '\n')
+        self.output.flush()
+        self.written += 1
+
+    def _write_event(self, event):
+        self._write(event_to_dict(event.timestamp, event.notificationSource, event.notificationCode,
+                                  str(event.interfaceGuid), event.data))
+
+    def _write_overflow(self):
+        dropped = self.dropped
+        if dropped != self._reported_dropped:
+            self._write({'time': round(time.time(), 6),
+                         'overflow': {'dropped': dropped - self._reported_dropped}})
+            self._reported_dropped = dropped
+
+    def run(self, duration=None, count=None):
+        """
+        Writes the events until stop() is called, <duration> seconds have
+        passed or <count> events have been written.
+        """
+        end = time.monotonic() + duration if duration else None
+        subscription = self._subscription
+        try:
+            while not self._stop_event.is_set():
+                timeout = 0.1 if end is None else min(0.1, end - time.monotonic())
+                if timeout <= 0:
+                    break
+                event = subscription.get(timeout)
+                self._write_overflow()
+                if event is None:
+                    continue
+                self._write_event(event)
+                if count and self.written >= count:
+                    break
+            # Flush the events received so far
+            while subscription.pending:
+                self._write_event(subscription.get(0))
+            self._write_overflow()
+        finally:
+            self.stop()
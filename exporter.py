@@ -0,0 +1,235 @@
+"""
+Prometheus exporter of the Wi-Fi state.
+
+Serves /metrics (Prometheus text exposition format) over HTTP. The metrics are
+collected on a background schedule, independent of the scrape frequency, and
+scrapes are answered from the last rendered snapshot:
+
+    python pywinwifi.py --exporter 9801 --interval 15
+
+Published metrics:
+ - wifi_interface_state                 per interface (state label)
+ - wifi_connection_signal_quality       of the current connection
+ - wifi_connection_rx_rate_kbps         of the current connection
+ - wifi_connection_tx_rate_kbps         of the current connection
+ - wifi_bss_rssi_dbm                    per BSS
+ - wifi_bss_link_quality_percent        per BSS
+ - wifi_bss_channel                     per BSS (primary channel)
+ - wifi_scan_duration_seconds           last, sum and count per interface
+ - wifi_exporter_errors_total           per collection stage
+ - wifi_exporter_refresh_*              collection duration and timestamp
+"""
+import collections
+import http.server
+import threading
+import time
+
+from logger import Logger
+
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _decode_ssid(ssid):
+    if isinstance(ssid, bytes):
+        return ssid.decode('utf-8', 'replace')
+    return str(ssid)
+
+
+class Metric(object):
+    """A metric family and its samples."""
+    def __init__(self, name, metric_type, help_text):
+        self.name = name
+        self.type = metric_type
+        self.help = help_text
+        self.samples = []
+
+    def add(self, value, suffix='', **labels):
+        self.samples.append((suffix, labels, value))
+        return self
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.type}']
+        for suffix, labels, value in self.samples:
+            label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels.items())
+            label_str = f'{{{label_str}}}' if label_str else ''
+            lines.append(f'{self.name}{suffix}{label_str} {float(value)!r}')
+        return '\n'.join(lines)
+
+
+class WifiCollector(object):
+    """
+    Collects the Wi-Fi state through the pywinwifi functions of <api> (the
+    pywinwifi module), keeping the cumulative scan and error statistics.
+    """
+    def __init__(self, api, scan=True):
+        self.api = api
+        self.scan = scan
+        self.errors = collections.Counter()
+        self.scan_durations = {}  # (description, guid) -> (last, sum, count)
+
+    def _error(self, stage, ex):
+        self.errors[stage] += 1
+        Logger.warning(f'Metrics collection ({stage}) failed: {ex}')
+
+    def collect(self):
+        api = self.api
+        state = Metric('wifi_interface_state', 'gauge', 'Interface state (1 for the current state)')
+        quality = Metric('wifi_connection_signal_quality', 'gauge', 'Signal quality of the current connection (0-100)')
+        rx_rate = Metric('wifi_connection_rx_rate_kbps', 'gauge', 'Receive rate of the current connection (Kbps)')
+        tx_rate = Metric('wifi_connection_tx_rate_kbps', 'gauge', 'Transmit rate of the current connection (Kbps)')
+        rssi = Metric('wifi_bss_rssi_dbm', 'gauge', 'Received signal strength of the BSS (dBm)')
+        link_quality = Metric('wifi_bss_link_quality_percent', 'gauge', 'Link quality of the BSS (0-100)')
+        channel = Metric('wifi_bss_channel', 'gauge', 'Primary channel of the BSS')
+        metrics = [state, quality, rx_rate, tx_rate, rssi, link_quality, channel]
+
+        try:
+            # Fresh enumeration for the current states (also refreshes the registry)
+            interfaces = api.interface_registry.refresh()
+        except Exception as ex:
+            self._error('interfaces', ex)
+            interfaces = []
+
+        for interface in interfaces:
+            labels = {'interface': interface.description, 'guid': interface.guid_string}
+            state.add(1, **labels, state=interface.state_string.replace('wlan_interface_state_', ''))
+
+            if interface.state_string == 'wlan_interface_state_connected':
+                try:
+                    _, connection = api.queryInterface(interface, 'current_connection')
+                    aa = connection['wlanAssociationAttributes']
+                    conn_labels = dict(labels, ssid=_decode_ssid(aa['dot11Ssid']), bssid=aa['dot11Bssid'])
+                    quality.add(aa['wlanSignalQuality'], **conn_labels)
+                    rx_rate.add(aa['ulRxRate'], **conn_labels)
+                    tx_rate.add(aa['ulTxRate'], **conn_labels)
+                except Exception as ex:
+                    self._error('connection', ex)
+
+            if not self.scan:
+                continue
+            try:
+                start = time.perf_counter()
+                api._wlan_scan_interface(interface)
+                duration = time.perf_counter() - start
+                key = (interface.description, interface.guid_string)
+                _, total, count = self.scan_durations.get(key, (0., 0., 0))
+                self.scan_durations[key] = (duration, total + duration, count + 1)
+            except Exception as ex:
+                self._error('scan', ex)
+            try:
+                for bss in api.getWirelessNetworkBssList(interface):
+                    bss = api.ExtWirelessNetworkBss.cast(bss)
+                    bss_labels = dict(labels, ssid=_decode_ssid(bss.ssid), bssid=bss.bssid, band=bss.band)
+                    rssi.add(bss.rssi, **bss_labels)
+                    link_quality.add(bss.link_quality, **bss_labels)
+                    channel.add(bss.channels[0], **bss_labels)
+            except Exception as ex:
+                self._error('bss_list', ex)
+
+        scan = Metric('wifi_scan_duration_seconds', 'summary', 'Duration of the scans')
+        last_scan = Metric('wifi_scan_last_duration_seconds', 'gauge', 'Duration of the last scan')
+        for (description, guid), (last, total, count) in self.scan_durations.items():
+            labels = {'interface': description, 'guid': guid}
+            scan.add(total, '_sum', **labels).add(count, '_count', **labels)
+            last_scan.add(last, **labels)
+        errors = Metric('wifi_exporter_errors_total', 'counter', 'Failed collections per stage')
+        for stage in ('interfaces', 'connection', 'scan', 'bss_list'):
+            errors.add(self.errors[stage], stage=stage)
+        return metrics + [scan, last_scan, errors]
+
+
+class MetricsExporter(object):
+    """
+    Refreshes the metrics of <collector> every <interval> seconds on a
+    background thread and serves the last snapshot on http://host:port/metrics.
+    """
+    def __init__(self, collector, interval=15., host='127.0.0.1', port=9801):
+        self.collector = collector
+        self.interval = interval
+        self.address = (host, port)
+        self._snapshot = b''
+        self._lock = threading.Lock()
+        self._stop_event = threading.Event()
+        self._refreshed = threading.Event()
+        self._server = None
+        self._threads = []
+        self.refreshes = 0
+        self.scrapes = 0
+
+    def refresh(self):
+        start = time.perf_counter()
+        metrics = self.collector.collect()
+        duration = time.perf_counter() - start
+        self.refreshes += 1
+        metrics.append(Metric('wifi_exporter_refresh_duration_seconds', 'gauge',
+                              'Duration of the last collection').add(duration))
+        metrics.append(Metric('wifi_exporter_refresh_timestamp_seconds', 'gauge',
+                              'Time of the last collection').add(time.time()))
+        metrics.append(Metric('wifi_exporter_refreshes_total', 'counter',
+                              'Number of collections').add(self.refreshes))
+        snapshot = ('\n'.join(m.render() for m in metrics) + '\n').encode('utf-8')
+        with self._lock:
+            self._snapshot = snapshot
+        self._refreshed.set()
+        return snapshot
+
+    def snapshot(self):
+        with self._lock:
+            self.scrapes += 1
+            return self._snapshot
+
+    def _refresh_loop(self):
+        while not self._stop_event.is_set():
+            try:
+                self.refresh()
+            except Exception as ex:
+                Logger.exception(f'Metrics refresh failed: {ex}')
+            self._stop_event.wait(self.interval)
+
+    def start(self, wait=True):
+        """Starts the refresh and HTTP threads, <wait> for the first snapshot."""
+        exporter = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = exporter.snapshot()
+                self.send_response(200)
+                self.send_header('Content-Type', CONTENT_TYPE)
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, fmt, *args):
+                pass
+
+        self._server = http.server.ThreadingHTTPServer(self.address, Handler)
+        self.address = self._server.server_address[:2]
+        self._threads = [threading.Thread(target=self._refresh_loop, name='MetricsRefresh', daemon=True),
+                         threading.Thread(target=self._server.serve_forever, name='MetricsServer', daemon=True)]
+        for thread in self._threads:
+            thread.start()
+        if wait:
+            self._refreshed.wait()
+        Logger.info(f'Serving metrics on http://{self.address[0]}:{self.address[1]}/metrics')
+        return self
+
+    def stop(self):
+        self._stop_event.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        self._threads = []
+
+    def wait(self):
+        """Blocks until stop() is called (or KeyboardInterrupt)."""
+        while not self._stop_event.wait(1):
+            pass
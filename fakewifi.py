@@ -0,0 +1,1073 @@
+"""
+Simulated WLAN backend.
+
+Runs the shipped win32wifi.Win32Wifi and winwifi.WinWiFi code (see hotfix.py)
+on simulated WlanApi functions and netsh output, generated from a radio
+environment, so every command can run (and be benchmarked) without the
+Windows WlanApi or netsh.
+
+The environment is configured through the PYWINWIFI_FAKE environment variable
+(e.g. "interfaces=2,networks=40,bsss=3,latency=0.05,seed=1") or by calling
+set_environment() with a FakeEnvironment instance.
+"""
+import atexit
+import ctypes
+import importlib.util
+import os
+import random
+import re
+import struct
+import subprocess
+import sys
+import threading
+import time
+import types
+import xml.etree.ElementTree as ElementTree
+from contextlib import contextmanager
+from ctypes import *
+from enum import Enum
+from typing import Iterator, List
+
+import wlantypes
+from wlantypes import *
+
+
+NULL = None
+
+CHANNELS_2_4_GHZ = (1, 6, 11, 1, 6, 11, 2, 3, 4, 5, 7, 8, 9, 10, 12, 13)
+CHANNELS_5_GHZ = (36, 40, 44, 48, 52, 56, 60, 64, 100, 104, 108, 112,
+                  116, 120, 124, 128, 132, 136, 140, 149, 153, 157, 161)
+
+# (authentication, cipher, netsh authentication, netsh encryption)
+SECURITY_TYPES = (
+    (7, 0x04, 'WPA2-Personal', 'CCMP'),
+    (7, 0x04, 'WPA2-Personal', 'CCMP'),
+    (6, 0x04, 'WPA2-Enterprise', 'CCMP'),
+    (1, 0x00, 'Open', 'None'),
+)
+
+# WLAN_REASON_CODE of the connection attempts to networks not in range (WLAN_REASON_CODE_NOT_VISIBLE)
+REASON_NOT_VISIBLE = 0x28002
+
+# Windows FILETIME (100 ns intervals since 1601-01-01) of the unix epoch
+FILETIME_EPOCH_OFFSET = 116444736000000000
+
+
+def _filetime(timestamp=None):
+    return int((time.time() if timestamp is None else timestamp) * 10 ** 7) + FILETIME_EPOCH_OFFSET
+
+
+def _ie(element_id, body):
+    return bytes((element_id, len(body))) + bytes(body)
+
+
+def channel_to_frequency(channel):
+    """Returns the center frequency (kHz) of a 2.4 or 5 GHz channel."""
+    if channel <= 14:
+        return (2407 + 5 * channel) * 1000
+    return (5000 + 5 * channel) * 1000
+
+
+class FakeBss(object):
+    def __init__(self, bssid, channel, rssi, width=20, stations=0, utilisation=0):
+        self.bssid = tuple(bssid)
+        self.channel = channel
+        self.rssi = rssi
+        self.width = width
+        self.stations = stations
+        self.utilisation = utilisation
+        self.reject_reason = 0  # WLAN_REASON_CODE of the rejected connection attempts, 0 accepts them
+
+    @property
+    def bssid_string(self):
+        return ':'.join('%02x' % b for b in self.bssid)
+
+    @property
+    def band(self):
+        return '2.4' if self.channel <= 14 else '5'
+
+    @property
+    def phy_type(self):
+        return 8 if self.band == '5' else 7  # vht / ht
+
+    @property
+    def link_quality(self):
+        return max(0, min(100, 2 * (self.rssi + 100)))
+
+    def information_elements(self, ssid, secured):
+        ch = self.channel
+        ies = [_ie(0, ssid)]
+        if self.band == '2.4':
+            ies.append(_ie(1, b'\x82\x84\x8b\x96\x0c\x12\x18\x24'))
+        else:
+            ies.append(_ie(1, b'\x8c\x12\x98\x24\xb0\x48\x60\x6c'))
+        ies.append(_ie(3, bytes((ch,))))
+        ies.append(_ie(11, struct.pack('<HBH', self.stations, self.utilisation, 0)))
+        ht_info = 0x02 if self.width >= 40 else 0x00
+        ies.append(_ie(45, bytes((ht_info | 0x0c, 0x1b)) + bytes(24)))
+        if self.width >= 40:
+            # Secondary channel above (0x01) or below (0x03) the primary one
+            lower = (ch in (5, 6, 7, 8, 9, 10, 11, 12, 13)) if self.band == '2.4' else (ch // 4) % 2 == 0
+            subset_1 = (0x03 if lower else 0x01) | 0x04
+        else:
+            subset_1 = 0x00
+        ies.append(_ie(61, bytes((ch, subset_1)) + bytes(20)))
+        if secured:
+            ies.append(_ie(48, b'\x01\x00\x00\x0f\xac\x04\x01\x00\x00\x0f\xac\x04'
+                               b'\x01\x00\x00\x0f\xac\x02\x00\x00'))
+        if self.band == '5':
+            ies.append(_ie(191, b'\x91\x59\x82\x0f\xea\xff\x00\x00\xea\xff\x00\x00'))
+            if self.width >= 80:
+                center = (36, 42), (52, 58), (100, 106), (116, 122), (132, 138), (149, 155)
+                seg0 = [c for s, c in center if s <= ch < s + 16][0]
+                ies.append(_ie(192, bytes((1, seg0, 0, 0xfc, 0xff))))
+            else:
+                ies.append(_ie(192, bytes((0, 0, 0, 0xfc, 0xff))))
+        ies.append(_ie(221, b'\x00\x50\xf2\x02\x01\x01\x00\x00\x03\xa4\x00\x00'
+                            b'\x27\xa4\x00\x00\x42\x43\x5e\x00\x62\x32\x2f\x00'))
+        return b''.join(ies)
+
+    def to_bss_entry(self, ssid, secured, rssi_offset=0, timestamp=None):
+        entry = WLAN_BSS_ENTRY()
+        entry.dot11Ssid = make_ssid(ssid)
+        entry.dot11Bssid = DOT11_MAC_ADDRESS(*self.bssid)
+        entry.dot11BssType = 1
+        entry.dot11BssPhyType = self.phy_type
+        entry.Rssi = self.rssi + rssi_offset
+        entry.LinkQuality = max(0, min(100, 2 * (entry.Rssi + 100)))
+        entry.InRegDomain = 1
+        entry.BeaconPeriod = 100
+        entry.Timestamp = int(time.monotonic() * 10 ** 6)
+        entry.HostTimestamp = _filetime(timestamp)
+        entry.CapabilityInformation = 0x0431 if secured else 0x0421
+        entry.ChCenterFrequency = channel_to_frequency(self.channel)
+        return entry, self.information_elements(ssid, secured)
+
+
+class FakeNetwork(object):
+    def __init__(self, ssid, security, bsss, profile=False, hidden=False):
+        self.ssid = ssid
+        self.auth, self.cipher, self.netsh_auth, self.netsh_encryption = security
+        self.bsss = bsss
+        self.profile = profile
+        self.hidden = hidden
+
+    @property
+    def secured(self):
+        return self.cipher != 0
+
+    @property
+    def signal_quality(self):
+        return max(bss.link_quality for bss in self.bsss) if self.bsss else 0
+
+
+class FakeInterface(object):
+    def __init__(self, index, guid, rssi_offset=0):
+        self.index = index
+        self.guid = guid
+        self.description = f'Simulated Wireless Network Adapter #{index + 1}'
+        self.name = 'Wi-Fi' if not index else f'Wi-Fi {index + 1}'
+        self.mac = (0x02, 0x00, 0x00, 0x00, 0x00, index + 1)
+        self.rssi_offset = rssi_offset
+        self.connection = None  # (FakeNetwork, FakeBss)
+        self.probed = set()  # SSIDs of the directed scans
+        self.scanned = time.time()  # Completion of the last scan, the BSS list is cached since
+
+    @property
+    def state(self):
+        return 1 if self.connection else 4
+
+
+class SimulatedEnvironment(object):
+    """
+    Client handle and notification plumbing shared by the simulated
+    environments. Notifications are delivered as WLAN_NOTIFICATION_DATA
+    pointers on background threads, like the WlanApi does.
+    """
+    latency = 0.
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._handles = {}  # handle -> registered notification callbacks
+        self._next_handle = 1
+
+    def open_handle(self):
+        with self._lock:
+            handle = self._next_handle
+            self._next_handle += 1
+            self._handles[handle] = []
+        return handle
+
+    def close_handle(self, handle):
+        with self._lock:
+            if self._handles.pop(handle, None) is None:
+                raise RuntimeError(f'Invalid handle: {handle}')
+
+    def register(self, handle, callback):
+        with self._lock:
+            if handle not in self._handles:
+                raise RuntimeError(f'Invalid handle: {handle}')
+            self._handles[handle].append(callback)
+
+    def notify(self, source, code, guid, payload=b'', delay=None):
+        """
+        Delivers a notification to every registered callback on a background
+        thread after <delay> (defaults to the environment latency) seconds.
+        """
+        delay = self.latency if delay is None else delay
+        timer = threading.Timer(delay, self.deliver, (source, code, guid, payload))
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def deliver(self, source, code, guid, payload=b''):
+        """Synchronously delivers a notification to every registered callback."""
+        with self._lock:
+            callbacks = [c for callbacks in self._handles.values() for c in callbacks]
+        payload_buffer = create_string_buffer(bytes(payload), len(payload)) if payload else None
+        data = WLAN_NOTIFICATION_DATA()
+        data.NotificationSource = source
+        data.NotificationCode = code.value if isinstance(code, Enum) else code
+        data.InterfaceGuid = GUID(str(guid))
+        data.dwDataSize = len(payload) if payload else 0
+        data.pData = addressof(payload_buffer) if payload_buffer else None
+        for callback in callbacks:
+            try:
+                callback(pointer(data), None)
+            except Exception:
+                pass
+
+
+class FakeEnvironment(SimulatedEnvironment):
+    """
+    Generated radio environment behind the simulated WlanApi functions and
+    netsh output.
+
+    :Args:
+     - interfaces:  (int) Number of wireless interfaces.
+     - networks:    (int) Number of visible networks (SSIDs).
+     - bsss:        (int) Number of BSSes (access points) per network.
+     - profiles:    (int) Number of extra stored profiles without a network.
+     - latency:     (float) Seconds before a scan completes or a
+                    notification is delivered.
+     - seed:        (int) Seed of the generator, equal seeds produce equal
+                    environments.
+     - connected:   (bool) Whether the first interface starts connected.
+     - hidden:      (int) Number of (last) networks not broadcasting their
+                    SSID, only listed after a directed scan for it.
+    """
+    def __init__(self, interfaces=1, networks=20, bsss=2, profiles=5,
+                 latency=0.05, seed=0, connected=True, hidden=0):
+        super().__init__()
+        self.latency = float(latency)
+        self.seed = seed
+        self._random = random.Random(seed)
+        self._fading = random.Random(seed)  # RSSI fluctuations, see rssi()
+        self.interfaces = [self._generate_interface(i) for i in range(int(interfaces))]
+        self.networks = [self._generate_network(i, int(bsss)) for i in range(int(networks))]
+        for network in self.networks[len(self.networks) - int(hidden):]:
+            network.hidden = True
+        self.extra_profiles = [f'Old-Network-{i + 1:03}' for i in range(int(profiles))]
+        if connected and self.interfaces and self.networks:
+            network = self.networks[0]
+            network.profile = True
+            self.interfaces[0].connection = (network, network.bsss[0])
+
+    @classmethod
+    def from_spec(cls, spec):
+        """Creates an environment from a "key=value,key=value" string."""
+        kwargs = {}
+        for item in filter(None, (s.strip() for s in (spec or '').split(','))):
+            key, value = item.split('=', 1)
+            key = key.strip()
+            if key == 'latency':
+                kwargs[key] = float(value)
+            elif key == 'connected':
+                kwargs[key] = value.strip().lower() not in ('false', 'f', '0', 'no', 'n')
+            else:
+                kwargs[key] = int(value)
+        return cls(**kwargs)
+
+    def _generate_interface(self, index):
+        guid = GUID('%08x-%04x-4000-8000-%012x' % (0x5eed0000 + self.seed, index, index + 1))
+        return FakeInterface(index, guid, -3 * index)
+
+    def _generate_network(self, index, bss_count):
+        rnd = self._random
+        ssid = f'Network-{index + 1:03}'.encode('utf-8')
+        security = SECURITY_TYPES[index % len(SECURITY_TYPES)]
+        bsss = []
+        for b in range(max(1, bss_count)):
+            if rnd.random() < .5:
+                channel = rnd.choice(CHANNELS_2_4_GHZ)
+                width = rnd.choice((20, 20, 40))
+            else:
+                channel = rnd.choice(CHANNELS_5_GHZ)
+                width = rnd.choice((20, 40, 80, 80))
+            bssid = (0x0a, rnd.randrange(256), rnd.randrange(256),
+                     (index >> 8) & 0xff, index & 0xff, b)
+            bsss.append(FakeBss(bssid, channel, rnd.randint(-90, -30), width,
+                                rnd.randint(0, 40), rnd.randint(0, 255)))
+        return FakeNetwork(ssid, security, bsss, profile=index % 3 == 0)
+
+    """ Queries """
+
+    def get_interface(self, guid):
+        for interface in self.interfaces:
+            if interface.guid == guid:
+                return interface
+        raise RuntimeError(f'No such interface: {guid}')
+
+    def get_network(self, ssid):
+        if isinstance(ssid, str):
+            ssid = ssid.encode('utf-8')
+        for network in self.networks:
+            if network.ssid == ssid:
+                return network
+        return None
+
+    @staticmethod
+    def is_visible(interface, network):
+        return not network.hidden or network.ssid in interface.probed
+
+    def profiles(self):
+        return [n.ssid.decode('utf-8') for n in self.networks if n.profile] + self.extra_profiles
+
+    """ Native buffers """
+
+    def interface_info_list(self):
+        infos = []
+        for interface in self.interfaces:
+            info = WLAN_INTERFACE_INFO()
+            info.InterfaceGuid = interface.guid
+            info.strInterfaceDescription = str_to_wchar(interface.description)
+            info.isState = interface.state
+            infos.append(info)
+        return pack_interface_info_list(infos)
+
+    def available_network_list(self, guid):
+        interface = self.get_interface(guid)
+        items = []
+        for network in self.networks:
+            if not self.is_visible(interface, network):
+                continue
+            item = WLAN_AVAILABLE_NETWORK()
+            if network.profile:
+                item.ProfileName = str_to_wchar(network.ssid.decode('utf-8'))
+            item.dot11Ssid = make_ssid(network.ssid)
+            item.dot11BssType = 1
+            item.NumberOfBssids = len(network.bsss)
+            item.NetworkConnectable = 1
+            item.NumberOfPhyTypes = 1
+            item.dot11PhyTypes[0] = network.bsss[0].phy_type
+            item.wlanSignalQuality = max(0, min(100, network.signal_quality + 2 * interface.rssi_offset))
+            item.SecurityEnabled = int(network.secured)
+            item.dot11DefaultAuthAlgorithm = network.auth
+            item.dot11DefaultCipherAlgorithm = network.cipher
+            flags = 0
+            if interface.connection and interface.connection[0] is network:
+                flags |= 0x01  # WLAN_AVAILABLE_NETWORK_CONNECTED
+            if network.profile:
+                flags |= 0x02  # WLAN_AVAILABLE_NETWORK_HAS_PROFILE
+            item.Flags = flags
+            items.append(item)
+        return pack_available_network_list(items)
+
+    def bss_list(self, guid):
+        interface = self.get_interface(guid)
+        entries = []
+        for network in self.networks:
+            # Beacons of hidden networks carry an empty SSID
+            ssid = network.ssid if self.is_visible(interface, network) else b''
+            for bss in network.bsss:
+                entries.append(bss.to_bss_entry(ssid, network.secured, interface.rssi_offset, interface.scanned))
+        return pack_bss_list(entries)
+
+    def profile_info_list(self, guid):
+        self.get_interface(guid)
+        infos = []
+        for name in self.profiles():
+            info = WLAN_PROFILE_INFO()
+            info.ProfileName = str_to_wchar(name)
+            infos.append(info)
+        return pack_profile_info_list(infos)
+
+    def profile_xml(self, guid, name):
+        self.get_interface(guid)
+        if name not in self.profiles():
+            raise RuntimeError(f'No such profile: {name}')
+        network = self.get_network(name)
+        passwd = 'password' if network and network.secured else ''
+        return WinWiFi.gen_profile(ssid=name, auth='WPA2PSK', encrypt='AES', passwd=passwd)
+
+    def rssi(self, guid):
+        """Returns the (fluctuating) RSSI of the connected BSS as LONG."""
+        interface = self.get_interface(guid)
+        if not interface.connection:
+            raise RuntimeError(f'Interface {guid} is not connected')
+        rssi = interface.connection[1].rssi + interface.rssi_offset + self._fading.randint(-3, 3)
+        return bytes(c_int32(rssi))
+
+    def connection_attributes(self, guid):
+        interface = self.get_interface(guid)
+        attributes = WLAN_CONNECTION_ATTRIBUTES()
+        attributes.isState = interface.state
+        if interface.connection:
+            network, bss = interface.connection
+            attributes.wlanConnectionMode = 0
+            attributes.strProfileName = str_to_wchar(network.ssid.decode('utf-8'))
+            aa = attributes.wlanAssociationAttributes
+            aa.dot11Ssid = make_ssid(network.ssid)
+            aa.dot11BssType = 1
+            aa.dot11Bssid = DOT11_MAC_ADDRESS(*bss.bssid)
+            aa.dot11PhyType = bss.phy_type
+            aa.wlanSignalQuality = bss.link_quality
+            aa.ulRxRate = aa.ulTxRate = 866700 if bss.band == '5' else 144400
+            sa = attributes.wlanSecurityAttributes
+            sa.bSecurityEnabled = int(network.secured)
+            sa.dot11AuthAlgorithm = network.auth
+            sa.dot11CipherAlgorithm = network.cipher
+        else:
+            attributes.wlanConnectionMode = 5
+        return bytes(attributes)
+
+    """ Operations """
+
+    def scan(self, guid, ssid=None):
+        interface = self.get_interface(guid)
+        if ssid:
+            # Directed scan, probes (hidden) networks with that SSID
+            interface.probed.add(ssid if isinstance(ssid, bytes) else str(ssid).encode('utf-8'))
+        interface.scanned = time.time() + self.latency
+        self.notify(WLAN_NOTIFICATION_SOURCE_ACM,
+                    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_scan_complete, guid)
+
+    def add_interface(self):
+        """Plugs in a new interface, returns it."""
+        interface = self._generate_interface(max((i.index for i in self.interfaces), default=-1) + 1)
+        self.interfaces.append(interface)
+        self.notify(WLAN_NOTIFICATION_SOURCE_ACM,
+                    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_interface_arrival, interface.guid)
+        return interface
+
+    def remove_interface(self, guid):
+        """Unplugs the interface of <guid>."""
+        self.interfaces.remove(self.get_interface(guid))
+        self.notify(WLAN_NOTIFICATION_SOURCE_ACM,
+                    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_interface_removal, guid)
+
+    def available_bsss(self, guid, ssid, bssids=None, hidden=False):
+        """
+        Returns the BSSes of the network <ssid> the interface of <guid> can
+        join, only those of <bssids> (MAC address tuples) when given. Hidden
+        networks are only found after a directed scan, or when <hidden>.
+        """
+        interface = self.get_interface(guid)
+        network = self.get_network(ssid)
+        if not network or not (hidden or self.is_visible(interface, network)):
+            return []
+        return [b for b in network.bsss if not bssids or b.bssid in bssids]
+
+    def connect(self, guid, ssid, bssids=None, hidden=False):
+        """
+        Connects the interface of <guid> to the strongest available BSS of
+        the network <ssid> (see available_bsss()), the attempt is notified.
+        """
+        interface = self.get_interface(guid)
+        network = self.get_network(ssid)
+        bsss = self.available_bsss(guid, ssid, bssids, hidden)
+        ssid = ssid if isinstance(ssid, bytes) else ssid.encode('utf-8')
+        secured = bool(network and network.secured)
+        payload = self._connection_payload(ssid, secured)
+        self.notify(WLAN_NOTIFICATION_SOURCE_ACM,
+                    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_connection_start, guid, payload)
+        bss = max(bsss, key=lambda b: b.rssi) if bsss else None
+        reason = bss.reject_reason if bss else REASON_NOT_VISIBLE
+        if reason:
+            payload = self._connection_payload(ssid, secured, reason)
+            self.notify(WLAN_NOTIFICATION_SOURCE_ACM,
+                        WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_connection_attempt_fail, guid, payload)
+            self.notify(WLAN_NOTIFICATION_SOURCE_ACM,
+                        WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_connection_complete, guid, payload)
+            return
+        interface.connection = (network, bss)
+        self.notify(WLAN_NOTIFICATION_SOURCE_MSM,
+                    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_connected, guid,
+                    self._msm_payload(network, bss))
+        self.notify(WLAN_NOTIFICATION_SOURCE_ACM,
+                    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_connection_complete, guid, payload)
+
+    def disconnect(self, guid):
+        interface = self.get_interface(guid)
+        if not interface.connection:
+            return
+        network, bss = interface.connection
+        interface.connection = None
+        self.notify(WLAN_NOTIFICATION_SOURCE_MSM,
+                    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_disconnected, guid,
+                    self._msm_payload(network, bss))
+        self.notify(WLAN_NOTIFICATION_SOURCE_ACM,
+                    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_disconnected, guid,
+                    self._connection_payload(network.ssid, network.secured))
+
+    def move(self, guid, rssi_delta):
+        """
+        Moves the interface of <guid>: every BSS is seen <rssi_delta> dB
+        stronger (or weaker), a connected interface reports the change of its
+        signal quality.
+        """
+        interface = self.get_interface(guid)
+        interface.rssi_offset += rssi_delta
+        if interface.connection:
+            bss = interface.connection[1]
+            quality = max(0, min(100, 2 * (bss.rssi + interface.rssi_offset + 100)))
+            self.notify(WLAN_NOTIFICATION_SOURCE_MSM,
+                        WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_signal_quality_change, guid,
+                        bytes(c_uint32(quality)))
+
+    def add_profile(self, name):
+        network = self.get_network(name)
+        if network:
+            network.profile = True
+        elif name not in self.extra_profiles:
+            self.extra_profiles.append(name)
+
+    def delete_profile(self, name):
+        network = self.get_network(name)
+        if network and network.profile:
+            network.profile = False
+            for interface in self.interfaces:
+                if interface.connection and interface.connection[0] is network:
+                    self.disconnect(interface.guid)
+            return True
+        if name in self.extra_profiles:
+            self.extra_profiles.remove(name)
+            return True
+        return False
+
+    @staticmethod
+    def _connection_payload(ssid, secured, reason_code=0):
+        data = WLAN_CONNECTION_NOTIFICATION_DATA()
+        data.wlanConnectionMode = 0
+        data.strProfileName = str_to_wchar(ssid.decode('utf-8'))
+        data.dot11Ssid = make_ssid(ssid)
+        data.dot11BssType = 1
+        data.bSecurityEnabled = int(secured)
+        data.wlanReasonCode = reason_code
+        return bytes(data)
+
+    @staticmethod
+    def _msm_payload(network, bss):
+        data = WLAN_MSM_NOTIFICATION_DATA()
+        data.wlanConnectionMode = 0
+        data.strProfileName = str_to_wchar(network.ssid.decode('utf-8'))
+        data.dot11Ssid = make_ssid(network.ssid)
+        data.dot11BssType = 1
+        data.dot11MacAddr = DOT11_MAC_ADDRESS(*bss.bssid)
+        data.bSecurityEnabled = int(network.secured)
+        return bytes(data)
+
+    """ netsh """
+
+    def netsh(self, args):
+        """Returns a (return code, output) tuple for a netsh command."""
+        command = ' '.join(args).lower()
+        if command.startswith('wlan show interfaces'):
+            return 0, self._netsh_interfaces()
+        # The wlan commands target the interface=NAME argument, the first interface by default
+        selected = self._netsh_value(args, 'interface')
+        interfaces = [i for i in self.interfaces if selected is None or i.name == selected]
+        if command.startswith('wlan') and not interfaces:
+            return 1, 'There is no such wireless interface on the system.\n'
+        if command.startswith('wlan show profiles'):
+            return 0, self._netsh_profiles(interfaces)
+        if command.startswith('wlan show networks'):
+            return 0, self._netsh_networks(interfaces[0])
+        if command.startswith('wlan add profile'):
+            path = self._netsh_value(args, 'filename')
+            with open(path, encoding='utf-8') as f:
+                name = re.search(r'<name>(.*?)</name>', f.read()).group(1)
+            self.add_profile(name)
+            return 0, f'Profile {name} is added on interface {interfaces[0].name}.\n'
+        if command.startswith('wlan connect'):
+            name = self._netsh_value(args, 'name')
+            if name not in self.profiles():
+                return 1, f'There is no profile "{name}" assigned to the specified interface.\n'
+            # The profiles are named after their SSID
+            if not self.available_bsss(interfaces[0].guid, name):
+                return 1, f'The network specified by profile "{name}" is not available to connect.\n'
+            self.connect(interfaces[0].guid, name)
+            return 0, 'Connection request was completed successfully.\n'
+        if command.startswith('wlan disconnect'):
+            for interface in interfaces:
+                self.disconnect(interface.guid)
+            return 0, f'Disconnection request was completed successfully for interface "{interfaces[0].name}".\n'
+        if command.startswith('wlan delete profile'):
+            name = self._netsh_value(args, 'name') or args[3]
+            if self.delete_profile(name):
+                return 0, f'Profile "{name}" is deleted from interface "{interfaces[0].name}".\n'
+            return 1, f'Profile "{name}" is not found on any interface.\n'
+        if command.startswith('interface set interface'):
+            return 0, ''
+        return 1, f'The following command was not found: {" ".join(args)}.\n'
+
+    @staticmethod
+    def _netsh_value(args, key):
+        for arg in args:
+            if arg.lower().startswith(f'{key}='):
+                return arg.split('=', 1)[1]
+        return None
+
+    def _netsh_interfaces(self):
+        count = len(self.interfaces)
+        s = 's' if count != 1 else ''
+        lines = ['', f'There {"are" if count != 1 else "is"} {count} interface{s} on the system: ', '']
+        for interface in self.interfaces:
+            lines.extend([
+                f'    Name                   : {interface.name}',
+                f'    Description            : {interface.description}',
+                f'    GUID                   : {str(interface.guid).strip("{}").lower()}',
+                f'    Physical address       : {":".join("%02x" % b for b in interface.mac)}',
+                f'    State                  : {"connected" if interface.connection else "disconnected"}',
+            ])
+            if interface.connection:
+                network, bss = interface.connection
+                lines.extend([
+                    f'    SSID                   : {network.ssid.decode("utf-8")}',
+                    f'    BSSID                  : {bss.bssid_string}',
+                    f'    Network type           : Infrastructure',
+                    f'    Radio type             : {"802.11ac" if bss.band == "5" else "802.11n"}',
+                    f'    Authentication         : {network.netsh_auth}',
+                    f'    Cipher                 : {network.netsh_encryption}',
+                    f'    Connection mode        : Auto Connect',
+                    f'    Channel                : {bss.channel}',
+                    f'    Receive rate (Mbps)    : {866.7 if bss.band == "5" else 144.4}',
+                    f'    Transmit rate (Mbps)   : {866.7 if bss.band == "5" else 144.4}',
+                    f'    Signal                 : {bss.link_quality}% ',
+                    f'    Profile                : {network.ssid.decode("utf-8")} ',
+                ])
+            lines.append('')
+        lines.extend(['    Hosted network status  : Not available', '', ''])
+        return '\n'.join(lines)
+
+    def _netsh_profiles(self, interfaces):
+        lines = ['']
+        for interface in interfaces:
+            lines.extend([
+                f'Profiles on interface {interface.name}:',
+                '',
+                'Group policy profiles (read only)',
+                '---------------------------------',
+                '    <None>',
+                '',
+                'User profiles',
+                '-------------',
+            ])
+            lines.extend(f'    All User Profile     : {p}' for p in self.profiles())
+            lines.append('')
+        lines.append('')
+        return '\n'.join(lines)
+
+    def _netsh_networks(self, interface):
+        lines = ['', f'Interface name : {interface.name} ',
+                 f'There are {len(self.networks)} networks currently visible. ', '']
+        for idx, network in enumerate(self.networks):
+            ssid = network.ssid.decode('utf-8') if self.is_visible(interface, network) else ''
+            lines.extend([
+                f'SSID {idx + 1} : {ssid}',
+                '    Network type            : Infrastructure',
+                f'    Authentication          : {network.netsh_auth}',
+                f'    Encryption              : {network.netsh_encryption} ',
+            ])
+            for b, bss in enumerate(network.bsss):
+                lines.extend([
+                    f'    BSSID {b + 1}                 : {bss.bssid_string}',
+                    f'         Signal             : {bss.link_quality}%  ',
+                    f'         Radio type         : {"802.11ac" if bss.band == "5" else "802.11n"}',
+                    f'         Channel            : {bss.channel} ',
+                    '         Basic rates (Mbps) : 1 2 5.5 11',
+                    '         Other rates (Mbps) : 6 9 12 18 24 36 48 54',
+                ])
+            lines.append('')
+        return '\n'.join(lines)
+
+
+_environment = None
+_environment_lock = threading.Lock()
+
+
+def get_environment():
+    global _environment
+    with _environment_lock:
+        if _environment is None:
+            _environment = FakeEnvironment.from_spec(os.environ.get('PYWINWIFI_FAKE', ''))
+        return _environment
+
+
+def set_environment(environment):
+    global _environment
+    with _environment_lock:
+        _environment = environment
+    return environment
+
+
+""" Simulated WlanApi functions (see win32wifi.WlanApi) """
+
+# Error codes of the WlanApi functions
+ERROR_INVALID_PARAMETER = 87
+ERROR_NOT_FOUND = 1168
+ERROR_BAD_PROFILE = 1206
+ERROR_INVALID_STATE = 5023
+
+WLAN_CONNECTION_HIDDEN_NETWORK = 0x00000001  # dwFlags of WLAN_CONNECTION_PARAMETERS
+
+# The win32wifi.WlanApi functions simulated below, imported by the shipped Win32Wifi
+WLANAPI_ALL = ('WlanApiError', 'client_handle', 'close_client_handle', 'wlan_handle', 'wlan_memory',
+               'allocation_stats', 'WlanOpenHandle', 'WlanCloseHandle', 'WlanFreeMemory', 'WlanEnumInterfaces',
+               'WlanScan', 'WlanGetNetworkBssList', 'WlanGetAvailableNetworkList', 'WlanGetProfileList',
+               'WlanGetProfile', 'WlanDeleteProfile', 'WlanConnect', 'WlanDisconnect', 'WlanQueryInterface',
+               'WlanRegisterNotification')
+
+
+class WlanApiError(Exception):
+    """A WlanApi function returned an error code, args are (message, error code)."""
+    @property
+    def error(self):
+        return self.args[1]
+
+
+def _error(function, code):
+    return WlanApiError("%s failed. error %d" % (function, code), code)
+
+
+# Simulated WlanApi allocations (address -> buffer), released by WlanFreeMemory
+_allocations = {}
+# Handles opened and closed, buffers returned and freed (see win32wifi.WlanApi)
+_counters = {'handles_opened': 0, 'handles_closed': 0, 'allocations': 0, 'frees': 0}
+_counters_lock = threading.Lock()
+
+_client_handle = None
+_client_handle_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def allocation_stats():
+    """Returns the handle and allocation counters, with the handles still open and the buffers not freed yet."""
+    with _counters_lock:
+        stats = dict(_counters)
+    stats['open_handles'] = stats['handles_opened'] - stats['handles_closed']
+    stats['outstanding'] = stats['allocations'] - stats['frees']
+    return stats
+
+
+def _track(buffer):
+    _allocations[addressof(buffer)] = buffer
+    _count('allocations')
+
+
+def _allocate(data, typ):
+    buffer = create_string_buffer(bytes(data), max(len(data), sizeof(typ)))
+    _track(buffer)
+    return cast(buffer, POINTER(typ))
+
+
+def _profile_ssid(xml):
+    # The SSID (bytes) of a profile XML, None when it is not a valid profile
+    try:
+        name = ElementTree.fromstring(xml).find('p:SSIDConfig/p:SSID/p:name', PROFILE_NAMESPACES)
+    except ElementTree.ParseError:
+        return None
+    return name.text.encode('utf-8') if name is not None and name.text else None
+
+
+def WlanOpenHandle():
+    handle = c_void_p(get_environment().open_handle())
+    _count('handles_opened')
+    return handle
+
+
+def WlanCloseHandle(hClientHandle):
+    get_environment().close_handle(hClientHandle.value)
+    _count('handles_closed')
+    return 0
+
+
+def WlanFreeMemory(pMemory):
+    if _allocations.pop(cast(pMemory, c_void_p).value, None) is not None:
+        _count('frees')
+
+
+@contextmanager
+def wlan_handle():
+    """Opens a client handle, closed on exit."""
+    handle = WlanOpenHandle()
+    try:
+        yield handle
+    finally:
+        WlanCloseHandle(handle)
+
+
+@contextmanager
+def wlan_memory(pointer):
+    """Frees the buffer <pointer> (returned by a Wlan* function) on exit."""
+    try:
+        yield pointer
+    finally:
+        WlanFreeMemory(pointer)
+
+
+def client_handle():
+    """Returns the client handle shared by the process, opening it on first use."""
+    global _client_handle
+    handle = _client_handle
+    if handle is None:
+        with _client_handle_lock:
+            if _client_handle is None:
+                _client_handle = WlanOpenHandle()  # Counted as open until exit
+            handle = _client_handle
+    return handle
+
+
+@atexit.register
+def close_client_handle():
+    global _client_handle
+    with _client_handle_lock:
+        handle, _client_handle = _client_handle, None
+    if handle is not None:
+        WlanCloseHandle(handle)
+
+
+def WlanEnumInterfaces(hClientHandle):
+    return _allocate(get_environment().interface_info_list(), WLAN_INTERFACE_INFO_LIST)
+
+
+def WlanScan(hClientHandle, pInterfaceGuid, ssid=""):
+    get_environment().scan(pInterfaceGuid, ssid or None)
+    return 0
+
+
+def WlanGetNetworkBssList(hClientHandle, pInterfaceGuid):
+    return _allocate(get_environment().bss_list(pInterfaceGuid), WLAN_BSS_LIST)
+
+
+def WlanGetAvailableNetworkList(hClientHandle, pInterfaceGuid):
+    return _allocate(get_environment().available_network_list(pInterfaceGuid), WLAN_AVAILABLE_NETWORK_LIST)
+
+
+def WlanGetProfileList(hClientHandle, pInterfaceGuid):
+    return _allocate(get_environment().profile_info_list(pInterfaceGuid), WLAN_PROFILE_INFO_LIST)
+
+
+def WlanGetProfile(hClientHandle, pInterfaceGuid, profileName):
+    # The name is a str, an LPCWSTR or a WCHAR array (WLAN_PROFILE_INFO.ProfileName)
+    if isinstance(profileName, c_wchar_p):
+        profileName = profileName.value
+    elif not isinstance(profileName, str):
+        profileName = wchar_to_str(profileName)
+    buffer = create_unicode_buffer(get_environment().profile_xml(pInterfaceGuid, profileName))
+    _track(buffer)
+    return cast(buffer, c_wchar_p)
+
+
+def WlanDeleteProfile(hClientHandle, pInterfaceGuid, profileName):
+    if not get_environment().delete_profile(profileName):
+        raise _error('WlanDeleteProfile', ERROR_NOT_FOUND)
+    return 0
+
+
+def WlanConnect(hClientHandle, pInterfaceGuid, pConnectionParameters):
+    """
+    Validates the WLAN_CONNECTION_PARAMETERS like the WlanApi does and starts
+    the connection, whose outcome is notified. The SSID is the one of the
+    profile (stored or temporary), or of pDot11_ssid in the discovery modes.
+    """
+    environment = get_environment()
+    params = pConnectionParameters
+    mode = WLAN_CONNECTION_MODE_KV.get(params.wlanConnectionMode)
+    ssid = None
+    if params.pDot11_ssid:
+        dot11_ssid = params.pDot11_ssid.contents
+        ssid = dot11_ssid.SSID[:dot11_ssid.SSIDLength]
+    if mode == 'wlan_connection_mode_profile':
+        # strProfile is the name of a stored profile
+        try:
+            xml = environment.profile_xml(pInterfaceGuid, params.strProfile or '')
+        except RuntimeError:
+            raise _error('WlanConnect', ERROR_NOT_FOUND)
+    elif mode == 'wlan_connection_mode_temporary_profile':
+        # strProfile is the XML of a profile
+        xml = params.strProfile or ''
+    elif mode in ('wlan_connection_mode_discovery_secure', 'wlan_connection_mode_discovery_unsecure'):
+        if params.strProfile or not ssid:
+            raise _error('WlanConnect', ERROR_INVALID_PARAMETER)
+        xml = None
+    else:
+        raise _error('WlanConnect', ERROR_INVALID_PARAMETER)
+    if xml is not None:
+        profile_ssid = _profile_ssid(xml)
+        if profile_ssid is None:
+            raise _error('WlanConnect', ERROR_BAD_PROFILE)
+        if ssid and ssid != profile_ssid:
+            raise _error('WlanConnect', ERROR_INVALID_PARAMETER)
+        ssid = profile_ssid
+    # The profiles and the simulated networks are all infrastructure ones
+    if DOT11_BSS_TYPE_DICT_KV.get(params.dot11BssType) not in ('dot11_BSS_type_infrastructure',
+                                                                 'dot11_BSS_type_any'):
+        raise _error('WlanConnect', ERROR_INVALID_PARAMETER)
+    bssids = None
+    if params.pDesiredBssidList:
+        bssid_list = params.pDesiredBssidList.contents
+        header = bssid_list.Header
+        if header.Type != bytes((NDIS_OBJECT_TYPE_DEFAULT,)) or \
+                header.Revision != bytes((DOT11_BSSID_LIST_REVISION_1,)) or header.Size < sizeof(DOT11_BSSID_LIST):
+            raise _error('WlanConnect', ERROR_INVALID_PARAMETER)
+        entries = (DOT11_MAC_ADDRESS * bssid_list.uNumOfEntries).from_address(addressof(bssid_list.BSSIDs))
+        bssids = [tuple(entry) for entry in entries]
+    environment.connect(pInterfaceGuid, ssid, bssids, hidden=bool(params.dwFlags & WLAN_CONNECTION_HIDDEN_NETWORK))
+    return 0
+
+
+def WlanDisconnect(hClientHandle, pInterfaceGuid):
+    get_environment().disconnect(pInterfaceGuid)
+    return 0
+
+
+def WlanQueryInterface(hClientHandle, pInterfaceGuid, OpCode):
+    opcode = WLAN_INTF_OPCODE_DICT[OpCode.value]
+    if opcode == "wlan_intf_opcode_rssi":
+        return _allocate(get_environment().rssi(pInterfaceGuid), c_int32)
+    data = get_environment().connection_attributes(pInterfaceGuid)
+    if opcode == "wlan_intf_opcode_interface_state":
+        return _allocate(data[:4], c_uint32)
+    if WLAN_INTERFACE_STATE_DICT.get(int.from_bytes(data[:4], 'little')) != 'wlan_interface_state_connected':
+        raise _error('WlanQueryInterface', ERROR_INVALID_STATE)  # No current connection
+    return _allocate(data, WLAN_CONNECTION_ATTRIBUTES)
+
+
+def WlanRegisterNotification(hClientHandle, callback):
+    get_environment().register(hClientHandle.value, callback)
+    return callback
+
+
+""" Shipped win32wifi.Win32Wifi and winwifi.WinWiFi """
+
+HOTFIXES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hotfixes')
+
+PROFILE_NAMESPACES = {'p': 'http://www.microsoft.com/networking/WLAN/profile/v1'}
+
+PROFILE_TEMPLATE = '''<?xml version="1.0"?>
+<WLANProfile xmlns="http://www.microsoft.com/networking/WLAN/profile/v1">
+    <name>{ssid}</name>
+    <SSIDConfig>
+        <SSID>
+            <name>{ssid}</name>
+        </SSID>
+    </SSIDConfig>
+    <connectionType>ESS</connectionType>
+    <connectionMode>{connmode}</connectionMode>
+    <MSM>
+        <security>
+            <authEncryption>
+                <authentication>{auth}</authentication>
+                <encryption>{encrypt}</encryption>
+                <useOneX>false</useOneX>
+            </authEncryption>
+            <sharedKey>
+                <keyType>passPhrase</keyType>
+                <protected>false</protected>
+                <keyMaterial>{passwd}</keyMaterial>
+            </sharedKey>
+        </security>
+    </MSM>
+</WLANProfile>
+'''
+
+
+
+
+def _module(name, namespace):
+    module = types.ModuleType(name)
+    vars(module).update(namespace)
+    return module
+
+
+def _package(name):
+    # A package of the hotfixes directory, pkgutil.get_data() reads its data files (the winwifi locales)
+    path = os.path.join(HOTFIXES_PATH, name)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(path, '__init__.py'),
+                                                  submodule_search_locations=[path])
+    return importlib.util.module_from_spec(spec)
+
+
+def _load_module(name, path, package):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    module.__package__ = package  # Resolves the relative imports and the package data
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def _load_shipped_modules():
+    """
+    Imports the hotfixed win32wifi.Win32Wifi and winwifi main modules (see
+    hotfix.py) as fakewifi.win32wifi and fakewifi.winwifi, on the simulated
+    native layer: during the import win32wifi.Win32NativeWifiApi is
+    wlantypes, win32wifi.WlanApi the functions above, comtypes.GUID the
+    wlantypes GUID, and ctypes.windll only answers the user interface
+    language (English, the language of the simulated netsh output).
+    """
+    kernel32 = types.SimpleNamespace(GetUserDefaultUILanguage=lambda: 0x0409)  # en-US
+    substitutes = {
+        'ctypes': _module('ctypes', dict(vars(ctypes), windll=types.SimpleNamespace(kernel32=kernel32))),
+        'comtypes': _module('comtypes', {'GUID': GUID}),
+        'win32wifi': _package('win32wifi'),
+        'win32wifi.Win32NativeWifiApi': wlantypes,
+        'win32wifi.WlanApi': _module('win32wifi.WlanApi',
+                                     dict({name: globals()[name] for name in WLANAPI_ALL}, __all__=WLANAPI_ALL)),
+        'winwifi': _package('winwifi'),
+    }
+    # The installed packages (if any) are restored afterwards
+    saved = {name: module for name, module in sys.modules.items() if name.split('.')[0] in substitutes}
+    sys.modules.update(substitutes)
+    try:
+        win32wifi = _load_module('fakewifi.win32wifi', os.path.join(HOTFIXES_PATH, 'win32wifi', 'Win32Wifi.py'),
+                                 'win32wifi')
+        winwifi = _load_module('fakewifi.winwifi', os.path.join(HOTFIXES_PATH, 'winwifi', 'main.py'), 'winwifi')
+    finally:
+        for name in [name for name in sys.modules if name.split('.')[0] in substitutes]:
+            del sys.modules[name]
+        sys.modules.update(saved)
+    return win32wifi, winwifi
+
+
+_win32wifi, _winwifi = _load_shipped_modules()
+
+from fakewifi.win32wifi import *  # The win32wifi.Win32Wifi surface
+
+
+class WinWiFi(_winwifi.WinWiFi):
+    """
+    The shipped WinWiFi, its netsh commands are answered by the simulated
+    environment.
+    """
+    @classmethod
+    def get_profile_template(cls) -> str:
+        return PROFILE_TEMPLATE
+
+    @classmethod
+    def netsh(cls, args: List[str], timeout: int = 3, check: bool = True) -> subprocess.CompletedProcess:
+        returncode, stdout = get_environment().netsh(args)
+        cp = subprocess.CompletedProcess(['netsh'] + args, returncode, stdout, '')
+        if check:
+            cp.check_returncode()
+        return cp
+
+    @classmethod
+    def netsh_lines(cls, args: List[str], timeout: int = 3) -> Iterator[str]:
+        returncode, stdout = get_environment().netsh(args)
+        yield from stdout.splitlines()
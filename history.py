@@ -0,0 +1,187 @@
+"""
+Streaming parser of the stored profiles (AP history).
+
+`netsh wlan show profiles` lists the profiles per interface, in groups (group
+policy profiles, user profiles) of the form:
+
+    Group policy profiles (read only)
+    ---------------------------------
+        <None>
+
+    User profiles
+    -------------
+        All User Profile     : Office
+
+parse_profile_groups() consumes the output line by line (e.g. straight from
+WinWiFi.netsh_lines()) and yields a (group, profile) record per entry, the
+renderers consume those records lazily as well:
+
+    records = parse_profile_groups(WinWiFi.netsh_lines(['wlan', 'show', 'profiles']))
+    for line in render_profiles_text(records):
+        print(line)
+
+The details of the profiles (SSID, connection mode, authentication, ...) are
+parsed from their XML into ProfileDetails records by a ProfileParser, which
+caches the records by profile name and XML hash:
+
+    parser = ProfileParser()
+    details = [parser.parse(name, xml, flags) for name, xml, flags in profile_xmls]
+"""
+import hashlib
+import io
+from typing import NamedTuple, Optional
+from xml.etree import ElementTree
+
+WLAN_PROFILE_GROUP_POLICY = 0x1
+PROFILE_GROUPS = ('User profiles', 'Group policy profiles')
+
+
+def parse_profile_groups(lines):
+    """
+    Yields a (group, profile) tuple per entry of the netsh profile groups in
+    <lines>. The group name is stripped of its remarks ("(read only)"), the
+    entries of an empty group are reported as they are shown ("<None>").
+    """
+    group = None
+    previous = ''
+    for line in lines:
+        stripped = line.strip()
+        if not stripped:
+            group = None  # A blank line ends the group
+        elif stripped == '-' * len(stripped):
+            # The line above the separator is the group name
+            group = previous.split('(', 1)[0].strip()
+        elif group is not None:
+            yield group, stripped.split(':', 1)[1].strip() if ':' in stripped else stripped
+        previous = stripped
+
+
+def render_profiles_text(records):
+    """Yields the text lines (group name, then a tab indented profile per line) of <records>."""
+    group = None
+    for record_group, profile in records:
+        if record_group != group:
+            if group is not None:
+                yield ''
+            yield f'{record_group}:'
+            group = record_group
+        yield f'\t{profile}'
+
+
+def render_profiles_json(records, data=None):
+    """
+    Returns the {group: [profile, ...]} dict of <records>, the profiles of a
+    group listed once (netsh repeats the groups for every interface).
+    """
+    data = {} if data is None else data
+    for _ in collect_profiles_json(records, data):
+        pass
+    return data
+
+
+def collect_profiles_json(records, data):
+    """Yields <records> unchanged, while adding them to the JSON <data> dict."""
+    seen = set()
+    for record in records:
+        if record not in seen:
+            seen.add(record)
+            data.setdefault(record[0], []).append(record[1])
+        yield record
+
+
+class ProfileDetails(NamedTuple):
+    name: str
+    group: str
+    ssid: Optional[str]
+    connection_type: Optional[str]
+    connection_mode: Optional[str]
+    authentication: Optional[str]
+    encryption: Optional[str]
+    one_x: bool
+    key_type: Optional[str]
+    non_broadcast: bool
+
+    def to_dict(self):
+        return self._asdict()
+
+
+# Profile XML element (without namespace) -> ProfileDetails field
+_PROFILE_FIELDS = {
+    'connectionType': 'connection_type',
+    'connectionMode': 'connection_mode',
+    'authentication': 'authentication',
+    'encryption': 'encryption',
+    'useOneX': 'one_x',
+    'keyType': 'key_type',
+    'nonBroadcast': 'non_broadcast',
+}
+_BOOLEAN_FIELDS = ('one_x', 'non_broadcast')
+
+
+def parse_profile_xml(xml, flags=0):
+    """Returns the ProfileDetails of a profile XML (str), streamed with iterparse."""
+    values = dict.fromkeys(ProfileDetails._fields)
+    values['group'] = PROFILE_GROUPS[bool(flags & WLAN_PROFILE_GROUP_POLICY)]
+    path = []
+    for event, element in ElementTree.iterparse(io.StringIO(xml), events=('start', 'end')):
+        tag = element.tag.rsplit('}', 1)[-1]
+        if event == 'start':
+            path.append(tag)
+            continue
+        path.pop()
+        text = (element.text or '').strip()
+        if tag == 'name' and path == ['WLANProfile']:
+            values['name'] = text
+        elif tag in ('name', 'hex') and path[-1:] == ['SSID']:
+            if values['ssid'] is None:  # First SSID only
+                values['ssid'] = text if tag == 'name' else bytes.fromhex(text).decode('utf-8', 'replace')
+        elif tag in _PROFILE_FIELDS:
+            field = _PROFILE_FIELDS[tag]
+            if values[field] is None:
+                values[field] = text
+        element.clear()  # Also drops the key material early
+    for field in _BOOLEAN_FIELDS:
+        values[field] = values[field] == 'true'
+    return ProfileDetails(**values)
+
+
+class ProfileParser(object):
+    """Parses profile XML into ProfileDetails, cached by profile name and XML hash."""
+    def __init__(self):
+        self._cache = {}  # (name, XML hash, flags) -> ProfileDetails
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    def parse(self, name, xml, flags=0):
+        key = (name, hashlib.sha1(xml.encode('utf-8')).hexdigest(), flags)
+        details = self._cache.get(key)
+        if details is None:
+            self.misses += 1
+            details = self._cache[key] = parse_profile_xml(xml, flags)
+        else:
+            self.hits += 1
+        return details
+
+    def clear(self):
+        self._cache.clear()
+
+
+def render_details_text(details):
+    """Yields the text lines of the ProfileDetails records <details>."""
+    for idx, profile in enumerate(details):
+        if idx:
+            yield ''
+        yield f'{profile.name}:'
+        yield f'\tGroup: {profile.group}'
+        yield f'\tSSID: {profile.ssid}'
+        yield f'\tConnection type: {profile.connection_type}'
+        yield f'\tConnection mode: {profile.connection_mode}'
+        yield f'\tAuthentication: {profile.authentication}'
+        yield f'\tEncryption: {profile.encryption}'
+        yield f'\t802.1X: {profile.one_x}'
+        if profile.key_type:
+            yield f'\tKey type: {profile.key_type}'
+        yield f'\tHidden: {profile.non_broadcast}'
@@ -69,7 +69,8 @@ def apply_hotfix(package_name, package_file, site_packages_path=None, is_dir=Fal
         print(f'Hotfix for package directory "{package_name}" has been successfully applied')
         return
 
-    if calculate_md5(package_file_path) == calculate_md5(hotfix_file_path):
+    # Files added by the hotfixes (e.g. win32wifi/WlanApi.py) do not exist before the first run
+    if os.path.exists(package_file_path) and calculate_md5(package_file_path) == calculate_md5(hotfix_file_path):
         print(f'Hotfix for package "{package_name}" has already been applied')
         return
 
@@ -83,7 +84,9 @@ def apply_hotfix(package_name, package_file, site_packages_path=None, is_dir=Fal
 def main():
     site_packages_path = get_site_packages_path()
 
+    apply_hotfix('win32wifi', 'WlanApi.py', site_packages_path)
     apply_hotfix('win32wifi', 'Win32Wifi.py', site_packages_path)
+    apply_hotfix('winwifi', 'session.py', site_packages_path)
     apply_hotfix('winwifi', 'main.py', site_packages_path)
     apply_hotfix('winwifi', 'locale', site_packages_path, is_dir=True)
 
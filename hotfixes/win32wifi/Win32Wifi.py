@@ -29,12 +29,26 @@ import xmltodict
 
 from comtypes import GUID
 from win32wifi.Win32NativeWifiApi import *
+from win32wifi.WlanApi import *  # Prebound, thread-safe replacements of the Wlan* functions
 
 NULL = None
 
+# Reverse map of WLAN_INTF_OPCODE_DICT (with the statistics and rssi opcodes corrected by
+# win32wifi.WlanApi), used by queryInterface and the connection sampler
+WLAN_INTF_OPCODE_DICT_VK = {v: k for k, v in WLAN_INTF_OPCODE_DICT.items()}
+
+
+def wcharToString(wchars):
+    # The WCHAR arrays of Win32NativeWifiApi read as str, the 16-bit arrays of a portable
+    # layout (wlantypes, as used by the simulated backend) are decoded
+    if isinstance(wchars, str):
+        return wchars
+    return bytes(wchars).decode("utf-16-le", "replace").split("\0", 1)[0]
+
+
 class WirelessInterface(object):
     def __init__(self, wlan_iface_info):
-        self.description = wlan_iface_info.strInterfaceDescription
+        self.description = wcharToString(wlan_iface_info.strInterfaceDescription)
         self.guid = GUID(wlan_iface_info.InterfaceGuid)
         self.guid_string = str(wlan_iface_info.InterfaceGuid)
         self.state = wlan_iface_info.isState
@@ -65,7 +79,7 @@ class InformationElement(object):
 class WirelessNetwork(object):
     def __init__(self, wireless_network):
         self.ssid = wireless_network.dot11Ssid.SSID[:DOT11_SSID_MAX_LENGTH]
-        self.profile_name = wireless_network.ProfileName
+        self.profile_name = wcharToString(wireless_network.ProfileName)
         self.bss_type = DOT11_BSS_TYPE_DICT_KV[wireless_network.dot11BssType]
         self.number_of_bssids = wireless_network.NumberOfBssids
         self.connectable = bool(wireless_network.NetworkConnectable)
@@ -106,6 +120,8 @@ class WirelessNetworkBss(object):
         self.rssi = bss_entry.Rssi
         self.capabilities = bss_entry.CapabilityInformation
         self.ch_center_frequency = bss_entry.ChCenterFrequency
+        self.timestamp = bss_entry.Timestamp  # TSF timer of the BSS (us)
+        self.host_timestamp = bss_entry.HostTimestamp  # FILETIME of the reception
         self.__process_information_elements(bss_entry)
         self.__process_information_elements2()
 
@@ -154,7 +170,7 @@ class WirelessNetworkBss(object):
 
 class WirelessProfile(object):
     def __init__(self, wireless_profile, xml):
-        self.name = wireless_profile.ProfileName
+        self.name = wcharToString(wireless_profile.ProfileName)
         self.flags = wireless_profile.Flags
         self.xml = xml
 
@@ -178,7 +194,7 @@ class MSMNotificationData(object):
         assert isinstance(msm_notification_data, WLAN_MSM_NOTIFICATION_DATA)
 
         self.connection_mode = WLAN_CONNECTION_MODE_KV[msm_notification_data.wlanConnectionMode]
-        self.profile_name = msm_notification_data.strProfileName
+        self.profile_name = wcharToString(msm_notification_data.strProfileName)
         self.ssid = msm_notification_data.dot11Ssid.SSID[:msm_notification_data.dot11Ssid.SSIDLength]
         self.bss_type = DOT11_BSS_TYPE_DICT_KV[msm_notification_data.dot11BssType]
         self.mac_addr = ":".join(["{:02x}".format(x) for x in msm_notification_data.dot11MacAddr[:6]])
@@ -197,10 +213,11 @@ class ACMConnectionNotificationData(object):
         assert isinstance(acm_notification_data, WLAN_CONNECTION_NOTIFICATION_DATA)
 
         self.connection_mode = WLAN_CONNECTION_MODE_KV[acm_notification_data.wlanConnectionMode]
-        self.profile_name = acm_notification_data.strProfileName
+        self.profile_name = wcharToString(acm_notification_data.strProfileName)
         self.ssid = acm_notification_data.dot11Ssid.SSID[:acm_notification_data.dot11Ssid.SSIDLength]
         self.bss_type = DOT11_BSS_TYPE_DICT_KV[acm_notification_data.dot11BssType]
         self.security_enabled = acm_notification_data.bSecurityEnabled
+        self.reason_code = acm_notification_data.wlanReasonCode  # WLAN_REASON_CODE, 0 on success
 
     def __str__(self):
         result = ""
@@ -215,109 +232,93 @@ def getWirelessInterfaces():
     """Returns a list of WirelessInterface objects based on the wireless
        interfaces available."""
     interfaces_list = []
-    handle = WlanOpenHandle()
-    wlan_ifaces = WlanEnumInterfaces(handle)
-    # Handle the WLAN_INTERFACE_INFO_LIST pointer to get a list of
-    # WLAN_INTERFACE_INFO structures.
-    data_type = wlan_ifaces.contents.InterfaceInfo._type_
-    num = wlan_ifaces.contents.NumberOfItems
-    ifaces_pointer = addressof(wlan_ifaces.contents.InterfaceInfo)
-    wlan_interface_info_list = (data_type * num).from_address(ifaces_pointer)
-    for wlan_interface_info in wlan_interface_info_list:
-        wlan_iface = WirelessInterface(wlan_interface_info)
-        interfaces_list.append(wlan_iface)
-    WlanFreeMemory(wlan_ifaces)
-    WlanCloseHandle(handle)
+    with wlan_handle() as handle, wlan_memory(WlanEnumInterfaces(handle)) as wlan_ifaces:
+        # Handle the WLAN_INTERFACE_INFO_LIST pointer to get a list of
+        # WLAN_INTERFACE_INFO structures.
+        data_type = wlan_ifaces.contents.InterfaceInfo._type_
+        num = wlan_ifaces.contents.NumberOfItems
+        ifaces_pointer = addressof(wlan_ifaces.contents.InterfaceInfo)
+        wlan_interface_info_list = (data_type * num).from_address(ifaces_pointer)
+        for wlan_interface_info in wlan_interface_info_list:
+            wlan_iface = WirelessInterface(wlan_interface_info)
+            interfaces_list.append(wlan_iface)
     return interfaces_list
 
 
-def getWirelessNetworkBssList(wireless_interface):
+def getWirelessNetworkBssList(wireless_interface, ssids=None):
     """Returns a list of WirelessNetworkBss objects based on the wireless
-       networks availables."""
+       networks availables. When <ssids> (bytes) are provided, other BSS
+       entries are skipped before their information elements are decoded."""
     networks = []
-    handle = WlanOpenHandle()
-    bss_list = WlanGetNetworkBssList(handle, wireless_interface.guid)
-    # Handle the WLAN_BSS_LIST pointer to get a list of WLAN_BSS_ENTRY
-    # structures.
-    data_type = bss_list.contents.wlanBssEntries._type_
-    num = bss_list.contents.NumberOfItems
-    bsss_pointer = addressof(bss_list.contents.wlanBssEntries)
-    bss_entries_list = (data_type * num).from_address(bsss_pointer)
-    for bss_entry in bss_entries_list:
-        networks.append(WirelessNetworkBss(bss_entry))
-    WlanFreeMemory(bss_list)
-    WlanCloseHandle(handle)
+    with wlan_handle() as handle, \
+            wlan_memory(WlanGetNetworkBssList(handle, wireless_interface.guid)) as bss_list:
+        # Handle the WLAN_BSS_LIST pointer to get a list of WLAN_BSS_ENTRY
+        # structures.
+        data_type = bss_list.contents.wlanBssEntries._type_
+        num = bss_list.contents.NumberOfItems
+        bsss_pointer = addressof(bss_list.contents.wlanBssEntries)
+        bss_entries_list = (data_type * num).from_address(bsss_pointer)
+        for bss_entry in bss_entries_list:
+            if ssids is not None and bss_entry.dot11Ssid.SSID[:DOT11_SSID_MAX_LENGTH] not in ssids:
+                continue
+            networks.append(WirelessNetworkBss(bss_entry))
     return networks
 
 
-def getWirelessAvailableNetworkList(wireless_interface):
+def getWirelessAvailableNetworkList(wireless_interface, ssids=None):
     """Returns a list of WirelessNetwork objects based on the wireless
-       networks availables."""
+       networks availables, optionally only those of <ssids> (bytes)."""
     networks = []
-    handle = WlanOpenHandle()
-    network_list = WlanGetAvailableNetworkList(handle, wireless_interface.guid)
-    # Handle the WLAN_AVAILABLE_NETWORK_LIST pointer to get a list of
-    # WLAN_AVAILABLE_NETWORK structures.
-    data_type = network_list.contents.Network._type_
-    num = network_list.contents.NumberOfItems
-    network_pointer = addressof(network_list.contents.Network)
-    networks_list = (data_type * num).from_address(network_pointer)
-
-    for network in networks_list:
-        networks.append(WirelessNetwork(network))
-
-    WlanFreeMemory(network_list)
-    WlanCloseHandle(handle)
+    with wlan_handle() as handle, \
+            wlan_memory(WlanGetAvailableNetworkList(handle, wireless_interface.guid)) as network_list:
+        # Handle the WLAN_AVAILABLE_NETWORK_LIST pointer to get a list of
+        # WLAN_AVAILABLE_NETWORK structures.
+        data_type = network_list.contents.Network._type_
+        num = network_list.contents.NumberOfItems
+        network_pointer = addressof(network_list.contents.Network)
+        networks_list = (data_type * num).from_address(network_pointer)
+
+        for network in networks_list:
+            if ssids is not None and network.dot11Ssid.SSID[:DOT11_SSID_MAX_LENGTH] not in ssids:
+                continue
+            networks.append(WirelessNetwork(network))
+
     return networks
 
 
 def getWirelessProfileXML(wireless_interface, profile_name):
-    handle = WlanOpenHandle()
-    xml_data = WlanGetProfile(handle,
-                              wireless_interface.guid,
-                              LPCWSTR(profile_name))
-    xml = xml_data.value
-    WlanFreeMemory(xml_data)
-    WlanCloseHandle(handle)
-    return xml
+    with wlan_handle() as handle, \
+            wlan_memory(WlanGetProfile(handle, wireless_interface.guid, LPCWSTR(profile_name))) as xml_data:
+        return xml_data.value
 
 
 def getWirelessProfiles(wireless_interface):
     """Returns a list of WirelessProfile objects based on the wireless
        profiles."""
     profiles = []
-    handle = WlanOpenHandle()
-    profile_list = WlanGetProfileList(handle, wireless_interface.guid)
-    # Handle the WLAN_PROFILE_INFO_LIST pointer to get a list of
-    # WLAN_PROFILE_INFO structures.
-    data_type = profile_list.contents.ProfileInfo._type_
-    num = profile_list.contents.NumberOfItems
-    profile_info_pointer = addressof(profile_list.contents.ProfileInfo)
-    profiles_list = (data_type * num).from_address(profile_info_pointer)
-    xml_data = None  # safety: there may be no profiles
-    for profile in profiles_list:
-        xml_data = WlanGetProfile(handle,
-                                  wireless_interface.guid,
-                                  profile.ProfileName)
-        profiles.append(WirelessProfile(profile, xml_data.value))
-    WlanFreeMemory(xml_data)
-    WlanFreeMemory(profile_list)
-    WlanCloseHandle(handle)
+    with wlan_handle() as handle, \
+            wlan_memory(WlanGetProfileList(handle, wireless_interface.guid)) as profile_list:
+        # Handle the WLAN_PROFILE_INFO_LIST pointer to get a list of
+        # WLAN_PROFILE_INFO structures.
+        data_type = profile_list.contents.ProfileInfo._type_
+        num = profile_list.contents.NumberOfItems
+        profile_info_pointer = addressof(profile_list.contents.ProfileInfo)
+        profiles_list = (data_type * num).from_address(profile_info_pointer)
+        for profile in profiles_list:
+            # Every XML is freed, not only the last one
+            with wlan_memory(WlanGetProfile(handle, wireless_interface.guid, profile.ProfileName)) as xml_data:
+                profiles.append(WirelessProfile(profile, xml_data.value))
     return profiles
 
 def deleteProfile(wireless_interface, profile_name):
-    handle = WlanOpenHandle()
-    result = WlanDeleteProfile(handle, wireless_interface.guid, profile_name)
-    WlanCloseHandle(handle)
-
-    return result
+    with wlan_handle() as handle:
+        return WlanDeleteProfile(handle, wireless_interface.guid, profile_name)
 
 def disconnect(wireless_interface):
     """
     """
-    handle = WlanOpenHandle()
-    WlanDisconnect(handle, wireless_interface.guid)
-    WlanCloseHandle(handle)
+    with wlan_handle() as handle:
+        WlanDisconnect(handle, wireless_interface.guid)
 
 # TODO(shaked): There is an error 87 when trying to connect to a wifi network.
 def connect(wireless_interface, connection_params):
@@ -340,13 +341,12 @@ def connect(wireless_interface, connection_params):
           "flags": valid flag dword in 0x00000000 format }
         * Currently, only the name string is supported here.
     """
-    handle = WlanOpenHandle()
     cnxp = WLAN_CONNECTION_PARAMETERS()
     connection_mode = connection_params["connectionMode"]
     connection_mode_int = WLAN_CONNECTION_MODE_VK[connection_mode]
     cnxp.wlanConnectionMode = WLAN_CONNECTION_MODE(connection_mode_int)
     # determine strProfile
-    if connection_mode == ('wlan_connection_mode_profile' or           # name
+    if connection_mode in ('wlan_connection_mode_profile',             # name
                            'wlan_connection_mode_temporary_profile'):  # xml
         cnxp.strProfile = LPCWSTR(connection_params["profile"])
     else:
@@ -356,9 +356,9 @@ def connect(wireless_interface, connection_params):
         dot11Ssid = DOT11_SSID()
         dot11Ssid.SSID = connection_params["ssid"]
         dot11Ssid.SSIDLength = len(connection_params["ssid"])
-        cnxp.pDot11Ssid = pointer(dot11Ssid)
+        cnxp.pDot11_ssid = pointer(dot11Ssid)  # The field name of Win32NativeWifiApi
     else:
-        cnxp.pDot11Ssid = NULL
+        cnxp.pDot11_ssid = NULL
     # bssidList
     # NOTE: Before this can actually support multiple entries,
     #   the DOT11_BSSID_LIST structure must be rewritten to
@@ -366,7 +366,9 @@ def connect(wireless_interface, connection_params):
     if connection_params["bssidList"] is not None:
         bssids = []
         for bssidish in connection_params["bssidList"]:
-            bssidish = tuple(int(n, 16) for n in bssidish.split(b":"))
+            if isinstance(bssidish, bytes):
+                bssidish = bssidish.decode("ascii")
+            bssidish = tuple(int(n, 16) for n in bssidish.split(":"))
             bssids.append((DOT11_MAC_ADDRESS)(*bssidish))
         bssidListEntries = c_ulong(len(bssids))
         bssids = (DOT11_MAC_ADDRESS * len(bssids))(*bssids)
@@ -388,12 +390,10 @@ def connect(wireless_interface, connection_params):
     cnxp.dot11BssType = DOT11_BSS_TYPE(bssType)
     # flags
     cnxp.dwFlags = DWORD(connection_params["flags"])
-    print(cnxp)
-    result = WlanConnect(handle,
-                wireless_interface.guid,
-                cnxp)
-    WlanCloseHandle(handle)
-    return result
+    with wlan_handle() as handle:
+        return WlanConnect(handle,
+                    wireless_interface.guid,
+                    cnxp)
 
 def dot11bssidToString(dot11Bssid):
     return ":".join(map(lambda x: "%02X" % x, dot11Bssid))
@@ -401,16 +401,14 @@ def dot11bssidToString(dot11Bssid):
 def queryInterface(wireless_interface, opcode_item):
     """
     """
-    handle = WlanOpenHandle()
     opcode_item_ext = "".join(["wlan_intf_opcode_", opcode_item])
-    opcode = None
-    for key, val in WLAN_INTF_OPCODE_DICT.items():
-        if val == opcode_item_ext:
-            opcode = WLAN_INTF_OPCODE(key)
-            break
-    result = WlanQueryInterface(handle, wireless_interface.guid, opcode)
-    WlanCloseHandle(handle)
-    r = result.contents
+    opcode = WLAN_INTF_OPCODE_DICT_VK.get(opcode_item_ext)
+    if opcode is not None:
+        opcode = WLAN_INTF_OPCODE(opcode)
+    with wlan_handle() as handle, \
+            wlan_memory(WlanQueryInterface(handle, wireless_interface.guid, opcode)) as result:
+        # Copied, the queried data is freed here
+        r = type(result.contents).from_buffer_copy(result.contents)
     if opcode_item == "interface_state":
         #WLAN_INTERFACE_STATE
         ext_out = WLAN_INTERFACE_STATE_DICT[r.value]
@@ -418,7 +416,7 @@ def queryInterface(wireless_interface, opcode_item):
         #WLAN_CONNECTION_ATTRIBUTES
         isState = WLAN_INTERFACE_STATE_DICT[r.isState]
         wlanConnectionMode = WLAN_CONNECTION_MODE_KV[r.wlanConnectionMode]
-        strProfileName = r.strProfileName
+        strProfileName = wcharToString(r.strProfileName)
         aa = r.wlanAssociationAttributes
         wlanAssociationAttributes = {
             "dot11Ssid": aa.dot11Ssid.SSID,
@@ -446,7 +444,7 @@ def queryInterface(wireless_interface, opcode_item):
         }
     else:
         ext_out = None
-    return result.contents, ext_out
+    return r, ext_out
 
 
 def wndToStr(wlan_notification_data):
@@ -546,8 +544,8 @@ def OnWlanNotification(callback, wlan_notification_data, p):
         callback(event)
 
 
-global_callbacks = []
-global_handles = []
+# Registered notifications (handle value -> NotificationObject)
+global_notifications = {}
 
 
 class NotificationObject(object):
@@ -558,30 +556,24 @@ class NotificationObject(object):
 
 def registerNotification(callback):
     handle = WlanOpenHandle()
+    try:
+        c_back = WlanRegisterNotification(handle, functools.partial(OnWlanNotification, callback))
+    except:
+        WlanCloseHandle(handle)
+        raise
+    notification_object = NotificationObject(handle, c_back)
+    global_notifications[handle.value] = notification_object
 
-    c_back = WlanRegisterNotification(handle, functools.partial(OnWlanNotification, callback))
-    global_callbacks.append(c_back)
-    global_handles.append(handle)
-
-    return NotificationObject(handle, c_back)
+    return notification_object
 
 
 def unregisterNotification(notification_object):
-    # TODO: Instead of enumerating on the global lists, just save
-    # the NotificationObject-s in some list or dict.
+    # Closing the handle unregisters the callback, unregistering twice is a no-op
+    if global_notifications.pop(notification_object.handle.value, None) is None:
+        return
     WlanCloseHandle(notification_object.handle)
 
-    for i, h in enumerate(global_handles):
-        if h == notification_object.handle:
-            del global_handles[i]
-
-    for i, c in enumerate(global_callbacks):
-        if c == notification_object.callback:
-            del global_callbacks[i]
-
 
 def unregisterAllNotifications():
-    for handle in global_handles:
-        WlanCloseHandle(handle)
-    del global_handles[:]
-    del global_callbacks[:]
+    for notification_object in list(global_notifications.values()):
+        unregisterNotification(notification_object)
@@ -0,0 +1,297 @@
+# win32wifi - Windows Native Wifi Api Python library.
+#
+# Prebound WlanApi functions.
+#
+# Win32NativeWifiApi assigns the argtypes and restype of the shared wlanapi
+# function objects on every call, which costs time and races when threads
+# call the same function with different prototypes (WlanQueryInterface). This
+# module loads its own instance of wlanapi.dll and prototypes every entry
+# point it uses once, at import, with an errcheck raising WlanApiError on a
+# non zero return code. The prototypes are never modified afterwards, so the
+# functions can be called concurrently from any thread.
+#
+# The functions keep the signatures and return values of their
+# Win32NativeWifiApi counterparts, which they replace in Win32Wifi:
+#
+#     from win32wifi.Win32NativeWifiApi import *
+#     from win32wifi.WlanApi import *
+#
+# client_handle() returns a client handle shared by the process (opened on
+# first use, closed at exit), for callers that do not need a handle of their
+# own (notifications are registered per handle and need one).
+#
+# Every handle and every buffer returned by these functions is counted, see
+# allocation_stats(). wlan_handle() and wlan_memory() scope them, so they
+# are closed or freed even when an exception is raised:
+#
+#     with wlan_handle() as handle, wlan_memory(WlanEnumInterfaces(handle)) as interfaces:
+#         ...
+#
+
+import atexit
+import threading
+from contextlib import contextmanager
+from ctypes import *
+from ctypes.wintypes import BOOL, DWORD, HANDLE, LPCWSTR, LPWSTR
+
+from comtypes import GUID
+from win32wifi.Win32NativeWifiApi import (DOT11_BSS_TYPE, DOT11_SSID, DOT11_SSID_MAX_LENGTH, WLAN_AVAILABLE_NETWORK_LIST,
+                                          WLAN_BSS_LIST, WLAN_CONNECTION_PARAMETERS, WLAN_INTERFACE_INFO_LIST,
+                                          WLAN_INTF_OPCODE, WLAN_INTF_OPCODE_DICT, WLAN_INTF_OPCODE_TYPE_DICT,
+                                          WLAN_NOTIFICATION_DATA, WLAN_NOTIFICATION_SOURCE_ALL,
+                                          WLAN_OPCODE_VALUE_TYPE, WLAN_PROFILE_GET_PLAINTEXT_KEY,
+                                          WLAN_PROFILE_INFO_LIST, WLAN_RAW_DATA)
+
+# win32wifi maps wlan_intf_opcode_statistics and wlan_intf_opcode_rssi to 17 and 18 instead of
+# 0x10000101 and 0x10000102 (wlan_intf_opcode_msm_start + 1 and + 2), corrected in place: the map
+# is shared with Win32NativeWifiApi and Win32Wifi
+for _opcode, _name in ((0x10000101, 'wlan_intf_opcode_statistics'), (0x10000102, 'wlan_intf_opcode_rssi')):
+    for _wrong in [k for k, v in WLAN_INTF_OPCODE_DICT.items() if v == _name]:
+        del WLAN_INTF_OPCODE_DICT[_wrong]
+    WLAN_INTF_OPCODE_DICT[_opcode] = _name
+
+__all__ = ['WlanApiError', 'WLAN_NOTIFICATION_CALLBACK_TYPE', 'client_handle', 'close_client_handle',
+           'wlan_handle', 'wlan_memory', 'allocation_stats',
+           'WlanOpenHandle', 'WlanCloseHandle', 'WlanFreeMemory', 'WlanEnumInterfaces', 'WlanScan',
+           'WlanGetNetworkBssList', 'WlanGetAvailableNetworkList', 'WlanGetProfileList', 'WlanGetProfile',
+           'WlanDeleteProfile', 'WlanConnect', 'WlanDisconnect', 'WlanQueryInterface', 'WlanRegisterNotification']
+
+WLAN_CLIENT_VERSION = 2  # Windows Vista and later
+DOT11_BSS_TYPE_ANY = 3
+
+WLAN_NOTIFICATION_CALLBACK_TYPE = WINFUNCTYPE(None, POINTER(WLAN_NOTIFICATION_DATA), c_void_p)
+
+
+class WlanApiError(Exception):
+    """A WlanApi function returned an error code, args are (message, error code)."""
+    @property
+    def error(self):
+        return self.args[1]
+
+
+def _errcheck(result, func, args):
+    if result:
+        raise WlanApiError("%s failed. error %d" % (func.__name__, result), result)
+    return args
+
+
+_wlanapi = WinDLL('wlanapi.dll')  # Own instance, the function objects of windll.wlanapi are shared
+
+
+def _prototype(name, argtypes, restype=DWORD, errcheck=_errcheck):
+    func = getattr(_wlanapi, name)
+    func.argtypes = argtypes
+    func.restype = restype
+    if errcheck is not None:
+        func.errcheck = errcheck
+    return func
+
+
+_WlanOpenHandle = _prototype('WlanOpenHandle', [DWORD, c_void_p, POINTER(DWORD), POINTER(HANDLE)])
+_WlanCloseHandle = _prototype('WlanCloseHandle', [HANDLE, c_void_p])
+_WlanFreeMemory = _prototype('WlanFreeMemory', [c_void_p], restype=None, errcheck=None)
+_WlanEnumInterfaces = _prototype('WlanEnumInterfaces',
+                                 [HANDLE, c_void_p, POINTER(POINTER(WLAN_INTERFACE_INFO_LIST))])
+_WlanScan = _prototype('WlanScan', [HANDLE, POINTER(GUID), POINTER(DOT11_SSID), POINTER(WLAN_RAW_DATA), c_void_p])
+_WlanGetNetworkBssList = _prototype('WlanGetNetworkBssList',
+                                    [HANDLE, POINTER(GUID), POINTER(DOT11_SSID), DOT11_BSS_TYPE, BOOL, c_void_p,
+                                     POINTER(POINTER(WLAN_BSS_LIST))])
+_WlanGetAvailableNetworkList = _prototype('WlanGetAvailableNetworkList',
+                                          [HANDLE, POINTER(GUID), DWORD, c_void_p,
+                                           POINTER(POINTER(WLAN_AVAILABLE_NETWORK_LIST))])
+_WlanGetProfileList = _prototype('WlanGetProfileList',
+                                 [HANDLE, POINTER(GUID), c_void_p, POINTER(POINTER(WLAN_PROFILE_INFO_LIST))])
+_WlanGetProfile = _prototype('WlanGetProfile',
+                             [HANDLE, POINTER(GUID), LPCWSTR, c_void_p, POINTER(LPWSTR), POINTER(DWORD),
+                              POINTER(DWORD)])
+_WlanDeleteProfile = _prototype('WlanDeleteProfile', [HANDLE, POINTER(GUID), LPCWSTR, c_void_p])
+_WlanConnect = _prototype('WlanConnect', [HANDLE, POINTER(GUID), POINTER(WLAN_CONNECTION_PARAMETERS), c_void_p])
+_WlanDisconnect = _prototype('WlanDisconnect', [HANDLE, POINTER(GUID), c_void_p])
+# The type of the returned data depends on the opcode, it is cast by WlanQueryInterface()
+_WlanQueryInterface = _prototype('WlanQueryInterface',
+                                 [HANDLE, POINTER(GUID), WLAN_INTF_OPCODE, c_void_p, POINTER(DWORD),
+                                  POINTER(c_void_p), POINTER(WLAN_OPCODE_VALUE_TYPE)])
+_WlanRegisterNotification = _prototype('WlanRegisterNotification',
+                                       [HANDLE, DWORD, BOOL, WLAN_NOTIFICATION_CALLBACK_TYPE, c_void_p, c_void_p,
+                                        POINTER(DWORD)])
+
+
+# Handles opened and closed, buffers returned and freed
+_counters = {'handles_opened': 0, 'handles_closed': 0, 'allocations': 0, 'frees': 0}
+_counters_lock = threading.Lock()
+
+
+def _count(name):
+    with _counters_lock:
+        _counters[name] += 1
+
+
+def allocation_stats():
+    """Returns the handle and allocation counters, with the handles still open and the buffers not freed yet."""
+    with _counters_lock:
+        stats = dict(_counters)
+    stats['open_handles'] = stats['handles_opened'] - stats['handles_closed']
+    stats['outstanding'] = stats['allocations'] - stats['frees']
+    return stats
+
+
+def WlanOpenHandle():
+    negotiated_version = DWORD()
+    handle = HANDLE()
+    _WlanOpenHandle(WLAN_CLIENT_VERSION, None, byref(negotiated_version), byref(handle))
+    _count('handles_opened')
+    return handle
+
+
+def WlanCloseHandle(hClientHandle):
+    _WlanCloseHandle(hClientHandle, None)
+    _count('handles_closed')
+    return 0
+
+
+def _address(pointer):
+    # Not bool(pointer): a LPWSTR to an empty string is false as well
+    return cast(pointer, c_void_p).value
+
+
+def WlanFreeMemory(pMemory):
+    if _address(pMemory):
+        _WlanFreeMemory(pMemory)
+        _count('frees')
+
+
+def _allocated(pointer):
+    if _address(pointer):
+        _count('allocations')
+    return pointer
+
+
+@contextmanager
+def wlan_handle():
+    """Opens a client handle, closed on exit."""
+    handle = WlanOpenHandle()
+    try:
+        yield handle
+    finally:
+        WlanCloseHandle(handle)
+
+
+@contextmanager
+def wlan_memory(pointer):
+    """Frees the buffer <pointer> (returned by a Wlan* function) on exit."""
+    try:
+        yield pointer
+    finally:
+        WlanFreeMemory(pointer)
+
+
+def WlanEnumInterfaces(hClientHandle):
+    interface_list = POINTER(WLAN_INTERFACE_INFO_LIST)()
+    _WlanEnumInterfaces(hClientHandle, None, byref(interface_list))
+    return _allocated(interface_list)
+
+
+def _dot11_ssid(ssid):
+    if isinstance(ssid, str):
+        ssid = ssid.encode('utf-8')
+    if len(ssid) > DOT11_SSID_MAX_LENGTH:
+        raise ValueError("SSIDs have a maximum length of %d bytes." % DOT11_SSID_MAX_LENGTH)
+    return DOT11_SSID(len(ssid), ssid)
+
+
+def WlanScan(hClientHandle, pInterfaceGuid, ssid=""):
+    """Requests a scan on the interface, directed to <ssid> (str or bytes) if any."""
+    _WlanScan(hClientHandle, byref(pInterfaceGuid), byref(_dot11_ssid(ssid)) if ssid else None, None, None)
+    return 0
+
+
+def WlanGetNetworkBssList(hClientHandle, pInterfaceGuid):
+    bss_list = POINTER(WLAN_BSS_LIST)()
+    _WlanGetNetworkBssList(hClientHandle, byref(pInterfaceGuid), None, DOT11_BSS_TYPE_ANY, False, None,
+                           byref(bss_list))
+    return _allocated(bss_list)
+
+
+def WlanGetAvailableNetworkList(hClientHandle, pInterfaceGuid):
+    network_list = POINTER(WLAN_AVAILABLE_NETWORK_LIST)()
+    _WlanGetAvailableNetworkList(hClientHandle, byref(pInterfaceGuid), 0, None, byref(network_list))
+    return _allocated(network_list)
+
+
+def WlanGetProfileList(hClientHandle, pInterfaceGuid):
+    profile_list = POINTER(WLAN_PROFILE_INFO_LIST)()
+    _WlanGetProfileList(hClientHandle, byref(pInterfaceGuid), None, byref(profile_list))
+    return _allocated(profile_list)
+
+
+def WlanGetProfile(hClientHandle, pInterfaceGuid, profileName):
+    xml = LPWSTR()
+    flags = DWORD(WLAN_PROFILE_GET_PLAINTEXT_KEY)
+    granted_access = DWORD()
+    _WlanGetProfile(hClientHandle, byref(pInterfaceGuid), profileName, None, byref(xml), byref(flags),
+                    byref(granted_access))
+    return _allocated(xml)
+
+
+def WlanDeleteProfile(hClientHandle, pInterfaceGuid, profileName):
+    _WlanDeleteProfile(hClientHandle, byref(pInterfaceGuid), profileName, None)
+    return 0
+
+
+def WlanConnect(hClientHandle, pInterfaceGuid, pConnectionParameters):
+    _WlanConnect(hClientHandle, byref(pInterfaceGuid), byref(pConnectionParameters), None)
+    return 0
+
+
+def WlanDisconnect(hClientHandle, pInterfaceGuid):
+    _WlanDisconnect(hClientHandle, byref(pInterfaceGuid), None)
+    return 0
+
+
+def WlanQueryInterface(hClientHandle, pInterfaceGuid, OpCode):
+    """Returns a pointer to the queried data, typed after the opcode (to be freed with WlanFreeMemory)."""
+    data_type = WLAN_INTF_OPCODE_TYPE_DICT.get(WLAN_INTF_OPCODE_DICT.get(OpCode.value), c_ubyte)
+    data_size = DWORD()
+    data = c_void_p()
+    value_type = WLAN_OPCODE_VALUE_TYPE()
+    _WlanQueryInterface(hClientHandle, byref(pInterfaceGuid), OpCode, None, byref(data_size), byref(data),
+                        byref(value_type))
+    return _allocated(cast(data, POINTER(data_type)))
+
+
+def WlanRegisterNotification(hClientHandle, callback):
+    """
+    Registers <callback> for the notifications of every source on the handle
+    (until it is closed). Returns the C callback, which must be kept alive
+    as long as the handle is open.
+    """
+    c_callback = WLAN_NOTIFICATION_CALLBACK_TYPE(callback)
+    _WlanRegisterNotification(hClientHandle, WLAN_NOTIFICATION_SOURCE_ALL, True, c_callback, None, None, None)
+    return c_callback
+
+
+""" Shared client handle """
+
+_client_handle = None
+_client_handle_lock = threading.Lock()
+
+
+def client_handle():
+    """Returns the client handle shared by the process, opening it on first use."""
+    global _client_handle
+    handle = _client_handle
+    if handle is None:
+        with _client_handle_lock:
+            if _client_handle is None:
+                _client_handle = WlanOpenHandle()  # Counted as open until exit
+            handle = _client_handle
+    return handle
+
+
+@atexit.register
+def close_client_handle():
+    global _client_handle
+    with _client_handle_lock:
+        handle, _client_handle = _client_handle, None
+    if handle is not None:
+        WlanCloseHandle(handle)
@@ -1,3 +1,4 @@
+import atexit
 import io
 import json
 import locale
@@ -6,40 +7,15 @@ import pkgutil
 import subprocess
 import sys
 import tempfile
+import threading
 import time
-from typing import Callable, List, Optional
+from typing import Callable, Iterator, List, Optional, Tuple
 
-from ctypes import *
-from ctypes.wintypes import *
+from ctypes import addressof, windll
 from comtypes import GUID
+from win32wifi import WlanApi
 
-
-class WLAN_RAW_DATA(Structure):
-    _fields_ = [
-        ("dwDataSize", DWORD),
-        ("DataBlob", c_byte * 1)
-    ]
-
-
-class DOT11_SSID(Structure):
-    _fields_ = [("uSSIDLength", c_ulong),
-                ("ucSSID", c_char * 32)]
-
-
-class WLAN_INTERFACE_INFO(Structure):
-    _fields_ = [
-        ("InterfaceGuid", GUID),
-        ("strInterfaceDescription", c_wchar * 256),
-        ("isState", c_uint)
-    ]
-
-
-class WLAN_INTERFACE_INFO_LIST(Structure):
-    _fields_ = [
-        ("dwNumberOfItems", DWORD),
-        ("dwIndex", DWORD),
-        ("InterfaceInfo", WLAN_INTERFACE_INFO * 1)
-    ]
+from .session import NetshPool
 
 
 class WinUILanguage:
@@ -58,69 +34,124 @@ class WinUILanguage:
 
 
 class WindllWlanApi:
+    """
+    The WlanApi calls of WinWiFi, made through the prebound functions of
+    win32wifi.WlanApi on the client handle shared by the process.
+    """
     SUCCESS = 0
 
     def __init__(self):
-        self.native_wifi = windll.wlanapi
-        self._handle = HANDLE()
-        self._nego_version = DWORD()
-        self._ifaces = pointer(WLAN_INTERFACE_INFO_LIST())
-
-    def wlan_func_generator(self, func, argtypes, restypes):
-        func.argtypes = argtypes
-        func.restypes = restypes
-        return func
+        self._handle = None
+        self._ifaces = []
 
-    def wlan_open_handle(self, client_version=2):
-        f = self.wlan_func_generator(self.native_wifi.WlanOpenHandle,
-                                     [DWORD, c_void_p, POINTER(DWORD), POINTER(HANDLE)],
-                                     [DWORD])
-
-        return f(client_version, None, byref(self._nego_version), byref(self._handle))
+    def wlan_open_handle(self):
+        self._handle = WlanApi.client_handle()
+        return self.SUCCESS
 
     def wlan_enum_interfaces(self):
-        f = self.wlan_func_generator(self.native_wifi.WlanEnumInterfaces,
-                                     [HANDLE, c_void_p, POINTER(POINTER(WLAN_INTERFACE_INFO_LIST))],
-                                     [DWORD])
-
-        return f(self._handle, None, byref(self._ifaces))
+        ifaces = WlanApi.WlanEnumInterfaces(self._handle)
+        try:
+            contents = ifaces.contents
+            infos = (contents.InterfaceInfo._type_ * contents.NumberOfItems).from_address(
+                addressof(contents.InterfaceInfo))
+            # Copied, the list is freed below
+            self._ifaces = [{'guid': GUID.from_buffer_copy(info.InterfaceGuid),
+                             'name': info.strInterfaceDescription} for info in infos]
+        finally:
+            WlanApi.WlanFreeMemory(ifaces)
+        return self.SUCCESS
 
     def wlan_scan(self, iface_guid):
-        f = self.wlan_func_generator(self.native_wifi.WlanScan,
-                                 [HANDLE, POINTER(GUID), POINTER(DOT11_SSID), POINTER(WLAN_RAW_DATA), c_void_p],
-                                 [DWORD])
-
-        return f(self._handle, iface_guid, None, None, None)
+        return WlanApi.WlanScan(self._handle, iface_guid)
 
     def get_interfaes(self):
-        interfaces = []
-        _interfaces = cast(self._ifaces.contents.InterfaceInfo,
-                           POINTER(WLAN_INTERFACE_INFO))
-        for i in range(0, self._ifaces.contents.dwNumberOfItems):
-            iface = {}
-            iface['guid'] = _interfaces[i].InterfaceGuid
-            iface['name'] = _interfaces[i].strInterfaceDescription
-            interfaces.append(iface)
-
-        return interfaces
+        return list(self._ifaces)
 
 
 class WinWiFi:
+    # Commands run by persistent interactive netsh processes (see session.py) instead of a process each
+    use_sessions: bool = True
+    _session_pool: Optional[NetshPool] = None
+    _session_pool_lock = threading.Lock()
+    # Commands changing the configuration, by their first two arguments: locale keys (and English
+    # defaults) of the lines netsh prints on success, one of which is checked in their response by
+    # the sessions (none: the command prints nothing on success)
+    _success_lines = {
+        ('wlan', 'add'): (('profile added', 'is added on interface'),
+                          ('profile updated', 'is updated on interface')),  # The profile existed
+        ('wlan', 'connect'): (('connection requested', 'Connection request was completed successfully'),),
+        ('wlan', 'disconnect'): (('disconnection requested', 'Disconnection request was completed successfully'),),
+        ('wlan', 'delete'): (('profile deleted', 'is deleted from interface'),),
+        ('interface', 'set'): (),
+    }
+
     @classmethod
     def get_profile_template(cls) -> str:
         return pkgutil.get_data(__package__, os.path.join('data', 'profile-template.xml')).decode()
 
+    @classmethod
+    def session_pool(cls) -> NetshPool:
+        if cls._session_pool is None:
+            with cls._session_pool_lock:
+                if cls._session_pool is None:
+                    pool = NetshPool(encoding=WinUILanguage.get('encoding', sys.stdout.encoding))
+                    atexit.register(pool.close)
+                    cls._session_pool = pool
+        return cls._session_pool
+
+    @classmethod
+    def _in_session(cls, args: List[str], check: bool) -> bool:
+        # Interactive netsh does not report exit statuses, a command whose status is checked needs
+        # a known success line (or a show query) to run in a session, others keep a process of their own
+        return cls.use_sessions and (not check or 'show' in args[:2] or tuple(args[:2]) in cls._success_lines)
+
+    @classmethod
+    def _expected_lines(cls, args: List[str]) -> Optional[Tuple[str, ...]]:
+        if tuple(args[:2]) not in cls._success_lines:
+            return None
+        return tuple(WinUILanguage.get(key, default) for key, default in cls._success_lines[tuple(args[:2])]) or ('',)
+
     @classmethod
     def netsh(cls, args: List[str], timeout: int = 3, check: bool = True) -> subprocess.CompletedProcess:
+        # Raises subprocess.CalledProcessError when <check> and the command failed
+        if cls._in_session(args, check):
+            return cls.session_pool().run(args, timeout=timeout, expect=cls._expected_lines(args) if check else None)
         return subprocess.run(
                 ['netsh'] + args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
                 timeout=timeout, check=check, encoding=WinUILanguage.get('encoding', sys.stdout.encoding))
 
     @classmethod
-    def get_profiles(cls, callback: Callable = lambda x: None) -> List[str]:
+    def netsh_lines(cls, args: List[str], timeout: int = 3) -> Iterator[str]:
+        """Runs netsh and yields the lines of its output as they are read."""
+        if cls._in_session(args, False):
+            yield from cls.session_pool().lines(args, timeout=timeout)
+            return
+        process = subprocess.Popen(
+                ['netsh'] + args, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL,
+                encoding=WinUILanguage.get('encoding', sys.stdout.encoding))
+        timer = threading.Timer(timeout, process.kill)
+        timer.start()
+        try:
+            line: str
+            for line in process.stdout:
+                yield line.rstrip('\r\n')
+        finally:
+            timer.cancel()
+            if process.poll() is None:
+                process.kill()
+            process.stdout.close()
+            process.wait()
+
+    @staticmethod
+    def interface_args(interface: Optional[str] = None) -> List[str]:
+        # <interface>: name (as shown by netsh) of the targeted interface, default lets netsh choose
+        return ['interface={}'.format(interface)] if interface else []
+
+    @classmethod
+    def get_profiles(cls, callback: Callable = lambda x: None, interface: Optional[str] = None) -> List[str]:
         profiles: List[str] = []
 
-        raw_data: str = cls.netsh(['wlan', 'show', 'profiles'], check=False).stdout
+        raw_data: str = cls.netsh(['wlan', 'show', 'profiles'] + cls.interface_args(interface), check=False).stdout
 
         line: str
         for line in raw_data.splitlines():
@@ -169,35 +200,44 @@ class WinWiFi:
         return profile
 
     @classmethod
-    def add_profile(cls, profile: str):
+    def add_profile(cls, profile: str, interface: Optional[str] = None):
         fd: io.RawIOBase
         path: str
         fd, path = tempfile.mkstemp()
 
         os.write(fd, profile.encode())
         try:
-            cls.netsh(['wlan', 'add', 'profile', 'filename={}'.format(path)])
+            cls.netsh(['wlan', 'add', 'profile', 'filename={}'.format(path)] + cls.interface_args(interface))
         finally:
             os.close(fd)
             os.remove(path)
 
     @classmethod
-    def scan(cls, callback: Callable = lambda x: None) -> List['WiFiAp']:
+    def scan(cls, callback: Callable = lambda x: None, interface: Optional[str] = None) -> List['WiFiAp']:
         win_dll_wlan = WindllWlanApi()
-        if win_dll_wlan.wlan_open_handle() is not win_dll_wlan.SUCCESS:
-            raise RuntimeError('Wlan dll open handle failed !')
-
-        if win_dll_wlan.wlan_enum_interfaces() is not win_dll_wlan.SUCCESS:
-            raise RuntimeError('Wlan dll enum interfaces failed !')
+        win_dll_wlan.wlan_open_handle()
+        win_dll_wlan.wlan_enum_interfaces()  # Raises WlanApi.WlanApiError on failure
 
         wlan_interfaces = win_dll_wlan.get_interfaes()
         if len(wlan_interfaces) == 0:
             raise RuntimeError('Do not get any wlan interfaces !')
 
-        win_dll_wlan.wlan_scan(byref(wlan_interfaces[0]['guid']))
+        iface_guid = wlan_interfaces[0]['guid']
+        if interface:
+            guids = [i.guid for i in cls.get_interfaces() if i.name == interface]
+            if not guids or not guids[0]:
+                raise RuntimeError('Cannot find wlan interface "{}"'.format(interface))
+            for wlan_interface in wlan_interfaces:
+                if str(wlan_interface['guid']).strip('{}').lower() == guids[0].strip('{}').lower():
+                    iface_guid = wlan_interface['guid']
+                    break
+            else:
+                raise RuntimeError('Cannot find wlan interface "{}"'.format(interface))
+        win_dll_wlan.wlan_scan(iface_guid)
         time.sleep(5)
 
-        cp: subprocess.CompletedProcess = cls.netsh(['wlan', 'show', 'networks', 'mode=bssid'])
+        cp: subprocess.CompletedProcess = cls.netsh(['wlan', 'show', 'networks', 'mode=bssid'] +
+                                                    cls.interface_args(interface))
         callback(cp.stdout)
         return list(map(WiFiAp.parse_netsh, [out for out in cp.stdout.split('\n\n') if out.startswith(WinUILanguage.get('SSID'))]))
 
@@ -220,38 +260,49 @@ class WinWiFi:
         cls.netsh(['interface', 'set', 'interface', 'name={}'.format(interface), 'admin=enabled'], timeout=15)
 
     @classmethod
-    def connect(cls, ssid: str, passwd: str = '', remember: bool = True):
+    def connect(cls, ssid: str, passwd: str = '', remember: bool = True, scan: bool = True,
+                interface: Optional[str] = None, auth: str = '', encrypt: str = ''):
+        # <scan>: look for the AP first. Without it (presence already confirmed,
+        # e.g. by a directed scan) nothing is scanned when the profile is stored,
+        # or when the <auth> and <encrypt> of the AP (as written to the profile,
+        # e.g. WPA2PSK and AES) are provided to create it. Otherwise the APs are
+        # listed to find them.
         # if not passwd:
-        for i in range(3):
-            aps: List['WiFiAp'] = cls.scan()
-            ap: 'WiFiAp'
-            if ssid in [ap.ssid for ap in aps]:
-                break
-            time.sleep(5)
-        else:
-            raise RuntimeError('Cannot find Wi-Fi AP')
-
-        if ssid not in cls.get_profiles():
-            ap = [ap for ap in aps if ap.ssid == ssid][0]
+        profiles: List[str] = cls.get_profiles(interface=interface)
+        if scan or (ssid not in profiles and not auth):
+            for i in range(3):
+                aps: List['WiFiAp'] = cls.scan(interface=interface)
+                ap: 'WiFiAp'
+                if ssid in [ap.ssid for ap in aps]:
+                    break
+                time.sleep(5)
+            else:
+                raise RuntimeError('Cannot find Wi-Fi AP')
+            if not auth:
+                ap = [ap for ap in aps if ap.ssid == ssid][0]
+                auth, encrypt = ap.auth, ap.encrypt
+
+        if ssid not in profiles:
             cls.add_profile(cls.gen_profile(
-                ssid=ssid, auth=ap.auth, encrypt=ap.encrypt, passwd=passwd, remember=remember))
-        cls.netsh(['wlan', 'connect', 'name={}'.format(ssid)])
+                ssid=ssid, auth=auth, encrypt=encrypt, passwd=passwd, remember=remember), interface)
+        cls.netsh(['wlan', 'connect', 'name={}'.format(ssid)] + cls.interface_args(interface))
 
         for i in range(30):
-            if list(filter(lambda it: it.ssid == ssid, WinWiFi.get_connected_interfaces())):
+            if list(filter(lambda it: it.ssid == ssid and (not interface or it.name == interface),
+                           cls.get_connected_interfaces())):
                 break
             time.sleep(1)
         else:
             raise RuntimeError('Cannot connect to Wi-Fi AP')
 
     @classmethod
-    def disconnect(cls):
-        cls.netsh(['wlan', 'disconnect'])
+    def disconnect(cls, interface: Optional[str] = None):
+        cls.netsh(['wlan', 'disconnect'] + cls.interface_args(interface))
 
     @classmethod
-    def forget(cls, *ssids: str):
+    def forget(cls, *ssids: str, interface: Optional[str] = None):
         for ssid in ssids:
-            cls.netsh(['wlan', 'delete', 'profile', ssid])
+            cls.netsh(['wlan', 'delete', 'profile', ssid] + cls.interface_args(interface))
 
 
 class WiFiAp:
@@ -333,6 +384,7 @@ class WiFiInterface:
         state: str = ''
         ssid: str = ''
         bssid: str = ''
+        guid: str = ''
 
         line: str
         for line in raw_data.splitlines():
@@ -341,6 +393,8 @@ class WiFiInterface:
             value: str = line.split(' : ', maxsplit=1)[1].strip()
             if line.startswith('    ' + WinUILanguage.get('Name')):
                 name = value
+            elif line.startswith('    GUID'):
+                guid = value
             elif line.startswith('    ' + WinUILanguage.get('State')):
                 state = value
             elif line.startswith('    ' + WinUILanguage.get('SSID')):
@@ -353,6 +407,8 @@ class WiFiInterface:
             c.ssid = ssid
         if bssid:
             c.bssid = bssid
+        if guid:
+            c.guid = guid
         return c
 
     def __init__(
@@ -366,6 +422,7 @@ class WiFiInterface:
         self._state: str = state
         self._ssid: Optional[str] = ssid
         self._bssid: Optional[str] = bssid
+        self.guid: Optional[str] = None
 
     @property
     def name(self) -> str:
@@ -0,0 +1,240 @@
+"""
+Persistent netsh sessions.
+
+Starting netsh (and loading its helper DLLs) dominates the cost of a netsh
+command. A NetshSession keeps an interactive netsh process (started without
+arguments, it reads its commands from stdin) and sends it one command per
+line. Interactive netsh has no echo command, but it repeats an unknown
+command in its error message ("The following command was not found: ..."),
+so every command is followed by a unique sentinel "command": the response
+ends at the line containing the sentinel.
+
+A command not answered within its timeout raises subprocess.TimeoutExpired
+and kills the process (a hung netsh cannot be resynchronized), the next
+command starts a new one. NetshPool hands out idle sessions to concurrent
+callers, starting up to <size> sessions:
+
+    pool = NetshPool()
+    cp = pool.run(['wlan', 'show', 'interfaces'])
+    for line in pool.lines(['wlan', 'show', 'profiles']):
+        ...
+
+Interactive netsh does not report the exit status of a command. A command
+changing the configuration is checked from its response instead: given the
+line netsh prints on success (<expect>, '' for a command silent on success,
+a tuple for a command with several success lines), a response without it
+raises subprocess.CalledProcessError (returncode 1, the response as output):
+
+    pool.run(['wlan', 'connect', 'name=My AP'], expect='completed successfully')
+    pool.run(['wlan', 'add', 'profile', 'filename=profile.xml'], expect=('is added on', 'is updated on'))
+
+The CompletedProcess of an unchecked command always has a returncode of 0.
+"""
+import itertools
+import os
+import queue
+import subprocess
+import threading
+import time
+from typing import Iterator, List, Optional, Sequence, Tuple, Union
+
+PROMPT = 'netsh>'
+
+
+def quote(arg: str) -> str:
+    """Quotes a netsh argument containing spaces ('name=My AP' -> 'name="My AP"')."""
+    if not arg or not any(c.isspace() for c in arg):
+        return arg
+    key, separator, value = arg.partition('=')
+    if separator and not any(c.isspace() for c in key):
+        return f'{key}="{value}"'
+    return f'"{arg}"'
+
+
+class NetshSession:
+    """One interactive netsh process, used by one thread at a time."""
+    _sentinels = itertools.count()
+
+    def __init__(self, command: Sequence[str] = ('netsh',), encoding: Optional[str] = None, prompt: str = PROMPT):
+        self.command = list(command)
+        self.encoding = encoding
+        self.prompt = prompt
+        self.process: Optional[subprocess.Popen] = None
+        self.commands = 0
+        self.restarts = 0  # Processes started to replace a hung or exited one
+        self._lines: Optional[queue.SimpleQueue] = None
+        self._started = False
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.poll() is None
+
+    def _start(self):
+        if self._started:
+            self.restarts += 1
+        self.kill()
+        self._started = True
+        self.process = subprocess.Popen(
+                self.command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                encoding=self.encoding, errors='replace')
+        # Read by a thread, so a response can be waited for with a timeout
+        self._lines = queue.SimpleQueue()
+        threading.Thread(target=self._read, args=(self.process.stdout, self._lines), daemon=True).start()
+
+    @staticmethod
+    def _read(stdout, lines):
+        try:
+            for line in stdout:
+                lines.put(line)
+        except (OSError, ValueError):
+            pass
+        finally:
+            stdout.close()
+            lines.put(None)  # End of output
+
+    def _next_line(self, deadline: float) -> Optional[str]:
+        """Returns the next output line (without prompts), None at the end of the output."""
+        line = self._lines.get(timeout=max(0., deadline - time.monotonic()))
+        if line is None:
+            return None
+        line = line.rstrip('\r\n')
+        while line.startswith(self.prompt):  # The prompt is not followed by a line break
+            line = line[len(self.prompt):]
+        return line
+
+    def lines(self, args: List[str], timeout: float = 3) -> Iterator[str]:
+        """Sends the command <args> and yields the lines of its response as they are read."""
+        if not self.alive:
+            self._start()
+        sentinel = f'pywinwifi-{os.getpid()}-{next(self._sentinels)}'
+        try:
+            self.process.stdin.write(' '.join(map(quote, args)) + '\n' + sentinel + '\n')
+            self.process.stdin.flush()
+        except OSError:
+            # Exited since the check above, retried once on a new process
+            self._start()
+            self.process.stdin.write(' '.join(map(quote, args)) + '\n' + sentinel + '\n')
+            self.process.stdin.flush()
+        self.commands += 1
+        deadline = time.monotonic() + timeout
+        synchronized = False
+        try:
+            while True:
+                try:
+                    line = self._next_line(deadline)
+                except queue.Empty:
+                    raise subprocess.TimeoutExpired(['netsh'] + list(args), timeout) from None
+                if line is None:
+                    raise subprocess.SubprocessError(f'netsh exited while running: {" ".join(args)}')
+                if sentinel in line:
+                    synchronized = True
+                    return
+                yield line
+        finally:
+            if not synchronized and not self._skip_to(sentinel, deadline):
+                self.kill()
+
+    def _skip_to(self, sentinel: str, deadline: float) -> bool:
+        """Discards the rest of a response that was not consumed, False if its end is not read in time."""
+        try:
+            while True:
+                line = self._next_line(deadline)
+                if line is None:
+                    return False
+                if sentinel in line:
+                    return True
+        except queue.Empty:
+            return False
+
+    def run(self, args: List[str], timeout: float = 3, expect: Optional[Union[str, Tuple[str, ...]]] = None) \
+            -> subprocess.CompletedProcess:
+        lines = list(self.lines(args, timeout))
+        cp = subprocess.CompletedProcess(['netsh'] + list(args), 0, '\n'.join(lines) + '\n' if lines else '', '')
+        if expect is not None:
+            output = cp.stdout.strip()
+            expected = (expect,) if isinstance(expect, str) else expect
+            if not any(line.lower() in output.lower() if line else not output for line in expected):
+                cp.returncode = 1
+                cp.check_returncode()
+        return cp
+
+    def kill(self):
+        process, self.process = self.process, None
+        if process is None:
+            return
+        if process.poll() is None:
+            process.kill()
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+        process.wait()
+        # stdout is closed by the reader thread, at the end of the output
+
+    def close(self, timeout: float = 1):
+        """Exits netsh (killed if it does not exit within <timeout> seconds)."""
+        if self.alive:
+            try:
+                self.process.stdin.write('exit\n')
+                self.process.stdin.flush()
+                self.process.wait(timeout)
+            except (OSError, subprocess.TimeoutExpired):
+                pass
+        self.kill()
+
+
+class NetshPool:
+    """Up to <size> NetshSessions, shared by the threads."""
+    def __init__(self, size: int = 2, **session_args):
+        self.size = size
+        self._session_args = session_args
+        self._sessions: List[NetshSession] = []
+        self._idle: List[NetshSession] = []
+        self._available = threading.Condition()
+
+    def _acquire(self) -> NetshSession:
+        with self._available:
+            while not self._idle and len(self._sessions) >= self.size:
+                self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            session = NetshSession(**self._session_args)
+            self._sessions.append(session)
+            return session
+
+    def _release(self, session: NetshSession):
+        with self._available:
+            if session in self._sessions:  # Not closed meanwhile
+                self._idle.append(session)
+            self._available.notify()
+
+    def run(self, args: List[str], timeout: float = 3, expect: Optional[Union[str, Tuple[str, ...]]] = None) \
+            -> subprocess.CompletedProcess:
+        session = self._acquire()
+        try:
+            return session.run(args, timeout, expect)
+        finally:
+            self._release(session)
+
+    def lines(self, args: List[str], timeout: float = 3) -> Iterator[str]:
+        session = self._acquire()
+        try:
+            yield from session.lines(args, timeout)
+        finally:
+            self._release(session)
+
+    def stats(self) -> dict:
+        with self._available:
+            sessions = list(self._sessions)
+        return {
+            'sessions': len(sessions),
+            'alive': sum(s.alive for s in sessions),
+            'commands': sum(s.commands for s in sessions),
+            'restarts': sum(s.restarts for s in sessions),
+        }
+
+    def close(self):
+        with self._available:
+            sessions, self._sessions, self._idle = self._sessions, [], []
+        for session in sessions:
+            session.close()
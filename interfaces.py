@@ -0,0 +1,125 @@
+"""
+Registry of the wireless interfaces.
+
+Enumerating the interfaces (and, for their names, running netsh) on every
+command is wasted work: the set of interfaces rarely changes. The registry
+enumerates them once, keeps them keyed by GUID and resolves descriptions,
+names (as shown by netsh) and indexes (in enumeration order) to interfaces. It subscribes to the
+interface_arrival/interface_removal notifications and enumerates again after
+any of them. An enumeration overlapping a notification is returned but not
+cached (every notification bumps a generation counter):
+
+    registry = InterfaceRegistry(getWirelessInterfaces, WinWiFi.get_interfaces, notification_manager)
+    interface = registry.get('Wi-Fi')
+
+The cached interfaces are not updated on state changes: query the interface
+for its current state, or call refresh() for a fresh enumeration.
+"""
+import threading
+
+from notifications import guid_key
+
+
+INTERFACE_CODES = ('interface_arrival', 'interface_removal')
+
+
+class InterfaceRegistry(object):
+    """
+    :Args:
+     - enumerate_interfaces:    (callable) Returns the WirelessInterface list.
+     - enumerate_names:         (callable) Returns the netsh interfaces (with
+                                name and guid), only called to resolve names.
+     - manager:                 (NotificationManager) Source of the
+                                interface_arrival/removal notifications.
+    """
+    def __init__(self, enumerate_interfaces, enumerate_names=None, manager=None):
+        self._enumerate_interfaces = enumerate_interfaces
+        self._enumerate_names = enumerate_names
+        self._manager = manager
+        self._lock = threading.RLock()
+        self._interfaces = None  # GUID key -> WirelessInterface, in enumeration order
+        self._names = None  # GUID key -> name
+        self._subscription = None
+        self._generation = 0  # Bumped by invalidate()
+        self.enumerations = 0
+        self.invalidations = 0
+
+    def _subscribe(self):
+        if self._manager is not None and self._subscription is None:
+            self._subscription = self._manager.subscribe(callback=self.invalidate, codes=INTERFACE_CODES)
+
+    def invalidate(self, event=None):
+        """Drops the cached interfaces (and names), called on arrival/removal."""
+        # Called on the notification thread, without the lock: bump the generation, then drop the references
+        self._generation += 1
+        self._interfaces = None
+        self._names = None
+        self.invalidations += 1
+
+    def _store(self, attribute, value, generation):
+        """Caches <value> unless invalidate() ran since <generation> was read (before or while storing)."""
+        if self._generation == generation:
+            setattr(self, attribute, value)
+            if self._generation != generation:
+                setattr(self, attribute, None)
+
+    def refresh(self):
+        """Enumerates the interfaces (with their current state) again."""
+        with self._lock:
+            self._subscribe()
+            generation = self._generation
+            interfaces = self._enumerate_interfaces()
+            self.enumerations += 1
+            self._store('_interfaces', {guid_key(i.guid_string): i for i in interfaces}, generation)
+            return interfaces
+
+    def interfaces(self):
+        """Returns the (cached) WirelessInterface list."""
+        interfaces = self._interfaces
+        if interfaces is None:
+            return self.refresh()
+        return list(interfaces.values())
+
+    def names(self):
+        """Returns the (cached) GUID key -> name (as used by netsh) dict."""
+        names = self._names
+        if names is None:
+            with self._lock:
+                self._subscribe()
+                generation = self._generation
+                names = {}
+                for netsh_interface in (self._enumerate_names() if self._enumerate_names else ()):
+                    guid = getattr(netsh_interface, 'guid', None)
+                    if guid:
+                        names[guid_key(guid)] = netsh_interface.name
+                self._store('_names', names, generation)
+        return names
+
+    def name(self, interface):
+        """Returns the name of <interface> (as used by netsh), None if unknown."""
+        return self.names().get(guid_key(interface.guid_string))
+
+    def get(self, key, default=None):
+        """Returns the interface of a GUID, description, name or index (from 0, in enumeration order)."""
+        interfaces = self.interfaces()
+        key = str(key)
+        guid = guid_key(key)  # Looked up in the returned list, the enumeration may not be cached
+        for interface in interfaces:
+            if guid_key(interface.guid_string) == guid:
+                return interface
+        for interface in interfaces:
+            if interface.description == key:
+                return interface
+        for name_guid, name in self.names().items():
+            if name == key:
+                for interface in interfaces:
+                    if guid_key(interface.guid_string) == name_guid:
+                        return interface
+        if key.isdigit() and int(key) < len(interfaces):
+            return interfaces[int(key)]
+        return default
+
+    def close(self):
+        if self._subscription is not None:
+            self._subscription.close()
+            self._subscription = None
@@ -8,6 +8,7 @@ class Logger(object):
     _handlers = []
     _logger = None
     _enabled = True
+    _wrapper_files = {__file__}  # Files skipped when looking up the calling module
 
     @classmethod
     def _reset(cls):
@@ -90,7 +91,7 @@ class Logger(object):
             caller = inspect.stack()[stack_index]
             caller_module = inspect.getmodule(caller[0])
 
-            while caller_module.__file__ == __file__:
+            while caller_module.__file__ in cls._wrapper_files:
                 stack_index += 1
                 caller = inspect.stack()[stack_index]
                 caller_module = inspect.getmodule(caller[0])
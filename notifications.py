@@ -0,0 +1,263 @@
+"""
+Management and dispatch of the WLAN notifications.
+
+A NotificationManager shares a single native notification registration among
+any number of subscribers and fans every WlanEvent out to the subscriptions whose filters (sources, codes,
+interface GUIDs) match it. The dispatch path never blocks the native callback
+thread: every subscription buffers a bounded number of events and counts the
+events it had to drop. Callback subscriptions are called on a worker thread
+of their own, so a slow callback only delays (and overflows) its own
+subscription.
+
+    manager = NotificationManager(registerNotification, unregisterNotification)
+    with manager.subscribe(codes=['scan_complete'], interfaces=[guid]) as subscription:
+        WlanScan(handle, guid)
+        event = subscription.get(timeout=10)
+"""
+import collections
+import itertools
+import re
+import threading
+import time
+
+_CODE_PREFIX = re.compile(r'^wlan_notification_[a-z0-9]+_')
+_SOURCE_PREFIX = 'WLAN_NOTIFICATION_SOURCE_'
+
+
+def short_code(code):
+    """Returns a notification code without prefix, e.g. "scan_complete"."""
+    return _CODE_PREFIX.sub('', str(code))
+
+
+def short_source(source):
+    """Returns a notification source without prefix, e.g. "ACM"."""
+    source = str(source)
+    return source[len(_SOURCE_PREFIX):] if source.startswith(_SOURCE_PREFIX) else source
+
+
+def guid_key(guid):
+    """Returns a GUID (structure or string) as comparable key."""
+    return str(guid).strip('{}').upper()
+
+
+class Subscription(object):
+    """
+    A (filtered) subscription to the notifications of a NotificationManager.
+
+    Matching events are buffered (at most <maxsize>) and retrieved with
+    get(), or passed to <callback> by a worker thread of the subscription.
+    When the buffer is full, the oldest event is discarded if <drop_oldest>
+    is set, the new one otherwise. No callback is started after close(), a
+    running one is not waited for.
+    """
+    def __init__(self, manager, callback=None, sources=None, codes=None, interfaces=None,
+                 maxsize=256, drop_oldest=False):
+        self.manager = manager
+        self.handle = None
+        self.callback = callback
+        self.sources = frozenset(short_source(s) for s in sources) if sources else None
+        self.codes = frozenset(short_code(c) for c in codes) if codes else None
+        self.interfaces = frozenset(guid_key(i) for i in interfaces) if interfaces else None
+        self.maxsize = maxsize
+        self.drop_oldest = drop_oldest
+        self._events = collections.deque()
+        self._ready = threading.Event()
+        self.delivered = 0
+        self.dropped = 0
+        self.closed = False
+        self._worker = None
+        if callback is not None:
+            self._worker = threading.Thread(target=self._run_callback, name='NotificationCallback', daemon=True)
+            self._worker.start()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def pending(self):
+        """Number of buffered events."""
+        return len(self._events)
+
+    def matches(self, source, code, interface):
+        return (self.sources is None or source in self.sources) and \
+               (self.codes is None or code in self.codes) and \
+               (self.interfaces is None or interface in self.interfaces)
+
+    def _deliver(self, event):
+        # Called on the native notification thread
+        if len(self._events) >= self.maxsize:
+            self.dropped += 1
+            if not self.drop_oldest:
+                return
+            try:
+                self._events.popleft()
+            except IndexError:
+                pass
+        self._events.append(event)
+        self.delivered += 1
+        self._ready.set()
+
+    def _run_callback(self):
+        while True:
+            event = self.get()
+            if event is None or self.closed:
+                return
+            try:
+                self.callback(event)
+            except Exception:
+                self.manager.errors += 1
+
+    def get(self, timeout=None):
+        """Returns the next buffered event, or None after <timeout> seconds."""
+        end = None if timeout is None else time.monotonic() + timeout
+        while True:
+            try:
+                return self._events.popleft()
+            except IndexError:
+                pass
+            self._ready.clear()
+            if self._events:
+                continue
+            remaining = None if end is None else end - time.monotonic()
+            if self.closed or (remaining is not None and remaining <= 0):
+                return None
+            self._ready.wait(remaining)
+
+    def wait_for(self, predicate=lambda event: True, timeout=None, cancel_event=None):
+        """
+        Returns the first event matching <predicate>, or None after <timeout>
+        seconds or once <cancel_event> is set.
+        """
+        end = None if timeout is None else time.monotonic() + timeout
+        while not (cancel_event and cancel_event.is_set()):
+            remaining = None if end is None else end - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                return None
+            # Poll in slices to notice <cancel_event>
+            event = self.get(0.1 if remaining is None else min(0.1, remaining))
+            if event is not None and predicate(event):
+                return event
+            if self.closed:
+                return None
+        return None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.manager.unregister(self.handle)
+            self._ready.set()
+
+
+class NotificationManager(object):
+    """
+    Shares a single native notification registration among any number of
+    listeners and fans every WlanEvent out to the subscriptions whose
+    filters match it.
+
+    Subscriptions are kept in a handle -> subscription dict. The native
+    callback is registered (through <register>) with the first subscription
+    and unregistered (through <unregister>) as soon as the last one is closed,
+    or by close(), which also closes every remaining subscription.
+    """
+    def __init__(self, register, unregister):
+        self._register = register
+        self._unregister = unregister
+        self._lock = threading.Lock()
+        self._subscriptions = {}  # handle -> Subscription
+        self._snapshot = ()  # Subscriptions iterated by dispatch(), replaced on changes
+        self._handles = itertools.count(1)
+        self._notification_object = None
+        self.registrations = 0
+        self.dispatched = 0
+        self.errors = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    @property
+    def registered(self):
+        """Whether the native callback is currently registered."""
+        return self._notification_object is not None
+
+    @property
+    def dropped(self):
+        return sum(s.dropped for s in self._snapshot)
+
+    @property
+    def subscriptions(self):
+        return self._snapshot
+
+    def subscribe(self, callback=None, sources=None, codes=None, interfaces=None, maxsize=256,
+                  drop_oldest=False):
+        """Returns a new Subscription, see Subscription for the arguments."""
+        subscription = Subscription(self, callback, sources, codes, interfaces, maxsize, drop_oldest)
+        with self._lock:
+            subscription.handle = next(self._handles)
+            self._subscriptions[subscription.handle] = subscription
+            self._snapshot = tuple(self._subscriptions.values())
+            if self._notification_object is None:
+                self._notification_object = self._register(self.dispatch)
+                self.registrations += 1
+        return subscription
+
+    def register(self, callback, **filters):
+        """Registers a notification <callback>, returns its handle."""
+        return self.subscribe(callback, **filters).handle
+
+    def unregister(self, handle):
+        """Unregisters the subscription (or callback) of <handle>."""
+        with self._lock:
+            subscription = self._subscriptions.pop(handle, None)
+            self._snapshot = tuple(self._subscriptions.values())
+            notification_object = None
+            if not self._subscriptions:
+                notification_object, self._notification_object = self._notification_object, None
+        if subscription is not None:
+            subscription.close()
+        if notification_object is not None:
+            self._unregister(notification_object)
+        return subscription is not None
+
+    def unsubscribe(self, subscription):
+        self.unregister(subscription.handle)
+
+    def close(self):
+        """Closes every subscription and releases the native registration."""
+        with self._lock:
+            subscriptions = list(self._subscriptions.values())
+            self._subscriptions.clear()
+            self._snapshot = ()
+            notification_object, self._notification_object = self._notification_object, None
+        for subscription in subscriptions:
+            subscription.close()
+        if notification_object is not None:
+            self._unregister(notification_object)
+
+    def dispatch(self, event):
+        """Delivers a WlanEvent to the matching subscriptions (never blocks)."""
+        self.dispatched += 1
+        subscriptions = self._snapshot
+        if not subscriptions:
+            return
+        guid = event.interfaceGuid
+        try:
+            # Detach the GUID from the native buffer, freed after the callback
+            event.interfaceGuid = type(guid).from_buffer_copy(guid)
+        except TypeError:
+            pass
+        event.timestamp = time.time()
+        source = short_source(event.notificationSource)
+        code = short_code(event.notificationCode)
+        interface = guid_key(event.interfaceGuid)
+        for subscription in subscriptions:
+            if subscription.matches(source, code, interface):
+                try:
+                    subscription._deliver(event)
+                except Exception:
+                    self.errors += 1
@@ -0,0 +1,196 @@
+"""
+Lightweight span based profiler.
+
+Spans are aggregated into a call tree (per name and parent span): call count,
+total, self, min and max duration. Functions are instrumented by replacing
+them with a timing wrapper when profiling is enabled, so there is no overhead
+at all while the profiler is disabled:
+
+    Profiler.enable()
+    Profiler.instrument(module_or_class, 'function_name')
+    ...
+    print(Profiler.report())
+"""
+import functools
+import json
+import threading
+import time
+
+
+class _Node(object):
+    __slots__ = ('name', 'calls', 'total', 'child_total', 'min', 'max', 'children')
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.total = 0.
+        self.child_total = 0.
+        self.min = None
+        self.max = 0.
+        self.children = {}
+
+    def add(self, duration):
+        self.calls += 1
+        self.total += duration
+        self.min = duration if self.min is None else min(self.min, duration)
+        self.max = max(self.max, duration)
+
+    def to_dict(self):
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'total_ms': round(self.total * 1000, 3),
+            'self_ms': round((self.total - self.child_total) * 1000, 3),
+            'min_ms': round((self.min or 0.) * 1000, 3),
+            'max_ms': round(self.max * 1000, 3),
+            'children': [c.to_dict() for c in self.children.values()],
+        }
+
+
+class _Span(object):
+    __slots__ = ('_name', '_node', '_parent', '_start')
+
+    def __init__(self, name):
+        self._name = name
+
+    def __enter__(self):
+        local = Profiler._local
+        self._parent = getattr(local, 'node', None) or Profiler._root
+        with Profiler._lock:
+            node = self._parent.children.get(self._name)
+            if node is None:
+                node = self._parent.children[self._name] = _Node(self._name)
+        self._node = local.node = node
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        duration = time.perf_counter() - self._start
+        with Profiler._lock:
+            self._node.add(duration)
+            if self._parent is not Profiler._root:
+                self._parent.child_total += duration
+        Profiler._local.node = self._parent
+
+
+class _NullSpan(object):
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Profiler(object):
+    _enabled = False
+    _lock = threading.Lock()
+    _local = threading.local()
+    _root = _Node('')
+    _instrumented = []
+
+    @classmethod
+    def enable(cls, enabled=True):
+        cls._enabled = enabled
+        if not enabled:
+            cls.uninstrument()
+
+    @classmethod
+    def disable(cls):
+        cls.enable(enabled=False)
+
+    @classmethod
+    def is_enabled(cls):
+        return cls._enabled
+
+    @classmethod
+    def reset(cls):
+        with cls._lock:
+            cls._root = _Node('')
+        cls._local = threading.local()
+
+    @classmethod
+    def span(cls, name):
+        """Returns a context manager timing a (nested) span named <name>."""
+        if not cls._enabled:
+            return _NULL_SPAN
+        return _Span(name)
+
+    @classmethod
+    def profiled(cls, name):
+        """Returns a decorator timing each call of a function as span <name>."""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                if not cls._enabled:
+                    return func(*args, **kwargs)
+                with _Span(name):
+                    return func(*args, **kwargs)
+            wrapper.__wrapped_by_profiler__ = func
+            return wrapper
+        return decorator
+
+    @classmethod
+    def instrument(cls, obj, attr, name=None):
+        """
+        Replaces the function (or class/static method) <attr> of <obj> (a
+        module or class) with a profiled version, until uninstrument() (or
+        disable()) is called.
+        """
+        original = vars(obj)[attr]
+        if isinstance(original, (classmethod, staticmethod)):
+            func = original.__func__
+        else:
+            func = original
+        if hasattr(func, '__wrapped_by_profiler__'):
+            return
+        if name is None:
+            owner = getattr(obj, '__qualname__', None)
+            name = f'{owner}.{attr}' if owner else attr
+        wrapper = cls.profiled(name)(func)
+        if isinstance(original, (classmethod, staticmethod)):
+            wrapper = type(original)(wrapper)
+        setattr(obj, attr, wrapper)
+        cls._instrumented.append((obj, attr, original))
+
+    @classmethod
+    def uninstrument(cls):
+        while cls._instrumented:
+            obj, attr, original = cls._instrumented.pop()
+            setattr(obj, attr, original)
+
+    """ Reports """
+
+    @classmethod
+    def to_dict(cls):
+        with cls._lock:
+            return [c.to_dict() for c in cls._root.children.values()]
+
+    @classmethod
+    def report(cls, fmt='text'):
+        """Returns the timing tree as text table or (fmt='json') JSON."""
+        spans = cls.to_dict()
+        if fmt == 'json':
+            return json.dumps({'spans': spans})
+
+        rows = []
+
+        def add_rows(span, depth):
+            rows.append(('  ' * depth + span['name'], span))
+            for child in span['children']:
+                add_rows(child, depth + 1)
+
+        for span in spans:
+            add_rows(span, 0)
+        width = max([len(r[0]) for r in rows] + [len('Span')])
+        lines = [f'{"Span":<{width}} {"calls":>7} {"total (ms)":>11} {"self (ms)":>10} '
+                 f'{"min (ms)":>9} {"max (ms)":>9}',
+                 '-' * (width + 51)]
+        for label, span in rows:
+            lines.append(f'{label:<{width}} {span["calls"]:>7} {span["total_ms"]:>11.2f} '
+                         f'{span["self_ms"]:>10.2f} {span["min_ms"]:>9.2f} {span["max_ms"]:>9.2f}')
+        return '\n'.join(lines)
@@ -1,76 +1,110 @@
 import argparse
+import atexit
 import json
 import os
-import queue
+import re
+import shlex
 import sys
 import threading
 import time
+from ctypes import addressof
 
+try:
+    import orjson  # Optional, faster JSON encoder
+except ImportError:
+    orjson = None
+
+from history import ProfileParser, collect_profiles_json, parse_profile_groups, render_details_text, \
+    render_profiles_text
+from interfaces import InterfaceRegistry
 from logger import Logger
-from win32wifi.Win32Wifi import *
-from winwifi import WinWiFi
+from notifications import NotificationManager, guid_key
+from profiler import Profiler
+from selection import select_ap
+from singleflight import SingleFlight
+
+_backend_name = os.environ.get('PYWINWIFI_BACKEND', '').lower()
+if _backend_name in ('fake', 'replay'):
+    # Simulated backend, see fakewifi.py
+    from fakewifi import *
+    from fakewifi import WinWiFi
+    if _backend_name == 'replay':
+        # Replays a capture recorded with --capture, see capture.py
+        from capture import ReplayEnvironment
+        set_environment(ReplayEnvironment.load(os.environ['PYWINWIFI_REPLAY'],
+                                               speed=float(os.environ.get('PYWINWIFI_REPLAY_SPEED', 1))))
+else:
+    from win32wifi.Win32Wifi import *
+    from winwifi import WinWiFi
+
+
+# Shared registration of the WLAN notifications, see notifications.py
+notification_manager = NotificationManager(lambda callback: registerNotification(callback),
+                                           lambda obj: unregisterNotification(obj))
+atexit.register(notification_manager.close)
+
+# Cached wireless interfaces, see interfaces.py
+interface_registry = InterfaceRegistry(lambda: getWirelessInterfaces(),
+                                       lambda: WinWiFi.get_interfaces(),
+                                       notification_manager)
+
+# Parsed profile details, cached by profile name and XML hash, see history.py
+profile_parser = ProfileParser()
+
+# Scans in progress, keyed by interface GUID and directed SSID, see singleflight.py
+scan_flights = SingleFlight()
 
 
 class WlanNotificationThread(threading.Thread):
-    def __init__(self, state, exit_event=None):
+    def __init__(self, state, exit_event=None, interface=None):
         super().__init__(name='NotificationThread')
         self.notification_state = str(state)
         self.exit_event = exit_event
-        self._thread_lock = threading.Lock()
-        self._work_queue = queue.Queue(8)
-        self._notification_object = None
+        self.interface = interface
+        self.event = None
+        self._subscription = None
 
         if not self.notification_state.startswith('wlan_notification_acm_'):
             self._notification_state = f'wlan_notification_acm_{self.notification_state}'
         else:
             self._notification_state = self.notification_state
 
-    def run(self):
+    def start(self):
+        # Subscribe before starting, so no notification can be missed
         self._register_callback()
+        super().start()
 
+    def run(self):
         try:
-            while True:
-                if self.exit_event and self.exit_event.isSet():
-                    break
-                self._lock()
-                if self._work_queue.empty():
-                    self._unlock()
-                else:
-                    obj = self._work_queue.get()
-
-                    try:
-                        Logger.debug(obj)
-                    except:
-                        Logger.debug('unknown wlan_notification')
-
-                    self._unlock()
-                    if str(obj) == self._notification_state:
-                        break
-                time.sleep(.5)
+            self.event = self._subscription.wait_for(cancel_event=self.exit_event)
+            if self.event is not None:
+                Logger.debug(self.event)
         finally:
             self._unregister_callback()
 
-    def _lock(self):
-        self._thread_lock.acquire()
-
-    def _unlock(self):
-        self._thread_lock.release()
-
     def _register_callback(self):
-        if self._notification_object:
+        if self._subscription:
             print('Notification object already exists, unregistering it')
             self._unregister_callback()
-        self._notification_object = registerNotification(self._notification_callback)
+        interfaces = [self.interface.guid] if self.interface is not None else None
+        self._subscription = notification_manager.subscribe(codes=[self._notification_state],
+                                                               interfaces=interfaces)
 
     def _unregister_callback(self):
-        if not self._notification_object:
+        if not self._subscription:
             return
-        unregisterNotification(self._notification_object)
+        self._subscription.close()
+
+
+# Windows FILETIME (100 ns intervals since 1601-01-01) of the unix epoch
+_FILETIME_EPOCH_OFFSET = 116444736000000000
 
-    def _notification_callback(self, obj):
-        self._lock()
-        self._work_queue.put(obj)
-        self._unlock()
+
+def _filetime_age(filetime):
+    """Returns the seconds elapsed since <filetime> (a FILETIME), None when not set."""
+    if not filetime:
+        return None
+    return max(0., (time.time_ns() // 100 + _FILETIME_EPOCH_OFFSET - filetime) / 10 ** 7)
 
 
 class ExtWirelessNetworkBss(WirelessNetworkBss):
@@ -85,6 +119,9 @@ class ExtWirelessNetworkBss(WirelessNetworkBss):
         # See https://github.com/kedos/win32wifi/pull/8 for more info
         obj.band = '5' if str(obj.ch_center_frequency)[0] == '5' else '2.4'
         obj.channels = obj._get_channels_from_information_elements()
+        obj.width = obj._get_channel_width_from_information_elements()
+        # Seconds since the BSS was last received (by the last scan, or the background scans of the OS)
+        obj.age = _filetime_age(getattr(obj, 'host_timestamp', 0))
         return obj
 
     def __str__(self):
@@ -131,6 +168,36 @@ class ExtWirelessNetworkBss(WirelessNetworkBss):
                 pass
         return (channel_1, channel_2) if channel_2 else (channel_1,)
 
+    def _get_channel_width_from_information_elements(self):
+        # Channel width in MHz: 20, 40 (HT, see above) or 80/160 (VHT)
+        width = 40 if len(self.channels) > 1 else 20
+        for ie in self.information_elements:
+            if ie.element_id == 192 and ie.body:  # VHT Operations
+                CHANNEL_WIDTH = 0
+                vht_width = ord(ie.body[CHANNEL_WIDTH])
+                if vht_width == 1:
+                    width = 80
+                elif vht_width in (2, 3):
+                    width = 160  # 160 or 80+80 MHz
+        return width
+
+    def _get_center_channel_from_information_elements(self):
+        # Channel at the center of the (20, 40, 80 or 160 MHz) channel span
+        if self.width >= 80:
+            for ie in self.information_elements:
+                if ie.element_id == 192 and len(ie.body) > 1:  # VHT Operations
+                    SEGMENT_0 = 1
+                    return ord(ie.body[SEGMENT_0])
+        return sum(self.channels) / len(self.channels)
+
+    def _get_qbss_load_from_information_elements(self):
+        # (station count, channel utilisation 0-255), None without QBSS Load element
+        for ie in self.information_elements:
+            if ie.element_id == 11 and len(ie.body) >= 3:  # QBSS Load
+                body = b''.join(ie.body[:3])
+                return body[0] | body[1] << 8, body[2]
+        return None
+
 
 class ExtWirelessNetwork(WirelessNetwork):
     @classmethod
@@ -142,6 +209,12 @@ class ExtWirelessNetwork(WirelessNetwork):
     def add_bss(self, bss):
         self.bsss.append(bss)
 
+    @property
+    def age(self):
+        """Age (seconds) of the most recently received BSS, None when unknown."""
+        ages = [bss.age for bss in self.bsss if bss.age is not None]
+        return min(ages) if ages else None
+
     def __str__(self):
         return os.linesep.join((self.network_str().strip(),
                                 self.bsss_str().strip()))
@@ -150,8 +223,20 @@ class ExtWirelessNetwork(WirelessNetwork):
         return super().__str__().strip()
 
     def network_json(self):
-        split_lines = [l.split(':', 1) for l in self.network_str().splitlines()]
-        return {s[0].strip():s[1].strip() for s in split_lines}
+        # Same keys and values as (the lines of) WirelessNetwork.__str__
+        return {
+            'Profile Name': self.profile_name or '<No Profile>',
+            'SSID': '%s' % self.ssid,
+            'BSS Type': '%s' % self.bss_type,
+            'Number of BSSIDs': '%d' % self.number_of_bssids,
+            'Connectable': '%r' % self.connectable,
+            'Number of PHY types': '%d' % self.number_of_phy_types,
+            'Signal Quality': '%d%%' % self.signal_quality,
+            'Security Enabled': '%r' % self.security_enabled,
+            'Authentication': '%s' % self.auth,
+            'Cipher': '%s' % self.cipher,
+            'Flags': '%d' % self.flags,
+        }
 
     def bsss_str(self):
         s = []
@@ -160,6 +245,8 @@ class ExtWirelessNetwork(WirelessNetwork):
             s.append(f'\tMAC: {bss.bssid}')
             s.append(f'\tBand: {bss.band} GHz')
             s.append(f'\tSignal: {bss.rssi} dBm')
+            if bss.age is not None:
+                s.append(f'\tAge: {bss.age:.1f} s')
             if not bss.channels or not bss.channels[0]:
                 continue
             delim = ''
@@ -178,6 +265,8 @@ class ExtWirelessNetwork(WirelessNetwork):
                 'Band': f'{bss.band} GHz',
                 'Signal': f'{bss.rssi} dBm'
             }
+            if bss.age is not None:
+                d['Age'] = f'{bss.age:.1f} s'
             if bss.channels and bss.channels[0]:
                 delim = ''
                 if len(bss.channels) > 1:
@@ -188,145 +277,293 @@ class ExtWirelessNetwork(WirelessNetwork):
         return {'BSSID': l}
 
 
-def _wlan_get_interfaces(state=None):
+def _wlan_get_interfaces(state=None, interface=None):
     """
     :Args:
-     - state:   (str) The current state of the interfaces to retrieve.
-                Can be one of:
-                    ad_hoc_network_formed, associating, authenticating,
-                    connected, disconnected, disconnecting, discovering,
-                    not_ready
-                Default returns all, regardless of the current state.
+     - state:       (str) The current state of the interfaces to retrieve.
+                    Can be one of:
+                        ad_hoc_network_formed, associating, authenticating,
+                        connected, disconnected, disconnecting, discovering,
+                        not_ready
+                    Default returns all, regardless of the current state.
+     - interface:   (WirelessInterface) The only interface to consider (see
+                    --interface), default considers every interface.
     """
-    interfaces = getWirelessInterfaces()
+    interfaces = [interface] if interface is not None else interface_registry.interfaces()
     if not state:
         return interfaces
     if not state.startswith('wlan_interface_state_'):
         state = f'wlan_interface_state_{state}'
-    requested_interfaces = []
-    for interface in interfaces:
-        res = queryInterface(interface, 'current_connection')
-        if res[1].get('isState') == state:
-            requested_interfaces.append(interface)
-    return requested_interfaces
+    return [i for i in interfaces if _wlan_interface_state(i) == state]
 
 
-def _wlan_scan_interface(interface, timeout=10):
-    exit_event = threading.Event() if timeout else None
-    notification_thread = WlanNotificationThread('scan_complete', exit_event)
-    notification_thread.start()
+def _wlan_interface_state(interface):
+    """Returns the current state of <interface>, e.g. "wlan_interface_state_connected"."""
+    return queryInterface(interface, 'interface_state')[1]
 
-    handle = WlanOpenHandle()
-    res = WlanScan(handle, interface.guid)
-    WlanCloseHandle(handle)
 
-    if timeout:
-        notification_thread.join(timeout)
-        exit_event.set()
-    notification_thread.join()
+def _netsh_name(interface):
+    """Returns the name of <interface> as used by netsh (interface=NAME), None for None."""
+    if interface is None:
+        return None
+    name = interface_registry.name(interface)
+    if not name:
+        raise RuntimeError(f'Cannot find the netsh name of {interface.description}')
+    return name
+
+
+def _interface_label(interface):
+    """Returns the name (or the description) of <interface> to show."""
+    return interface_registry.name(interface) or interface.description
+
+
+def _wlan_get_bss_table(interface):
+    """
+    Returns the BSS list of <interface> as a BssTable (columns of the BSSIDs,
+    RSSIs, link qualities, ... with the IEs decoded on demand), see
+    bsstable.py. Requires NumPy.
+    """
+    from bsstable import BssTable
+    with wlan_handle() as handle, wlan_memory(WlanGetNetworkBssList(handle, interface.guid)) as bss_list:
+        return BssTable.from_bss_list(bss_list)
+
+
+def _ssid_list(ssid):
+    """Returns <ssid> (str, bytes or an iterable of those) as list of bytes."""
+    if isinstance(ssid, (str, bytes)):
+        ssid = (ssid,)
+    return [s if isinstance(s, bytes) else str(s).encode('utf-8') for s in ssid]
+
+
+def _wlan_scan_interface(interface, timeout=10, ssid=None):
+    """
+    Scans on <interface> and waits (at most <timeout> seconds) for the scan to
+    complete. With <ssid> (bytes) the scan is directed: the driver also probes
+    for that SSID, so hidden networks with that SSID are found as well.
+
+    Concurrent scans of the same interface (and SSID) are coalesced: a caller
+    arriving while such a scan is in progress waits for it instead of
+    starting another one, see scan_stats().
+    """
+    key = (guid_key(interface.guid_string), ssid)
+    return scan_flights.do(key, lambda: _wlan_issue_scan(interface, timeout, ssid))
+
+
+def scan_stats():
+    """Returns the number of scans issued and coalesced (joined a scan in progress)."""
+    return scan_flights.stats()
+
+
+def _wlan_issue_scan(interface, timeout, ssid):
+    exit_event = threading.Event()
+    notification_thread = WlanNotificationThread('scan_complete', exit_event, interface)
+    notification_thread.start()
+
+    try:
+        with wlan_handle() as handle:
+            if ssid:
+                res = WlanScan(handle, interface.guid, ssid)
+            else:
+                res = WlanScan(handle, interface.guid)
+        notification_thread.join(timeout or None)
+    finally:
+        exit_event.set()  # Timed out, or the scan failed to start
+        notification_thread.join()
 
     return res
 
 
-def get_connected_ap():
+def get_connected_ap(interface=None):
     try:
-        return list(WinWiFi.get_connected_interfaces())
+        interfaces = WinWiFi.get_connected_interfaces()
+        if interface is not None:
+            key = guid_key(interface.guid_string)
+            interfaces = [i for i in interfaces if i.guid and guid_key(i.guid) == key]
+        return list(interfaces)
     except:
         return []
 
 
-def scan_aps(callback=lambda x: None):
+def scan_aps(callback=lambda x: None, interface=None):
     # Not used at the moment
     try:
-        return WinWiFi.scan(callback=callback)
+        return WinWiFi.scan(callback=callback, interface=_netsh_name(interface))
     except:
         return []
 
 
-def connect_ap(ssid, password='', remember=False, **kwargs):
+# Authentication and encryption of a profile (see WinWiFi.gen_profile) per DOT11 algorithm
+_PROFILE_AUTH = {
+    'DOT11_AUTH_ALGO_80211_OPEN': 'open',
+    'DOT11_AUTH_ALGO_80211_SHARED_KEY': 'shared',
+    'DOT11_AUTH_ALGO_WPA': 'WPA',
+    'DOT11_AUTH_ALGO_WPA_PSK': 'WPAPSK',
+    'DOT11_AUTH_ALGO_RSNA': 'WPA2',
+    'DOT11_AUTH_ALGO_RSNA_PSK': 'WPA2PSK',
+}
+_PROFILE_ENCRYPTION = {
+    'DOT11_CIPHER_ALGO_NONE': 'none',
+    'DOT11_CIPHER_ALGO_WEP40': 'WEP',
+    'DOT11_CIPHER_ALGO_WEP104': 'WEP',
+    'DOT11_CIPHER_ALGO_WEP': 'WEP',
+    'DOT11_CIPHER_ALGO_TKIP': 'TKIP',
+    'DOT11_CIPHER_ALGO_CCMP': 'AES',
+}
+
+
+def connect_ap(ssid, password='', remember=False, interface=None, **kwargs):
     log_msg = f'Connecting to SSID: {ssid}'
     if password:
         log_msg = f'{log_msg} (Password: {password})'
     if remember:
         log_msg = f'{log_msg} (remembering)'
+    if interface is not None:
+        log_msg = f'{log_msg} (on {_interface_label(interface)})'
 
     Logger.info(log_msg)
+    selection = None
     try:
-        WinWiFi.connect(ssid=ssid, passwd=password, remember=remember)
-        ret = True
-        json_data = _to_json({'result': ret, 'message': None})
+        # Directed scans on every (or the selected) interface, the other networks are kept for the
+        # co-channel load
+        selection = select_ap(scan_networks(probe=ssid, interface=interface), ssid)
+        if not selection.best:
+            raise RuntimeError('Cannot find Wi-Fi AP')
+        network, bss = selection.best
+        Logger.info(f'Selected BSSID {bss.bssid} on {network.interface.description} '
+                    f'(of {len(selection)} candidates)')
+        if network.profile_name:
+            _wlan_connect_bss(network.interface, network.profile_name, bss.bssid)
+        else:
+            # A profile has to be created first, the BSSID can't be targeted. The security of the
+            # scanned network is written to the profile: no other scan (unless it is unknown).
+            auth = _PROFILE_AUTH.get(network.auth, '')
+            encrypt = _PROFILE_ENCRYPTION.get(network.cipher, '')
+            WinWiFi.connect(ssid=ssid, passwd=password, remember=remember, scan=False,
+                            interface=_netsh_name(network.interface), auth=auth if encrypt else '',
+                            encrypt=encrypt)
+        ret, message = True, None
     except Exception as ex:
-        ret = False
-        json_data = _to_json({'result': ret, 'message': str(ex)})
+        ret, message = False, str(ex)
+    result = {'result': ret, 'message': message}
+    if selection is not None:
+        result['selection'] = selection.to_dict()
+    json_data = _to_json(result)
     (Logger.info if ret else Logger.error)(f'JSON:{json_data}')
     if kwargs.get('json'):
         return json_data
     return ret
 
 
-def disconnect_ap(**kwargs):
-    Logger.info('Disconnecting')
+def _wlan_connect_bss(interface, profile_name, bssid, timeout=30):
+    """
+    Connects <interface> with the stored profile <profile_name>, restricted
+    to the BSS <bssid>, and waits (at most <timeout> seconds) for the
+    connection to complete. A rejected attempt fails right away, with the
+    WLAN_REASON_CODE of the connection_attempt_fail notification.
+    """
+    connection_params = {
+        'connectionMode': 'wlan_connection_mode_profile',
+        'profile': profile_name,
+        'ssid': None,
+        'bssidList': [bssid],
+        'bssType': 'dot11_BSS_type_infrastructure',
+        'flags': 0,
+    }
+    codes = ['connection_complete', 'connection_attempt_fail']
+    with notification_manager.subscribe(codes=codes, interfaces=[interface.guid]) as subscription:
+        connect(interface, connection_params)
+        event = subscription.wait_for(timeout=timeout)
+    reason_code = getattr(event.data, 'reason_code', 0) if event is not None else 0
+    if reason_code:
+        raise RuntimeError(f'Cannot connect to BSSID {bssid} (reason code {reason_code})')
+    if _wlan_interface_state(interface) != 'wlan_interface_state_connected':
+        raise RuntimeError(f'Cannot connect to BSSID {bssid}')
+
+
+def disconnect_ap(interface=None, **kwargs):
+    Logger.info('Disconnecting' if interface is None else f'Disconnecting {_interface_label(interface)}')
     try:
-        WinWiFi.disconnect()
-        ret = True
-        json_data = _to_json({'result': ret, 'message': None})
+        WinWiFi.disconnect(interface=_netsh_name(interface))
+        ret, message = True, None
     except Exception as ex:
-        ret = False
-        json_data = _to_json({'result': ret, 'message': str(ex)})
+        ret, message = False, str(ex)
+    json_data = _to_json({'result': ret, 'message': message})
     (Logger.info if ret else Logger.error)(f'JSON:{json_data}')
     if kwargs.get('json'):
         return json_data
     return ret
 
 
-def get_ap_history(callback=lambda x: None):
+def get_ap_history(callback=lambda x: None, interface=None):
     try:
-        return WinWiFi.get_profiles(callback=callback)
+        return WinWiFi.get_profiles(callback=callback, interface=_netsh_name(interface))
     except:
         return []
 
 
-def forget_aps(*ssids, **kwargs):
+def forget_aps(*ssids, interface=None, **kwargs):
     ssid_str = ', '.join(ssids) if ssids else ''
     ssid_str = f' ({ssid_str})' if ssid_str else ssid_str
-    Logger.info(f'Forgetting APs{ssid_str}')
+    on_str = f' on {_interface_label(interface)}' if interface is not None else ''
+    Logger.info(f'Forgetting APs{ssid_str}{on_str}')
     try:
-        WinWiFi.forget(*ssids)
-        ret = True
-        json_data = _to_json({'result': ret, 'message': None})
+        WinWiFi.forget(*ssids, interface=_netsh_name(interface))
+        ret, message = True, None
     except Exception as ex:
-        ret = False
-        json_data = _to_json({'result': ret, 'message': str(ex)})
-    json_data = _to_json({'result': ret})
+        ret, message = False, str(ex)
+    json_data = _to_json({'result': ret, 'message': message})
     (Logger.info if ret else Logger.error)(f'JSON:{json_data}')
     if kwargs.get('json'):
         return json_data
     return ret
 
 
-def scan_networks(ssid=None):
+def scan_networks(ssid=None, probe=None, cached=False, interface=None):
+    """
+    Scans for the available networks. When <ssid> (one or more SSIDs) is
+    provided, the scans are directed at those SSIDs and the other networks
+    and BSS entries are dropped before they are decoded. <probe> only
+    directs the scans (e.g. to find hidden networks), without dropping
+    anything.
+
+    With <cached> nothing is scanned: the lists cached by the OS (from its
+    own background scans, or the last scan of any application) are
+    returned, the age of their entries is available as the BSS age.
+
+    The networks (and their BSSes) are tagged with the interface that found
+    them, a network seen by several interfaces is listed once per interface.
+    With <interface> only that interface scans and is listed.
+    """
     # Loosely based on (and uses): https://github.com/kedos/win32wifi
+    ssids = _ssid_list(ssid) if ssid else None
+    probes = _ssid_list(probe) if probe else ssids
     available_networks = []
-    interfaces = getWirelessInterfaces()
-    for interface in interfaces:
+    for interface in _wlan_get_interfaces(interface=interface):
         # print(f'Interface: {interface}')
 
-        _wlan_scan_interface(interface)  # Scan for wireless networks
+        # Scan for wireless networks
+        for directed_ssid in () if cached else probes or (None,):
+            _wlan_scan_interface(interface, ssid=directed_ssid)
         # print()
 
-        networks = getWirelessAvailableNetworkList(interface)
-        available_networks.extend([ExtWirelessNetwork.cast(n) for n in networks])
+        interface_networks = {}  # SSID -> networks of this interface
+        for n in getWirelessAvailableNetworkList(interface, ssids):
+            n = ExtWirelessNetwork.cast(n)
+            n.interface = interface
+            available_networks.append(n)
+            interface_networks.setdefault(n.ssid, []).append(n)
         # print(f'Networks found: {len(networks)}')
 
-        bss_entries_list = getWirelessNetworkBssList(interface)
+        bss_entries_list = getWirelessNetworkBssList(interface, ssids)
         # print(f'BSS entries found: {len(bss_entries_list)}')
         bsss = [ExtWirelessNetworkBss.cast(b) for b in bss_entries_list]
 
         for bss in bsss:
             if not bss.ssid:
                 continue  # Ignore empty SSIDs
+            bss.interface = interface
 
-            networks = [n for n in available_networks if n.ssid == bss.ssid]
+            networks = interface_networks.get(bss.ssid)
             if not networks:
                 try:
                     d_ssid = bss.ssid.decode('utf-8')
@@ -342,10 +579,6 @@ def scan_networks(ssid=None):
             for network in networks:
                 network.add_bss(bss)
 
-    if ssid:
-        if not isinstance(ssid, bytes):
-            ssid = str(ssid).encode('utf-8')
-        available_networks = [n for n in available_networks if n.ssid == ssid]
     for n in available_networks:
         try:
             n.ssid = n.ssid.decode('utf-8')
@@ -380,6 +613,42 @@ class ConnectArgsAction(argparse.Action):
         setattr(args, self.dest, values)
 
 
+def _interval_bounds(s):
+    """Parses "MIN:MAX" (or "MIN", with the default maximum) seconds."""
+    low, _, high = str(s).partition(':')
+    try:
+        bounds = float(low), float(high) if high else max(300., float(low))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid interval bounds: "{s}" (expected MIN:MAX seconds)')
+    if not 0 < bounds[0] <= bounds[1]:
+        raise argparse.ArgumentTypeError(f'invalid interval bounds: "{s}" (expected 0 < MIN <= MAX)')
+    return bounds
+
+
+def _interface_selector(s):
+    """Resolves the NAME, GUID, description or INDEX (from 0) of an interface to the interface."""
+    try:
+        interface = interface_registry.get(s)
+    except Exception as ex:  # e.g. the WLAN service is not running
+        raise argparse.ArgumentTypeError(f'cannot enumerate the interfaces: {ex}')
+    if interface is None:
+        known = ', '.join(f'{i}: {_interface_label(n)}' for i, n in enumerate(interface_registry.interfaces()))
+        raise argparse.ArgumentTypeError(f'unknown interface: "{s}" (known: {known or "none"})')
+    return interface
+
+
+def _schedule_spec(s):
+    """Parses "PERIOD:COMMAND" (e.g. "30:--scan -v 1") into the period (seconds) and the command arguments."""
+    period, _, command = str(s).partition(':')
+    try:
+        period = float(period)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f'invalid schedule: "{s}" (expected PERIOD:COMMAND)')
+    if period <= 0 or not command.strip():
+        raise argparse.ArgumentTypeError(f'invalid schedule: "{s}" (expected PERIOD:COMMAND, PERIOD > 0)')
+    return period, shlex.split(command)
+
+
 def _str_to_bool(s):
     s = str(s).strip()
     if not s:
@@ -391,31 +660,80 @@ def _dict_to_str(d, sep=os.linesep):
     return sep.join(f'{k}:{v}' for k, v in d.items())
 
 
+# Non-ASCII characters, only found in the JSON strings
+_NON_ASCII = re.compile('[^\x00-\x7f]')
+
+
+def _escape_non_ascii(match):
+    code = ord(match.group())
+    if code > 0xffff:  # As a surrogate pair, like json.dumps
+        code -= 0x10000
+        return '\\u%04x\\u%04x' % (0xd800 | code >> 10, 0xdc00 | code & 0x3ff)
+    return '\\u%04x' % code
+
+
 def _to_json(data):
-    if isinstance(data, str):
-        data = json.loads(data)
-    return json.dumps(data)
-
-
-def _get_parsed_ap_history():
-    output = do_get_ap_history(1, log=False)
-    profile_name = None
-    next_is_profile = True
-    ssid_profile_map = {}
-    for line in output.splitlines():
-        line = line.strip()
-        if not line:
-            next_is_profile = True
-            continue
-        if next_is_profile:
-            profile_name = line[:-1]
-            next_is_profile = False
+    """
+    Encodes <data> to a compact, ASCII-only JSON string (non-ASCII
+    characters escaped, printable on any console code page), using orjson
+    when it is installed. Both encoders return the same string.
+    """
+    if orjson is not None:
+        return _NON_ASCII.sub(_escape_non_ascii, orjson.dumps(data).decode('utf-8'))
+    return json.dumps(data, separators=(',', ':'))
+
+
+def _ap_history_records(interface=None):
+    """Yields the (group, profile) records of the stored profiles, see history.py."""
+    args = ['wlan', 'show', 'profiles'] + WinWiFi.interface_args(_netsh_name(interface))
+    return parse_profile_groups(WinWiFi.netsh_lines(args))
+
+
+def _wlan_get_profile_xmls(interface=None):
+    """
+    Returns the (profile name, XML, flags) of the stored profiles of every
+    (or the <interface>) interface, all retrieved over a single client handle.
+    """
+    profiles = []
+    with wlan_handle() as handle:
+        for interface in _wlan_get_interfaces(interface=interface):
+            with wlan_memory(WlanGetProfileList(handle, interface.guid)) as profile_list:
+                data_type = profile_list.contents.ProfileInfo._type_
+                num = profile_list.contents.NumberOfItems
+                profile_info_pointer = addressof(profile_list.contents.ProfileInfo)
+                for profile in (data_type * num).from_address(profile_info_pointer):
+                    with wlan_memory(WlanGetProfile(handle, interface.guid, profile.ProfileName)) as xml_data:
+                        profiles.append((profile.ProfileName, xml_data.value, profile.Flags))
+    return profiles
+
+
+def get_ap_details(ssid=None, interface=None):
+    """
+    Returns the ProfileDetails (see history.py) of the stored profiles, once
+    per profile, only those of <ssid> (profile name or SSID) when provided.
+    """
+    details = {}
+    for name, xml, flags in _wlan_get_profile_xmls(interface):
+        if not isinstance(name, str):
+            name = ''.join(map(chr, name)).split('\0', 1)[0]  # WCHAR array
+        profile = profile_parser.parse(name, xml, flags)
+        if ssid and ssid not in (profile.name, profile.ssid):
             continue
-        ssid_profile_map[line] = profile_name
-    return ssid_profile_map
+        details.setdefault(profile.name, profile)
+    return list(details.values())
+
+
+def _get_parsed_ap_history(interface=None):
+    """Returns the group ("User profiles", ...) of every stored profile."""
+    try:
+        return {profile: group for group, profile in _ap_history_records(interface)}
+    except Exception as ex:
+        Logger.error(f'Cannot retrieve the AP history: {ex}')
+        return {}
 
 
 def do_interval(value, verbosity=0):
+    """Reports the delay (<value> seconds) until the next iteration, waited for by the scheduler."""
     if not value:
         if verbosity:
             Logger.info('No execution interval specified')
@@ -423,34 +741,67 @@ def do_interval(value, verbosity=0):
             print('No execution interval specified')
         return
     if verbosity:
+        value = round(value, 1)
         s = '' if value == 1 else 's'
-        Logger.info(f'Delaying execution for {value} second{s}')
-        print(f'Delaying execution for {value} second{s}')
-    time.sleep(value)
+        Logger.info(f'Delaying execution for {value:g} second{s}')
+        print(f'Delaying execution for {value:g} second{s}')
+
+
+def _wlan_connection(interface):
+    """Returns the current connection (attributes) of <interface>, see queryInterface."""
+    connection = queryInterface(interface, 'current_connection')[1]
+    association = connection['wlanAssociationAttributes']
+    security = connection['wlanSecurityAttributes']
+    ssid = association['dot11Ssid']
+    return {
+        'ssid': ssid.decode('utf-8', errors='replace') if isinstance(ssid, bytes) else str(ssid),
+        'state': connection['isState'].replace('wlan_interface_state_', ''),
+        'bssid': association['dot11Bssid'].lower(),
+        'signal_quality': association['wlanSignalQuality'],
+        'auth': security['dot11AuthAlgorithm'],
+        'cipher': security['dot11CipherAlgorithm'],
+    }
 
 
 def do_get_connected_ap(verbosity=0, **kwargs):
+    """
+    Shows the connection of every (or the <interface>) interface, keyed by
+    interface name when several interfaces are shown (or with <verbosity>).
+    The connections are queried from the WlanApi, without netsh.
+    """
     Logger.info('Retrieving connected AP info')
-    networks = get_connected_ap()
-    if not networks:
-        interfaces = WinWiFi.get_interfaces()
-        s = {'State': interfaces[0].state if interfaces else 'disconnected'}
-        json_data = _to_json(s)
-        Logger.info(f'JSON:{json_data}')
-        if kwargs.get('json'):
-            print(json_data)
-        else:
-            print(_dict_to_str(s))
-    for n in networks:
-        if not verbosity:
-            s = {'SSID': f'{n.ssid} ({n.state})'}
+    interfaces = _wlan_get_interfaces(interface=kwargs.get('interface'))
+    keyed = verbosity or len(interfaces) > 1
+    records = []
+    for interface in interfaces:
+        state = _wlan_interface_state(interface)
+        # Only query the connection attributes when connected
+        n = _wlan_connection(interface) if state == 'wlan_interface_state_connected' else None
+        if n is None:
+            s = {'State': state.replace('wlan_interface_state_', '')}
+            if keyed:
+                s = {'Interface': _interface_label(interface), **s}
+        elif not verbosity:
+            s = {'SSID': f'{n["ssid"]} ({n["state"]})'}
+            if keyed:
+                s = {'Interface': _interface_label(interface), **s}
         else:
             s = {
-                'Interface': f'{n.name}',
-                'SSID': f'{n.ssid}',
-                'State': f'{n.state}',
-                'BSSID': f'{n.bssid}'
+                'Interface': _interface_label(interface),
+                'SSID': n['ssid'],
+                'State': n['state'],
+                'BSSID': n['bssid'],
             }
+            if verbosity >= 2:
+                s.update({
+                    'Signal Quality': f'{n["signal_quality"]}%',
+                    'Authentication': f'{n["auth"]}',
+                    'Cipher': f'{n["cipher"]}',
+                })
+        records.append(s)
+    if not records:
+        records.append({'State': 'disconnected'})
+    for s in records:
         json_data = _to_json(s)
         Logger.info(f'JSON:{json_data}')
         if kwargs.get('json'):
@@ -460,10 +811,17 @@ def do_get_connected_ap(verbosity=0, **kwargs):
 
 
 def do_scan_networks(ssid, verbosity=0, **kwargs):
-    Logger.info('Scanning for networks')
-    networks = scan_networks(ssid)
-    history = _get_parsed_ap_history() if verbosity == 0 else {}
-
+    cached = kwargs.get('cached', False)
+    interface = kwargs.get('interface')
+    networks = kwargs.get('networks')  # Already scanned
+    if networks is None:
+        Logger.info('Retrieving the cached networks' if cached else 'Scanning for networks')
+        networks = scan_networks(ssid, cached=cached, interface=interface)
+    history = _get_parsed_ap_history(interface) if verbosity == 0 else {}
+    # Networks found by several interfaces are listed once per interface, keyed by interface name
+    keyed = len({guid_key(n.interface.guid_string) for n in networks}) > 1
+
+    as_text = not kwargs.get('json')
     json_data = []
     for n in networks:
         log_msg = []
@@ -476,67 +834,327 @@ def do_scan_networks(ssid, verbosity=0, **kwargs):
             log_msg.append(f'{n.ssid}{profile}')
         log_data = {}
         if verbosity >= 1:
+            if keyed:
+                log_data['Interface'] = _interface_label(n.interface)
+                if as_text:
+                    log_msg.append(f'Interface: {log_data["Interface"]}')
             log_data.update(n.network_json())
-            log_msg.append(n.network_str())
+            if as_text:
+                log_msg.append(n.network_str())
+            if cached and n.age is not None:
+                log_data['Age'] = f'{n.age:.1f} s'
+                if as_text:
+                    log_msg.append(f'Age: {n.age:.1f} s')
         if verbosity >= 2:
             log_data.update(n.bsss_json())
-            log_msg.append('\n'.join(l for l in n.bsss_str().splitlines() if l.strip()))
+            if as_text:
+                log_msg.append('\n'.join(l for l in n.bsss_str().splitlines() if l.strip()))
         if verbosity > 0:
             log_msg.append('')
         if log_data:
             json_data.append(log_data)
-        log_msg = '\n'.join(log_msg)
-        if not kwargs.get('json'):
-            print(log_msg)
+        if as_text:
+            print('\n'.join(log_msg))
     json_data = _to_json(json_data)
-    Logger.info(f'JSON:{_to_json(json_data)}')
+    Logger.info(f'JSON:{json_data}')
+    if kwargs.get('json'):
+        print(json_data)
+
+
+def do_adaptive_scan(ssid, bounds, count=None, verbosity=0, **kwargs):
+    """
+    Scans <count> times (default until interrupted) at an interval adapting
+    to the churn of the environment, between the <bounds> (min, max)
+    seconds, see adaptive.py. Every scan is shown like do_scan_networks.
+    """
+    from adaptive import AdaptiveScanScheduler
+    cached = kwargs.get('cached', False)
+    interface = kwargs.get('interface')
+    scheduler = AdaptiveScanScheduler(lambda: scan_networks(ssid, cached=cached, interface=interface), *bounds,
+                                      manager=notification_manager,
+                                      interfaces=[interface.guid] if interface is not None else None)
+    as_text = not kwargs.get('json')
+
+    def on_scan(networks, churn):
+        if scheduler.scans > 1 and as_text:
+            print('-' * 32)
+        do_scan_networks(ssid, verbosity, networks=networks, **kwargs)
+        changes = ', '.join(f'{v} {k}' for k, v in churn.items()) if churn else 'first scan'
+        log_msg = f'Scan {scheduler.scans} ({changes}), next scan in {scheduler.interval:g} seconds'
+        Logger.info(log_msg)
+        if verbosity and as_text:
+            print(log_msg)
+
+    Logger.info(f'Scanning every {bounds[0]:g} to {bounds[1]:g} seconds')
+    if verbosity:
+        print('Scanning adaptively, press Ctrl+C to stop', file=sys.stderr)
+    try:
+        scheduler.run(count=count, on_scan=on_scan)
+    except KeyboardInterrupt:
+        pass
+    Logger.info(f'Adaptive scans: {scheduler.summary()}')
+
+
+def do_schedule(jobs, count=None, verbosity=0, **kwargs):
+    """
+    Runs the <jobs> ((period, command, function) tuples) on their own fixed
+    periods, until interrupted (or <count> times each), see scheduler.py.
+    The commands share the process: its handles, netsh sessions, interface
+    registry and caches.
+    """
+    from scheduler import FixedRateScheduler
+    scheduler = FixedRateScheduler(raise_errors=False,
+                                   on_overrun=lambda job, missed: _report_overrun(job, missed, verbosity))
+
+    def scheduled(command, func):
+        def run():
+            if verbosity:
+                print(f'[{time.strftime("%H:%M:%S")}] {command}')
+            Logger.info(f'Scheduled: {command}')
+            _print_output(func())
+        return run
+
+    for period, command, func in jobs:
+        scheduler.add(command, period, scheduled(command, func), count=count)
+    Logger.info('Scheduling ' + ', '.join(f'"{command}" every {period:g} s' for period, command, _ in jobs))
+    if verbosity:
+        print('Running the scheduled commands, press Ctrl+C to stop', file=sys.stderr)
+    try:
+        scheduler.run()
+    except KeyboardInterrupt:
+        pass
+    stats = scheduler.stats()
+    Logger.info(f'Schedule: {stats}')
+    if verbosity:
+        for command, job_stats in stats.items():
+            print(f'{command}: {job_stats["runs"]} runs, {job_stats["overruns"]} overruns '
+                  f'({job_stats["skipped"]} skipped), {job_stats["errors"]} errors, '
+                  f'max {job_stats["max_late"]:g} s late, max duration {job_stats["max_duration"]:g} s',
+                  file=sys.stderr)
+
+
+def do_batch(steps, verbosity=0, **kwargs):
+    """
+    Runs the <steps> of a batch script (see batch.py) and shows the result
+    and duration of every command, exits with status 1 when any failed.
+    """
+    from batch import Sleep, iterate_script
+    as_json = kwargs.get('json')
+    results = []
+    started = time.perf_counter()
+    for step in iterate_script(steps):
+        if isinstance(step, Sleep):
+            Logger.info(f'Batch: sleep {step.seconds:g}')
+            time.sleep(step.seconds)
+            continue
+        command_args, exec_func = step.args
+        Logger.info(f'CMD:{os.path.basename(__file__)} {step.text}')
+        command_started = time.perf_counter()
+        error = None
+        try:
+            if _run_repeated(exec_func, command_args) is False:
+                error = 'Error'  # Reported by the command
+        except Exception as ex:
+            error = str(ex) or type(ex).__name__
+            Logger.error(f'Batch: {step.text} failed: {error}')
+        result = {
+            'line': step.line_number,
+            'command': step.text,
+            'result': error is None,
+            'duration': round(time.perf_counter() - command_started, 3),
+        }
+        if error is not None:
+            result['error'] = error
+        results.append(result)
+        if as_json:
+            print(_to_json(result))
+        else:
+            status = 'ok' if error is None else f'failed: {error}'
+            print(f'[{step.text}] {status} ({result["duration"]:.3f} s)')
+    failed = sum(not r['result'] for r in results)
+    summary = f'Batch: {len(results)} commands, {failed} failed, {time.perf_counter() - started:.3f} s'
+    (Logger.warning if failed else Logger.info)(summary)
+    if verbosity:
+        print(summary, file=sys.stderr)
+    if failed:
+        sys.exit(1)
+
+
+def _batch_command(parser, argv, interface=None):
+    """
+    Parses a command of a batch script, returns its arguments and function.
+    <interface> is used by the commands without --interface (the --interface
+    of the batch).
+    """
+    args = parser.parse_args(argv)
+    if args.interface is None:
+        args.interface = interface
+    exec_func = _command_func(args)
+    if args.batch or args.capture or args.profile:
+        raise ValueError('--batch, --capture and --profile apply to the whole batch')
+    if args.schedule:
+        exec_func = None  # Not dispatched by _command_func
+    if not exec_func:
+        raise ValueError('no command')
+    return args, exec_func
+
+
+def _report_overrun(job, missed, verbosity=0):
+    if verbosity:
+        s = '' if missed == 1 else 's'
+        print(f'Overrun: {job.name} ran {job.last_duration:.1f} seconds, {missed} run{s} of its '
+              f'{job.period:g} second period skipped', file=sys.stderr)
+
+
+def do_channel_report(report=None, verbosity=0, **kwargs):
+    """
+    Scans on every (or the <interface>) interface and shows the channel congestion, accumulated
+    in <report> (a ChannelReport) over the repetitions. With <cached> the
+    BSS lists cached by the OS are used, without scanning.
+    """
+    from channels import ChannelReport
+    Logger.info('Reporting the channel congestion')
+    report = ChannelReport() if report is None else report
+    bsss = []
+    for interface in _wlan_get_interfaces(interface=kwargs.get('interface')):
+        if not kwargs.get('cached'):
+            _wlan_scan_interface(interface)
+        bsss.extend(ExtWirelessNetworkBss.cast(b) for b in getWirelessNetworkBssList(interface))
+    report.add(bsss)
+    data = report.to_dict()
+    json_data = _to_json(data)
+    Logger.info(f'JSON:{json_data}')
     if kwargs.get('json'):
         print(json_data)
+        return
+    print(f'{"Band":>4} {"Channel":>7} {"BSSs":>6} {"Overlap":>7} {"Load":>6} {"Util %":>6} {"Stations":>8}')
+    for row in data['channels']:
+        recommended = data['recommended'].get(row['band']) == row['channel']
+        if not verbosity and not row['bsss'] and not row['overlapping'] and not recommended:
+            continue  # Unused channel
+        # Averages over the scans, at a fixed precision per column
+        utilisation = '-' if row['utilisation'] is None else f'{row["utilisation"]:.1f}'
+        stations = '-' if row['stations'] is None else f'{row["stations"]:.1f}'
+        print(f'{row["band"]:>4} {row["channel"]:>7} {row["bsss"]:>6.1f} {row["overlapping"]:>7.1f} '
+              f'{row["load"]:>6.2f} {utilisation:>6} {stations:>8}')
+    for band, channel in data['recommended'].items():
+        print(f'Recommended channel ({band} GHz): {channel}')
 
 
 def do_get_ap_history(verbosity=0, **kwargs):
     do_log = kwargs.get('log', True)
     if do_log:
         Logger.info('Retrieving AP history')
+    interface = kwargs.get('interface')
+    if kwargs.get('details'):
+        return do_get_ap_details(kwargs.get('ssid'), json=kwargs.get('json'), log=do_log, interface=interface)
     if not verbosity:
-        hist = get_ap_history()
+        hist = get_ap_history(interface=interface)
         if do_log:
             Logger.info(f'JSON:{_to_json(hist)}')
         return os.linesep.join(hist)
-    output = []
-    stdout = get_ap_history(callback=lambda x: output.append(x))
-    if not output:
-        return os.linesep.join(stdout) if isinstance(stdout, list) else str(stdout)
-    new_output = []
+    # The netsh output is parsed and rendered line by line, as it is read
     json_data = {}
-    prev_line = ''
-    prev_key = None
-    do_append = True
-    for line in output[0].splitlines():
-        if not line:
-            if do_append:
-                new_output.append('')
-            do_append = False
-        elif line == '-' * len(line):
-            idx = prev_line.find('(')
-            if idx + 1:
-                prev_line = prev_line[:idx-1]
-            prev_key = prev_line.strip()
-            new_output.append(f'{prev_key}:')
-            json_data[prev_key] = []
-            do_append = True
-        elif do_append:
-            idx = line.find(':')
-            if idx + 1:
-                line = line[idx+1:]
-            new_output.append(f'\t{line.strip()}')
-            json_data[prev_key].append(line.strip())
-        prev_line = line
+    records = _ap_history_records(interface)
+    if do_log or kwargs.get('json'):
+        records = collect_profiles_json(records, json_data)
+    try:
+        if kwargs.get('json'):
+            for _ in records:
+                pass
+        else:
+            output = os.linesep.join(render_profiles_text(records))
+    except Exception as ex:
+        Logger.error(f'Cannot retrieve the AP history: {ex}')
+        output = ''
+    if do_log or kwargs.get('json'):
+        json_str = _to_json(json_data)
     if do_log:
-        Logger.info(f'JSON:{_to_json(json_data)}')
+        Logger.info(f'JSON:{json_str}')
     if kwargs.get('json'):
-        return _to_json(json_data)
-    return os.linesep.join(new_output).strip()
+        return json_str
+    return output
+
+
+def do_get_ap_details(ssid=None, **kwargs):
+    try:
+        details = get_ap_details(ssid, kwargs.get('interface'))
+    except Exception as ex:
+        Logger.error(f'Cannot retrieve the AP details: {ex}')
+        details = []
+    if kwargs.get('log', True) or kwargs.get('json'):
+        json_str = _to_json([d.to_dict() for d in details])
+    if kwargs.get('log', True):
+        Logger.info(f'JSON:{json_str}')
+    if kwargs.get('json'):
+        return json_str
+    return os.linesep.join(render_details_text(details))
+
+
+def do_stream_events(duration=0, verbosity=0, **kwargs):
+    from events import EventStream
+    Logger.info('Streaming notifications')
+    interface = kwargs.get('interface')
+    stream = EventStream(notification_manager, encode=_to_json,
+                         interfaces=[interface.guid] if interface is not None else None).start()
+    if verbosity:
+        print('Streaming notifications (NDJSON), press Ctrl+C to stop', file=sys.stderr)
+    try:
+        stream.run(duration=duration or None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        stream.stop()
+    log_msg = f'Streamed {stream.written} notifications ({stream.dropped} dropped)'
+    (Logger.warning if stream.dropped else Logger.info)(log_msg)
+
+
+def do_serve_metrics(address, interval=0, verbosity=0, **kwargs):
+    from exporter import MetricsExporter, WifiCollector
+    host, _, port = str(address).rpartition(':')
+    exporter = MetricsExporter(WifiCollector(sys.modules[__name__]),
+                               interval=interval or 15,
+                               host=host or '127.0.0.1',
+                               port=int(port))
+    exporter.start()
+    if verbosity:
+        print(f'Serving metrics on http://{exporter.address[0]}:{exporter.address[1]}/metrics')
+    try:
+        exporter.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        exporter.stop()
+
+
+def do_sample_connection(rate, duration=0, path=None, verbosity=0, **kwargs):
+    from sampler import ConnectionSampler
+    interfaces = _wlan_get_interfaces('connected', kwargs.get('interface'))
+    if not interfaces:
+        json_data = _to_json({'result': False, 'message': 'Not connected'})
+        Logger.error(f'JSON:{json_data}')
+        print(json_data if kwargs.get('json') else 'Not connected')
+        return
+    Logger.info(f'Sampling the connection of {interfaces[0].description} at {rate} Hz')
+    output = open(path, 'ab') if path else None
+    sampler = ConnectionSampler(sys.modules[__name__], interfaces[0], rate=rate, output=output)
+    if verbosity:
+        print('Sampling the connection, press Ctrl+C to stop', file=sys.stderr)
+    try:
+        sampler.run(duration=duration or None)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sampler.close()
+        if output:
+            output.close()
+    summary = sampler.summary()
+    json_data = _to_json(summary)
+    Logger.info(f'JSON:{json_data}')
+    if kwargs.get('json'):
+        print(json_data)
+    else:
+        print(_dict_to_str(summary))
 
 
 def create_parser(prog_name=None):
@@ -552,6 +1170,18 @@ def create_parser(prog_name=None):
                         const=True,
                         metavar='SSID',
                         help='scan for APs')
+    parser.add_argument('--cached',
+                        action='store_true',
+                        help='with --scan or --channels: do not scan, use the networks and BSSes cached by the '
+                             'OS (from its background scans), with the age of the BSS entries')
+    parser.add_argument('--adaptive',
+                        nargs='?',
+                        type=_interval_bounds,
+                        const='5:300',
+                        metavar='MIN:MAX',
+                        help='with --scan: scan until interrupted (or <repeat> times) at an interval between '
+                             '<MIN> and <MAX> (default 5:300) seconds, shortened while BSSes appear, disappear or '
+                             'change their RSSI and on signal quality changes, doubled while nothing changes')
     parser.add_argument('-c', '--connect',
                         action=ConnectArgsAction,
                         nargs='+',
@@ -566,11 +1196,67 @@ def create_parser(prog_name=None):
                         const=True,
                         metavar='SSID',
                         help='shows AP history')
+    parser.add_argument('--details',
+                        action='store_true',
+                        help='with --history: show the SSID, connection mode, authentication and encryption '
+                             'of the stored profiles (of <SSID> only, when provided)')
     parser.add_argument('-f', '--forget',
                         nargs='+',
                         type=str,
                         metavar='SSID',
                         help='forget AP details')
+    parser.add_argument('-n', '--events',
+                        nargs='?',
+                        type=float,
+                        const=0,
+                        metavar='SECONDS',
+                        help='stream notifications as NDJSON (for <SECONDS>, default until interrupted)')
+    parser.add_argument('-e', '--exporter',
+                        type=str,
+                        metavar='[HOST:]PORT',
+                        help='serve Prometheus metrics on http://HOST:PORT/metrics, '
+                             'refreshed every <interval> (default 15) seconds')
+    parser.add_argument('-q', '--sample',
+                        nargs='?',
+                        type=float,
+                        const=20.,
+                        metavar='HZ',
+                        help='sample the signal quality, RSSI and rates of the connection <HZ> (default 20) '
+                             'times per second, then show summary statistics')
+    parser.add_argument('--sample-duration',
+                        type=float,
+                        default=0,
+                        metavar='SECONDS',
+                        help='stop sampling after <SECONDS> (default until interrupted)')
+    parser.add_argument('--sample-file',
+                        type=str,
+                        metavar='FILE',
+                        help='append the raw samples to <FILE> (see sampler.py)')
+    parser.add_argument('--channels',
+                        action='store_true',
+                        help='show the per channel congestion (BSSes, overlapping BSSes, RSSI weighted load, '
+                             'QBSS utilisation) and the least congested channel per band, '
+                             'accumulated over the repetitions')
+    parser.add_argument('--schedule',
+                        nargs='+',
+                        type=_schedule_spec,
+                        metavar='PERIOD:COMMAND',
+                        help='run several commands in one process, each every <PERIOD> seconds (fixed rate), '
+                             'until interrupted (or <repeat> times each), '
+                             'e.g. --schedule "2:--status" "30:--scan -v 1" "600:--history"')
+    parser.add_argument('--batch',
+                        nargs='?',
+                        const='-',
+                        metavar='FILE',
+                        help='run the commands of <FILE> (default stdin), one per line in this syntax, in one '
+                             'process, with the "sleep SECONDS" and "repeat N" ... "end" directives, and show '
+                             'the result and duration of every command (see batch.py)')
+    parser.add_argument('-I', '--interface',
+                        type=_interface_selector,
+                        metavar='NAME|GUID|INDEX',
+                        help='only use the interface of <NAME> (as shown by netsh, or its description), <GUID> or '
+                             '<INDEX> (from 0, in enumeration order) to scan, show the status, connect, disconnect, '
+                             'show the history, forget, ...; default every interface')
     parser.add_argument('-r', '--repeat',
                         type=int,
                         default=1,
@@ -590,31 +1276,39 @@ def create_parser(prog_name=None):
                         type=int,
                         default=0,
                         help='increase output verbosity [0-2]')
+    parser.add_argument('--profile',
+                        nargs='?',
+                        const='text',
+                        choices=('text', 'json'),
+                        metavar='FORMAT',
+                        help='print a timing breakdown (text or json) to stderr')
+    parser.add_argument('--capture',
+                        type=str,
+                        metavar='FILE',
+                        help='record the native API responses to <FILE> (see capture.py)')
     return parser
 
 
-def main():
-    parser = create_parser()
-
-    if len(sys.argv) == 1:
-        parser.print_usage()
-        sys.exit(1)
-    if sys.argv[1] == '?':
-        parser.print_help()
-        sys.exit()
-
-    arg_list = [f'"{a}"' if ' ' in a else a for a in sys.argv[1:]]
-    Logger.info(f'CMD:{os.path.basename(__file__)} {" ".join(arg_list)}')
-
-    try:
-        args = parser.parse_args()
-    except SystemExit as se_ex:
-        if se_ex.code > 0:
-            Logger.error('Invalid or incomplete argument')
-            Logger.info('=' * 64)
-        raise
-    # print(vars(args))
-
+def _install_profiler():
+    module = sys.modules[__name__]
+    for name in ('do_get_connected_ap', 'do_scan_networks', 'do_get_ap_history', 'connect_ap',
+                 'disconnect_ap', 'forget_aps', 'scan_networks', '_wlan_scan_interface', '_wlan_issue_scan',
+                 'WlanScan',
+                 'getWirelessInterfaces', 'getWirelessAvailableNetworkList', 'getWirelessNetworkBssList',
+                 'queryInterface', '_get_parsed_ap_history', '_to_json', 'select_ap', '_wlan_connect_bss',
+                 '_wlan_get_profile_xmls', 'get_ap_details', '_wlan_connection',
+                 'do_channel_report', 'do_adaptive_scan', 'do_schedule', 'do_batch'):
+        Profiler.instrument(module, name)
+    Profiler.instrument(ExtWirelessNetworkBss, 'cast')
+    Profiler.instrument(ExtWirelessNetworkBss, '_get_channels_from_information_elements')
+    Profiler.instrument(WinWiFi, 'netsh')
+    Profiler.instrument(Logger, 'log')
+    Logger._wrapper_files.add(sys.modules[Profiler.__module__].__file__)
+    Profiler.enable()
+
+
+def _command_func(args):
+    """Returns the function executing the command of the parsed <args>, None without command."""
     args.verbosity = max(0, args.verbosity)  # Clamp the verbosity between [0,x]
     if args.verbosity > 2:
         warning_msg = f'verbosity level {args.verbosity} not supported, assuming max level (2)'
@@ -623,10 +1317,17 @@ def main():
         args.verbosity = 2
     exec_func = None
     if args.status:
-        exec_func = lambda: do_get_connected_ap(args.verbosity, json=args.as_json)
+        exec_func = lambda: do_get_connected_ap(args.verbosity, json=args.as_json, interface=args.interface)
     elif args.scan:
         ssid = args.scan if isinstance(args.scan, str) else None
-        exec_func = lambda: do_scan_networks(ssid, args.verbosity, json=args.as_json)
+        if args.adaptive:
+            count = args.repeat if args.repeat > 1 else None
+            args.repeat = 1  # Repeated by the scheduler
+            exec_func = lambda: do_adaptive_scan(ssid, args.adaptive, count, args.verbosity,
+                                                 json=args.as_json, cached=args.cached, interface=args.interface)
+        else:
+            exec_func = lambda: do_scan_networks(ssid, args.verbosity, json=args.as_json, cached=args.cached,
+                                                 interface=args.interface)
     elif args.connect:
         ssid = args.connect[0]
         password = args.connect[1] if len(args.connect) > 1 else ''
@@ -634,40 +1335,153 @@ def main():
         exec_func = lambda: connect_ap(ssid,
                                        password=password,
                                        remember=_str_to_bool(remember),
+                                       interface=args.interface,
                                        json=args.as_json)
     elif args.disconnect:
-        exec_func = lambda: disconnect_ap(json=args.as_json)
+        exec_func = lambda: disconnect_ap(interface=args.interface, json=args.as_json)
     elif args.history:
-        exec_func = lambda: do_get_ap_history(args.verbosity, json=args.as_json)
+        ssid = args.history if isinstance(args.history, str) else None
+        exec_func = lambda: do_get_ap_history(args.verbosity, json=args.as_json, details=args.details, ssid=ssid,
+                                              interface=args.interface)
     elif args.forget:
         if isinstance(args.forget, (list, tuple)):
             fargs = args.forget
         else:
             fargs = (args.forget,)
-        exec_func = lambda: forget_aps(*fargs, json=args.as_json)
+        exec_func = lambda: forget_aps(*fargs, interface=args.interface, json=args.as_json)
+    elif args.events is not None:
+        exec_func = lambda: do_stream_events(args.events, args.verbosity, interface=args.interface)
+    elif args.exporter:
+        exec_func = lambda: do_serve_metrics(args.exporter, args.interval, args.verbosity)
+    elif args.sample is not None:
+        exec_func = lambda: do_sample_connection(args.sample, args.sample_duration, args.sample_file,
+                                                 args.verbosity, json=args.as_json, interface=args.interface)
+    elif args.channels:
+        from channels import ChannelReport
+        report = ChannelReport()
+        exec_func = lambda: do_channel_report(report, args.verbosity, json=args.as_json, cached=args.cached,
+                                              interface=args.interface)
+    return exec_func
+
 
+def main():
+    parser = create_parser()
+
+    if len(sys.argv) == 1:
+        parser.print_usage()
+        sys.exit(1)
+    if sys.argv[1] == '?':
+        parser.print_help()
+        sys.exit()
+
+    arg_list = [f'"{a}"' if ' ' in a else a for a in sys.argv[1:]]
+    Logger.info(f'CMD:{os.path.basename(__file__)} {" ".join(arg_list)}')
+
+    try:
+        args = parser.parse_args()
+    except SystemExit as se_ex:
+        if se_ex.code > 0:
+            Logger.error('Invalid or incomplete argument')
+            Logger.info('=' * 64)
+        raise
+    # print(vars(args))
+
+    exec_func = _command_func(args)
+    if args.schedule:
+        jobs = []
+        for period, argv in args.schedule:
+            command_args = parser.parse_args(argv)
+            if command_args.interface is None:
+                command_args.interface = args.interface  # Of the whole schedule
+            command_func = _command_func(command_args)
+            if not command_func or command_args.schedule or command_args.adaptive or \
+                    command_args.events is not None or command_args.exporter or command_args.sample is not None:
+                parser.error(f'argument --schedule: not a schedulable command: "{shlex.join(argv)}"')
+            jobs.append((period, shlex.join(argv), command_func))
+        count = args.repeat if args.repeat > 1 else None
+        args.repeat = 1  # Repeated by the scheduler
+        exec_func = lambda: do_schedule(jobs, count, args.verbosity)
+    if args.batch:
+        from batch import BatchError, parse_script
+        try:
+            if args.batch == '-':
+                name, lines = '<stdin>', sys.stdin.read().splitlines()
+            else:
+                with open(args.batch, encoding='utf-8') as f:
+                    name, lines = args.batch, f.read().splitlines()
+            steps = parse_script(lines, lambda argv: _batch_command(parser, argv, args.interface), name)
+        except (OSError, BatchError) as ex:
+            parser.error(f'argument --batch: {ex}')
+        exec_func = lambda: do_batch(steps, args.verbosity, json=args.as_json)
     if not exec_func:
         return
 
-    for i in range(args.repeat):
+    recorder = None
+    if args.capture:
+        from capture import Recorder
+        recorder = Recorder(args.capture).install(sys.modules[getWirelessInterfaces.__module__],
+                                                  sys.modules[__name__],
+                                                  winwifi=WinWiFi)
+    if args.profile:
+        _install_profiler()
+    try:
+        _run_repeated(exec_func, args)
+    finally:
+        if args.profile:
+            Profiler.disable()
+            report = Profiler.report(args.profile)
+            Logger.info(f'Profile:{os.linesep}{report}')
+            print(report, file=sys.stderr)
+        if recorder:
+            recorder.uninstall()
+            Logger.info(f'Captured {recorder.count} records to {args.capture}')
+        if scan_flights.per_key():
+            Logger.info(f'Scans: {scan_stats()}')
+        stats = allocation_stats()
+        Logger.info(f'WlanApi handles and allocations: {stats}')
+        if args.verbosity >= 2 or stats['outstanding']:
+            print(f'WlanApi: {stats["handles_opened"]} handles opened, {stats["open_handles"]} open, '
+                  f'{stats["allocations"]} allocations, {stats["outstanding"]} outstanding', file=sys.stderr)
+
+
+def _print_output(output):
+    if output is not None:
+        # Logger.info(output)
+        if isinstance(output, bool):
+            print('Success' if output else 'Error')
+        else:
+            print(output)
+
+
+def _run_repeated(exec_func, args):
+    """
+    Runs <exec_func> <repeat> times, every <interval> seconds (fixed rate, see
+    scheduler.py), returns the output of the last iteration.
+    """
+    from scheduler import FixedRateScheduler
+    scheduler = FixedRateScheduler(on_overrun=lambda job, missed: _report_overrun(job, missed, args.verbosity))
+    outputs = [None]
+
+    def iteration():
+        i = job.runs
         if args.verbosity:
             width = len(str(args.repeat))
             it_str = f'Executing iteration {i+1:>{width}}/{args.repeat}'
             if args.repeat > 1 or args.verbosity >= 2:
                 print(it_str)
             Logger.info(it_str)
-        output = exec_func()
-        if output is not None:
-            # Logger.info(output)
-            if isinstance(output, bool):
-                print('Success' if output else 'Error')
-            else:
-                print(output)
+        outputs[0] = exec_func()
+        _print_output(outputs[0])
         if i < args.repeat-1:
-            do_interval(args.interval, args.verbosity)
+            delay = max(0., job.due + job.period - time.monotonic())  # Of the fixed rate
+            do_interval(delay if args.interval else 0, args.verbosity)
             print('-' * 32)
         Logger.info('=' * 64)
 
+    job = scheduler.add('iteration', args.interval, iteration, count=args.repeat)
+    scheduler.run()
+    return outputs[0]
+
 
 if __name__ == '__main__':
     from datetime import datetime
@@ -0,0 +1,253 @@
+"""
+High frequency sampler of the connection quality.
+
+ConnectionSampler polls the signal quality, RSSI and rx/tx rates of the
+connected BSS of an interface at a fixed rate (e.g. 10-50 Hz) for roaming and
+throughput investigations:
+
+    python pywinwifi.py --sample 20 --sample-duration 60 --sample-file samples.bin
+
+Unlike queryInterface(), which opens a client handle and decodes the whole
+connection into dicts on every call, a sample reuses one client handle and
+the interface GUID and opcode arguments, reads the few needed fields straight
+from the returned buffer and writes them into a preallocated ring buffer of
+SAMPLE structures (and, optionally, appends them to a binary file). Summary
+statistics are kept incrementally.
+
+A sample file is a plain sequence of SAMPLE structures (little endian,
+SAMPLE_SIZE bytes each), see read_samples().
+"""
+import math
+import threading
+import time
+from ctypes import LittleEndianStructure, c_double, c_int32, c_uint8, c_uint16, c_uint32, memmove, sizeof
+
+
+class SAMPLE(LittleEndianStructure):
+    _pack_ = 1
+    _fields_ = [("timestamp", c_double),  # time.time()
+                ("rssi", c_int32),  # dBm
+                ("signalQuality", c_uint32),  # 0-100
+                ("rxRate", c_uint32),  # Kbps
+                ("txRate", c_uint32),  # Kbps
+                ("bssid", c_uint8 * 6),
+                ("state", c_uint16)]  # SAMPLE_* flags
+
+
+SAMPLE_SIZE = sizeof(SAMPLE)
+SAMPLE_CONNECTED = 0x1
+SAMPLE_FAILED = 0x2
+_CONNECTED = 1  # wlan_interface_state_connected
+
+
+def read_samples(path):
+    """Returns the SAMPLE structures of a sample file."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    count = len(data) // SAMPLE_SIZE
+    return list((SAMPLE * count).from_buffer_copy(data[:count * SAMPLE_SIZE]))
+
+
+def bssid_to_str(bssid):
+    return ':'.join('%02X' % b for b in bssid)
+
+
+class _Stat(object):
+    __slots__ = ('count', 'total', 'squares', 'min', 'max')
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0
+        self.squares = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        self.count += 1
+        self.total += value
+        self.squares += value * value
+        if self.min is None or value < self.min:
+            self.min = value
+        if self.max is None or value > self.max:
+            self.max = value
+
+    def to_dict(self):
+        if not self.count:
+            return {'min': None, 'max': None, 'mean': None, 'stdev': None}
+        mean = self.total / self.count
+        variance = max(0., self.squares / self.count - mean * mean)
+        return {'min': self.min, 'max': self.max, 'mean': round(mean, 2), 'stdev': round(math.sqrt(variance), 2)}
+
+
+class ConnectionSampler(object):
+    """
+    Samples the connection of <interface> through the WlanApi functions of
+    <api> (the pywinwifi module).
+
+    :Args:
+     - api:         (module) Provides WlanOpenHandle, WlanQueryInterface, ...
+     - interface:   (WirelessInterface) The sampled interface.
+     - rate:        (float) Samples per second, 0 samples as fast as possible.
+     - capacity:    (int) Number of samples kept in the ring buffer.
+     - output:      (file) Binary file the samples are appended to.
+    """
+    def __init__(self, api, interface, rate=20., capacity=4096, output=None):
+        self.api = api
+        self.interface = interface
+        self.rate = float(rate)
+        self.capacity = int(capacity)
+        self.output = output
+        self.ring = (SAMPLE * self.capacity)()
+        self._slots = [self.ring[i] for i in range(self.capacity)]
+        self._guid = interface.guid
+        # The opcodes of the active backend
+        opcodes = api.WLAN_INTF_OPCODE_DICT_VK
+        self._connection_opcode = api.WLAN_INTF_OPCODE(opcodes['wlan_intf_opcode_current_connection'])
+        self._rssi_opcode = api.WLAN_INTF_OPCODE(opcodes['wlan_intf_opcode_rssi'])
+        self._handle = None
+        self._stop_event = threading.Event()
+        self.count = 0
+        self.failed = 0
+        self.disconnected = 0
+        self.roams = 0
+        self.overruns = 0
+        self.started = None
+        self.stopped = None
+        self.stats = {'rssi': _Stat(), 'signal_quality': _Stat(), 'rx_rate': _Stat(), 'tx_rate': _Stat()}
+        self._last_bssid = (c_uint8 * 6)()
+
+    def __enter__(self):
+        return self.open()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        if self._handle is None:
+            self._handle = self.api.WlanOpenHandle()
+        return self
+
+    def close(self):
+        if self._handle is not None:
+            self.api.WlanCloseHandle(self._handle)
+            self._handle = None
+
+    def stop(self):
+        self._stop_event.set()
+
+    def sample(self):
+        """Takes one sample, returns its (reused) SAMPLE slot."""
+        api = self.api
+        slot = self._slots[self.count % self.capacity]
+        slot.timestamp = time.time()
+        try:
+            result = api.WlanQueryInterface(self._handle, self._guid, self._connection_opcode)
+            try:
+                attributes = result.contents
+                if attributes.isState == _CONNECTED:
+                    aa = attributes.wlanAssociationAttributes
+                    slot.signalQuality = aa.wlanSignalQuality
+                    slot.rxRate = aa.ulRxRate
+                    slot.txRate = aa.ulTxRate
+                    memmove(slot.bssid, aa.dot11Bssid, 6)
+                    slot.state = SAMPLE_CONNECTED
+                else:
+                    slot.state = 0
+            finally:
+                api.WlanFreeMemory(result)
+            if slot.state:
+                result = api.WlanQueryInterface(self._handle, self._guid, self._rssi_opcode)
+                try:
+                    slot.rssi = result.contents.value
+                finally:
+                    api.WlanFreeMemory(result)
+        except Exception:
+            # Typically not connected (any more)
+            slot.state = SAMPLE_FAILED
+        self._account(slot)
+        if self.output is not None:
+            self.output.write(slot)
+        return slot
+
+    def _account(self, slot):
+        self.count += 1
+        if slot.state & SAMPLE_FAILED:
+            self.failed += 1
+            return
+        if not slot.state & SAMPLE_CONNECTED:
+            self.disconnected += 1
+            return
+        stats = self.stats
+        stats['rssi'].add(slot.rssi)
+        stats['signal_quality'].add(slot.signalQuality)
+        stats['rx_rate'].add(slot.rxRate)
+        stats['tx_rate'].add(slot.txRate)
+        if bytes(self._last_bssid) != bytes(slot.bssid):
+            if any(self._last_bssid):
+                self.roams += 1
+            memmove(self._last_bssid, slot.bssid, 6)
+
+    def run(self, duration=None, count=None):
+        """
+        Samples at the fixed rate until stop() is called, <duration> seconds
+        have passed or <count> samples have been taken. Samples that could not
+        be taken in time are skipped (counted as overruns), later samples keep
+        the original schedule.
+        """
+        period = 1. / self.rate if self.rate > 0 else 0.
+        self.open()
+        self.started = time.monotonic()
+        end = self.started + duration if duration else None
+        tick = 0  # Index of the next sample in the schedule, avoids accumulating drift
+        now = self.started
+        try:
+            while not self._stop_event.is_set():
+                if count and self.count >= count:
+                    break
+                now = time.monotonic()
+                if period:
+                    next_time = self.started + tick * period
+                    if now - next_time >= period:
+                        missed = int((now - next_time) / period)
+                        self.overruns += missed
+                        tick += missed
+                        next_time = self.started + tick * period
+                    if end is not None and next_time >= end:
+                        # The sampled period ends with the schedule
+                        now = end
+                        break
+                    if now < next_time:
+                        time.sleep(next_time - now)
+                    tick += 1
+                elif end is not None and now >= end:
+                    break
+                self.sample()
+        finally:
+            self.stopped = max(now, time.monotonic())
+            if self.output is not None:
+                self.output.flush()
+        return self
+
+    def samples(self):
+        """Returns the samples in the ring buffer, oldest first."""
+        if self.count <= self.capacity:
+            return self._slots[:self.count]
+        start = self.count % self.capacity
+        return self._slots[start:] + self._slots[:start]
+
+    def summary(self):
+        elapsed = (self.stopped or time.monotonic()) - self.started if self.started else 0.
+        summary = {
+            'interface': self.interface.description,
+            'samples': self.count,
+            'duration': round(elapsed, 3),
+            'rate': round(self.count / elapsed, 2) if elapsed else None,
+            'target_rate': self.rate or None,
+            'overruns': self.overruns,
+            'failed': self.failed,
+            'disconnected': self.disconnected,
+            'roams': self.roams,
+            'bssid': bssid_to_str(self._last_bssid) if any(self._last_bssid) else None,
+        }
+        summary.update({name: stat.to_dict() for name, stat in self.stats.items()})
+        return summary
@@ -0,0 +1,144 @@
+"""
+Fixed-rate scheduling of commands.
+
+Sleeping a fixed time after every run makes the period drift by the runtime
+of the command: a 4 second scan followed by a 5 second sleep repeats every 9
+seconds. FixedRateScheduler runs any number of jobs, each on its own period,
+in one thread. The n-th run of a job is due at start + offset + n * period on
+the monotonic clock, so neither the runtime of a job nor a late wake-up
+accumulates:
+
+    scheduler = FixedRateScheduler()
+    scheduler.add('status', 2, lambda: do_get_connected_ap())
+    scheduler.add('scan', 30, lambda: do_scan_networks(None))
+    scheduler.run()
+
+Jobs run one at a time, in the order they are due, so a job can start late
+while another one is running (see max_late). A run that ends after the next
+run of its job was due (it ran longer than its period, or started that late)
+is an overrun: the missed runs are skipped, not caught up with, counted and
+reported to <on_overrun>.
+"""
+import threading
+import time
+
+from logger import Logger
+
+
+class Job(object):
+    def __init__(self, name, period, func, count=None, offset=0.):
+        if period < 0:
+            raise ValueError(f'Invalid period: {period}')
+        self.name = name
+        self.period = float(period)
+        self.func = func
+        self.count = count  # Number of runs, None runs until stopped
+        self.offset = float(offset)
+        self.due = None  # Monotonic time of the next run
+        self._tick = 0
+        self.runs = 0
+        self.overruns = 0
+        self.skipped = 0  # Runs missed by the overruns
+        self.errors = 0
+        self.max_late = 0.  # Seconds between due and started
+        self.last_duration = 0.
+        self.max_duration = 0.
+
+    @property
+    def done(self):
+        return self.count is not None and self.runs >= self.count
+
+    def stats(self):
+        return {
+            'period': self.period,
+            'runs': self.runs,
+            'overruns': self.overruns,
+            'skipped': self.skipped,
+            'errors': self.errors,
+            'max_late': round(self.max_late, 3),
+            'last_duration': round(self.last_duration, 3),
+            'max_duration': round(self.max_duration, 3),
+        }
+
+
+class FixedRateScheduler(object):
+    """
+    :Args:
+     - raise_errors:    (bool) Whether an exception raised by a job stops the
+                        scheduler (and is raised by run()), otherwise it is
+                        logged and counted.
+     - on_overrun:      (callable) Called with the job and the number of
+                        skipped runs after an overrun.
+    """
+    def __init__(self, raise_errors=True, on_overrun=None):
+        self.raise_errors = raise_errors
+        self.on_overrun = on_overrun
+        self.jobs = []
+        self.started = None
+        self._stop_event = threading.Event()
+
+    def add(self, name, period, func, count=None, offset=0.):
+        job = Job(name, period, func, count, offset)
+        self.jobs.append(job)
+        return job
+
+    def stop(self):
+        self._stop_event.set()
+
+    def _schedule(self, job, finished):
+        """Sets the time of the next run of <job>, skipping the runs it missed."""
+        if job.done:
+            return
+        if not job.period:
+            job.due = finished  # Back to back
+            return
+        job._tick += 1
+        due = self.started + job.offset + job._tick * job.period
+        if due < finished:
+            missed = int((finished - due) // job.period) + 1
+            job._tick += missed
+            job.overruns += 1
+            job.skipped += missed
+            due += missed * job.period
+            Logger.warning(f'Overrun of {job.name}: ran {job.last_duration:.3f} s, '
+                           f'{missed} run(s) of its {job.period:g} s period skipped')
+            if self.on_overrun is not None:
+                self.on_overrun(job, missed)
+        job.due = due
+
+    def run(self, duration=None):
+        """Runs the jobs until they are done, stopped or for <duration> seconds."""
+        self._stop_event.clear()
+        self.started = time.monotonic()
+        end = None if duration is None else self.started + duration
+        for job in self.jobs:
+            job.due = self.started + job.offset
+        while not self._stop_event.is_set():
+            pending = [job for job in self.jobs if not job.done]
+            if not pending:
+                break
+            job = min(pending, key=lambda j: j.due)  # The first added job on a tie
+            if end is not None and job.due >= end:
+                self._stop_event.wait(max(0., end - time.monotonic()))
+                break
+            delay = job.due - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+            started = time.monotonic()
+            job.max_late = max(job.max_late, started - job.due)
+            try:
+                job.func()
+            except Exception as ex:
+                job.errors += 1
+                if self.raise_errors:
+                    raise
+                Logger.error(f'{job.name} failed: {ex}')
+            finally:
+                finished = time.monotonic()
+                job.runs += 1
+                job.last_duration = finished - started
+                job.max_duration = max(job.max_duration, job.last_duration)
+            self._schedule(job, finished)
+
+    def stats(self):
+        return {job.name: job.stats() for job in self.jobs}
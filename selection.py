@@ -0,0 +1,161 @@
+"""
+Selection of the access point (interface and BSS) to connect to.
+
+Every BSS of the requested SSID, as seen by every interface, is a candidate.
+The candidates are scored on:
+ - the RSSI (dBm) of the BSS, as seen by that interface,
+ - the band (5 GHz preferred over 2.4 GHz),
+ - the channel width (20, 40, 80 or 160 MHz),
+ - the co-channel load: the number of other BSSes (of any SSID) the same
+   interface sees on the primary channel of the candidate.
+
+    selection = select_ap(scan_networks(probe=ssid), ssid)
+    network, bss = selection.best
+
+The scores of all the candidates are computed at once, with NumPy arrays when
+NumPy is installed and with plain lists (same results) otherwise.
+"""
+import collections
+import math
+
+try:
+    import numpy  # Optional, vectorized scoring
+except ImportError:
+    numpy = None
+
+
+# Relative weight of each (normalized, 0-1) criterion
+WEIGHTS = {
+    'rssi': 1.,
+    'band': .15,
+    'width': .1,
+    'load': .3,
+}
+RSSI_FLOOR = -90.  # dBm, scores 0
+RSSI_RANGE = 60.  # dB, -30 dBm scores 1
+
+
+def _interface_key(obj):
+    interface = getattr(obj, 'interface', None)
+    return str(interface.guid) if interface is not None else ''
+
+
+def _columns(networks, ssid):
+    """
+    Returns the candidates (network, bss) and their columns: RSSI, band,
+    width, interface index and primary channel, followed by the interface
+    index and primary channel of every (distinct) BSS seen.
+    """
+    interfaces = {}
+    seen = set()
+    candidates = []
+    rssi, band, width, candidate_interface, candidate_channel = [], [], [], [], []
+    all_interface, all_channel = [], []
+    for network in networks:
+        interface = interfaces.setdefault(_interface_key(network), len(interfaces))
+        for bss in network.bsss:
+            channel = bss.channels[0] if bss.channels else 0
+            if (interface, bss.bssid) not in seen:
+                seen.add((interface, bss.bssid))
+                all_interface.append(interface)
+                all_channel.append(channel)
+            if network.ssid != ssid:
+                continue
+            candidates.append((network, bss))
+            rssi.append(bss.rssi)
+            band.append(1. if bss.band == '5' else 0.)
+            width.append(getattr(bss, 'width', 20))
+            candidate_interface.append(interface)
+            candidate_channel.append(channel)
+    return (candidates, rssi, band, width, candidate_interface, candidate_channel,
+            all_interface, all_channel)
+
+
+def _score_numpy(weights, rssi, band, width, candidate_interface, candidate_channel,
+                 all_interface, all_channel):
+    np = numpy
+    rssi = np.clip((np.asarray(rssi, dtype=float) - RSSI_FLOOR) / RSSI_RANGE, 0., 1.)
+    band = np.asarray(band, dtype=float)
+    width = np.log2(np.maximum(np.asarray(width, dtype=float), 20.) / 20.) / 3.
+    # BSSes per (interface, channel), the candidate itself excluded
+    all_keys = np.asarray(all_interface, dtype=np.int64) * 1024 + np.asarray(all_channel, dtype=np.int64)
+    keys, counts = np.unique(all_keys, return_counts=True)
+    candidate_keys = np.asarray(candidate_interface, dtype=np.int64) * 1024 + \
+        np.asarray(candidate_channel, dtype=np.int64)
+    co_channel = counts[np.searchsorted(keys, candidate_keys)] - 1
+    load = 1. - 1. / (1. + co_channel)
+    scores = weights['rssi'] * rssi + weights['band'] * band + weights['width'] * width - weights['load'] * load
+    return scores.tolist(), co_channel.tolist()
+
+
+def _score_python(weights, rssi, band, width, candidate_interface, candidate_channel,
+                  all_interface, all_channel):
+    counts = collections.Counter(zip(all_interface, all_channel))
+    co_channel = [counts[k] - 1 for k in zip(candidate_interface, candidate_channel)]
+    scores = [weights['rssi'] * min(1., max(0., (r - RSSI_FLOOR) / RSSI_RANGE)) +
+              weights['band'] * b +
+              weights['width'] * math.log2(max(w, 20) / 20.) / 3. -
+              weights['load'] * (1. - 1. / (1. + c))
+              for r, b, w, c in zip(rssi, band, width, co_channel)]
+    return scores, co_channel
+
+
+class Selection(object):
+    """
+    The scored candidates for an SSID, best first. <best> is the (network,
+    bss) tuple of the best candidate, or None without candidates.
+    """
+    def __init__(self, ssid, candidates, scores, co_channel):
+        self.ssid = ssid
+        order = sorted(range(len(candidates)), key=lambda i: -scores[i])
+        self._candidates = [candidates[i] for i in order]
+        self.scores = [scores[i] for i in order]
+        self.co_channel = [co_channel[i] for i in order]
+
+    def __len__(self):
+        return len(self._candidates)
+
+    @property
+    def best(self):
+        return self._candidates[0] if self._candidates else None
+
+    def candidates(self):
+        """Returns the candidates as dicts, best first."""
+        candidates = []
+        for (network, bss), score, co_channel in zip(self._candidates, self.scores, self.co_channel):
+            interface = getattr(network, 'interface', None)
+            candidates.append({
+                'interface': interface.description if interface is not None else None,
+                'guid': str(interface.guid) if interface is not None else None,
+                'bssid': bss.bssid,
+                'band': bss.band,
+                'channels': list(bss.channels),
+                'width': getattr(bss, 'width', 20),
+                'rssi': bss.rssi,
+                'co_channel': co_channel,
+                'score': round(score, 4),
+            })
+        return candidates
+
+    def to_dict(self):
+        candidates = self.candidates()
+        return {
+            'ssid': self.ssid,
+            'selected': candidates[0] if candidates else None,
+            'candidates': candidates,
+        }
+
+
+def select_ap(networks, ssid, weights=None):
+    """
+    Scores the BSSes of <ssid> among <networks> (as returned by
+    scan_networks(), tagged with their interface) and returns the Selection.
+    """
+    weights = dict(WEIGHTS, **(weights or {}))
+    columns = _columns(networks, ssid)
+    candidates = columns[0]
+    if not candidates:
+        return Selection(ssid, [], [], [])
+    score = _score_numpy if numpy is not None else _score_python
+    scores, co_channel = score(weights, *columns[1:])
+    return Selection(ssid, candidates, scores, co_channel)
@@ -0,0 +1,78 @@
+"""
+Single-flight execution of concurrent calls.
+
+Scans started at the same time on one interface interfere with each other:
+the driver aborts or serializes them and every scan takes longer. A
+SingleFlight runs at most one call per key at a time. Callers arriving while
+the call of their key is in flight do not call anything, they wait for that
+call and share its result (or its exception):
+
+    scans = SingleFlight()
+    scans.do(guid, lambda: scan(interface))
+
+Results are not cached: a caller arriving after the call completed starts a
+new one.
+"""
+import threading
+
+
+class _Flight(object):
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight(object):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._flights = {}  # key -> _Flight in progress
+        self._counts = {}  # key -> [issued, coalesced]
+
+    def do(self, key, func):
+        """Calls <func>, unless a call of <key> is in flight: then returns (or raises) the outcome of that call."""
+        with self._lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            self._counts.setdefault(key, [0, 0])[0 if leader else 1] += 1
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.result
+        try:
+            flight.result = func()
+            return flight.result
+        except BaseException as ex:
+            flight.error = ex
+            raise
+        finally:
+            with self._lock:
+                del self._flights[key]
+            flight.done.set()
+
+    def in_flight(self, key):
+        return key in self._flights
+
+    def stats(self, key=None):
+        """
+        Returns the calls issued and coalesced (joined a call in flight), of
+        every key or of <key> only, and the calls currently in flight.
+        """
+        with self._lock:
+            counts = [self._counts.get(key, [0, 0])] if key is not None else list(self._counts.values())
+            in_flight = int(key in self._flights) if key is not None else len(self._flights)
+        return {
+            'issued': sum(c[0] for c in counts),
+            'coalesced': sum(c[1] for c in counts),
+            'in_flight': in_flight,
+        }
+
+    def per_key(self):
+        """Returns the key -> {'issued', 'coalesced'} dict."""
+        with self._lock:
+            return {key: {'issued': c[0], 'coalesced': c[1]} for key, c in self._counts.items()}
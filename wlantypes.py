@@ -0,0 +1,546 @@
+"""
+Portable definitions of the Native Wifi constants and buffer layouts.
+
+The structures mirror the ones in win32wifi.Win32NativeWifiApi (same field
+names), but only use fixed-width little-endian types, so raw WlanApi buffers
+can be built, stored and decoded on any platform. The WlanConnect
+parameters, never stored, keep the native types.
+"""
+import uuid
+from ctypes import *
+from ctypes.wintypes import DWORD, LPCWSTR
+from enum import Enum
+
+
+DOT11_SSID_MAX_LENGTH = 32
+DOT11_BSSID_LIST_REVISION_1 = 1
+NDIS_OBJECT_TYPE_DEFAULT = 0x80
+DOT11_RATE_SET_MAX_LENGTH = 126
+WLAN_MAX_NAME_LENGTH = 256
+WLAN_MAX_PHY_TYPE_NUMBER = 8
+
+WLAN_INTERFACE_STATE_DICT = {0: "wlan_interface_state_not_ready",
+                             1: "wlan_interface_state_connected",
+                             2: "wlan_interface_state_ad_hoc_network_formed",
+                             3: "wlan_interface_state_disconnecting",
+                             4: "wlan_interface_state_disconnected",
+                             5: "wlan_interface_state_associating",
+                             6: "wlan_interface_state_discovering",
+                             7: "wlan_interface_state_authenticating"}
+
+DOT11_BSS_TYPE = c_uint
+DOT11_BSS_TYPE_DICT_KV = {1: "dot11_BSS_type_infrastructure",
+                          2: "dot11_BSS_type_independent",
+                          3: "dot11_BSS_type_any"}
+DOT11_BSS_TYPE_DICT_VK = {v: k for k, v in DOT11_BSS_TYPE_DICT_KV.items()}
+
+DOT11_PHY_TYPE_DICT = {0: "dot11_phy_type_unknown",
+                       1: "dot11_phy_type_fhss",
+                       2: "dot11_phy_type_dsss",
+                       3: "dot11_phy_type_irbaseband",
+                       4: "dot11_phy_type_ofdm",
+                       5: "dot11_phy_type_hrdsss",
+                       6: "dot11_phy_type_erp",
+                       7: "dot11_phy_type_ht",
+                       8: "dot11_phy_type_vht",
+                       0x80000000: "dot11_phy_type_IHV_start",
+                       0xffffffff: "dot11_phy_type_IHV_end"}
+
+DOT11_AUTH_ALGORITHM_DICT = {1: "DOT11_AUTH_ALGO_80211_OPEN",
+                             2: "DOT11_AUTH_ALGO_80211_SHARED_KEY",
+                             3: "DOT11_AUTH_ALGO_WPA",
+                             4: "DOT11_AUTH_ALGO_WPA_PSK",
+                             5: "DOT11_AUTH_ALGO_WPA_NONE",
+                             6: "DOT11_AUTH_ALGO_RSNA",
+                             7: "DOT11_AUTH_ALGO_RSNA_PSK",
+                             0x80000000: "DOT11_AUTH_ALGO_IHV_START",
+                             0xffffffff: "DOT11_AUTH_ALGO_IHV_END"}
+
+DOT11_CIPHER_ALGORITHM_DICT = {0x00: "DOT11_CIPHER_ALGO_NONE",
+                               0x01: "DOT11_CIPHER_ALGO_WEP40",
+                               0x02: "DOT11_CIPHER_ALGO_TKIP",
+                               0x04: "DOT11_CIPHER_ALGO_CCMP",
+                               0x05: "DOT11_CIPHER_ALGO_WEP104",
+                               0x100: "DOT11_CIPHER_ALGO_RSN_USE_GROUP",
+                               0x101: "DOT11_CIPHER_ALGO_WEP",
+                               0x80000000: "DOT11_CIPHER_ALGO_IHV_START",
+                               0xffffffff: "DOT11_CIPHER_ALGO_IHV_END"}
+
+WLAN_CONNECTION_MODE = c_uint
+WLAN_CONNECTION_MODE_KV = {0: "wlan_connection_mode_profile",
+                           1: "wlan_connection_mode_temporary_profile",
+                           2: "wlan_connection_mode_discovery_secure",
+                           3: "wlan_connection_mode_discovery_unsecure",
+                           4: "wlan_connection_mode_auto",
+                           5: "wlan_connection_mode_invalid"}
+WLAN_CONNECTION_MODE_VK = {v: k for k, v in WLAN_CONNECTION_MODE_KV.items()}
+
+WLAN_NOTIFICATION_SOURCE_NONE = 0x0000
+WLAN_NOTIFICATION_SOURCE_ONEX = 0x0004
+WLAN_NOTIFICATION_SOURCE_ACM = 0x0008
+WLAN_NOTIFICATION_SOURCE_MSM = 0x0010
+WLAN_NOTIFICATION_SOURCE_SECURITY = 0x0020
+WLAN_NOTIFICATION_SOURCE_IHV = 0x0040
+WLAN_NOTIFICATION_SOURCE_HNWK = 0x0080
+WLAN_NOTIFICATION_SOURCE_ALL = 0xffff
+
+WLAN_NOTIFICATION_SOURCE_DICT = {
+    WLAN_NOTIFICATION_SOURCE_NONE:      "WLAN_NOTIFICATION_SOURCE_NONE",
+    WLAN_NOTIFICATION_SOURCE_ONEX:      "WLAN_NOTIFICATION_SOURCE_ONEX",
+    WLAN_NOTIFICATION_SOURCE_ACM:       "WLAN_NOTIFICATION_SOURCE_ACM",
+    WLAN_NOTIFICATION_SOURCE_MSM:       "WLAN_NOTIFICATION_SOURCE_MSM",
+    WLAN_NOTIFICATION_SOURCE_SECURITY:  "WLAN_NOTIFICATION_SOURCE_SECURITY",
+    WLAN_NOTIFICATION_SOURCE_IHV:       "WLAN_NOTIFICATION_SOURCE_IHV",
+    WLAN_NOTIFICATION_SOURCE_HNWK:      "WLAN_NOTIFICATION_SOURCE_HNWK",
+    WLAN_NOTIFICATION_SOURCE_ALL:       "WLAN_NOTIFICATION_SOURCE_ALL",
+}
+
+
+class ONEX_NOTIFICATION_TYPE_ENUM(Enum):
+    OneXPublicNotificationBase          = 0
+    OneXNotificationTypeResultUpdate    = 1
+    OneXNotificationTypeAuthRestarted   = 2
+    OneXNotificationTypeEventInvalid    = 3
+    OneXNumNotifications                = OneXNotificationTypeEventInvalid
+
+
+class WLAN_NOTIFICATION_ACM_ENUM(Enum):
+    wlan_notification_acm_start                         = 0
+    wlan_notification_acm_autoconf_enabled              = 1
+    wlan_notification_acm_autoconf_disabled             = 2
+    wlan_notification_acm_background_scan_enabled       = 3
+    wlan_notification_acm_background_scan_disabled      = 4
+    wlan_notification_acm_bss_type_change               = 5
+    wlan_notification_acm_power_setting_change          = 6
+    wlan_notification_acm_scan_complete                 = 7
+    wlan_notification_acm_scan_fail                     = 8
+    wlan_notification_acm_connection_start              = 9
+    wlan_notification_acm_connection_complete           = 10
+    wlan_notification_acm_connection_attempt_fail       = 11
+    wlan_notification_acm_filter_list_change            = 12
+    wlan_notification_acm_interface_arrival             = 13
+    wlan_notification_acm_interface_removal             = 14
+    wlan_notification_acm_profile_change                = 15
+    wlan_notification_acm_profile_name_change           = 16
+    wlan_notification_acm_profiles_exhausted            = 17
+    wlan_notification_acm_network_not_available         = 18
+    wlan_notification_acm_network_available             = 19
+    wlan_notification_acm_disconnecting                 = 20
+    wlan_notification_acm_disconnected                  = 21
+    wlan_notification_acm_adhoc_network_state_change    = 22
+    wlan_notification_acm_profile_unblocked             = 23
+    wlan_notification_acm_screen_power_change           = 24
+    wlan_notification_acm_profile_blocked               = 25
+    wlan_notification_acm_scan_list_refresh             = 26
+    wlan_notification_acm_end                           = 27
+
+
+class WLAN_NOTIFICATION_MSM_ENUM(Enum):
+    wlan_notification_msm_start                         = 0
+    wlan_notification_msm_associating                   = 1
+    wlan_notification_msm_associated                    = 2
+    wlan_notification_msm_authenticating                = 3
+    wlan_notification_msm_connected                     = 4
+    wlan_notification_msm_roaming_start                 = 5
+    wlan_notification_msm_roaming_end                   = 6
+    wlan_notification_msm_radio_state_change            = 7
+    wlan_notification_msm_signal_quality_change         = 8
+    wlan_notification_msm_disassociating                = 9
+    wlan_notification_msm_disconnected                  = 10
+    wlan_notification_msm_peer_join                     = 11
+    wlan_notification_msm_peer_leave                    = 12
+    wlan_notification_msm_adapter_removal               = 13
+    wlan_notification_msm_adapter_operation_mode_change = 14
+    wlan_notification_msm_end                           = 15
+
+
+class WLAN_HOSTED_NETWORK_NOTIFICATION_CODE_ENUM(Enum):
+    wlan_hosted_network_state_change        = 4096
+    wlan_hosted_network_peer_state_change   = 4097
+    wlan_hosted_network_radio_state_change  = 4098
+
+WLAN_INTF_OPCODE = c_uint32
+
+WLAN_INTF_OPCODE_DICT = {
+    0x000000000: "wlan_intf_opcode_autoconf_start",
+    1: "wlan_intf_opcode_autoconf_enabled",
+    2: "wlan_intf_opcode_background_scan_enabled",
+    3: "wlan_intf_opcode_media_streaming_mode",
+    4: "wlan_intf_opcode_radio_state",
+    5: "wlan_intf_opcode_bss_type",
+    6: "wlan_intf_opcode_interface_state",
+    7: "wlan_intf_opcode_current_connection",
+    8: "wlan_intf_opcode_channel_number",
+    0x10000101: "wlan_intf_opcode_statistics",  # wlan_intf_opcode_msm_start + 1
+    0x10000102: "wlan_intf_opcode_rssi",  # wlan_intf_opcode_msm_start + 2
+}
+
+WLAN_INTF_OPCODE_DICT_VK = {v: k for k, v in WLAN_INTF_OPCODE_DICT.items()}
+
+
+class GUID(LittleEndianStructure):
+    """
+        typedef struct _GUID {
+            unsigned long  Data1;
+            unsigned short Data2;
+            unsigned short Data3;
+            unsigned char  Data4[8];
+        } GUID;
+    """
+    _fields_ = [("Data1", c_uint32),
+                ("Data2", c_uint16),
+                ("Data3", c_uint16),
+                ("Data4", c_uint8 * 8)]
+
+    def __init__(self, name=None):
+        super().__init__()
+        if name is not None:
+            memmove(addressof(self), uuid.UUID(str(name)).bytes_le, sizeof(self))
+
+    def __str__(self):
+        return '{%s}' % str(uuid.UUID(bytes_le=bytes(self))).upper()
+
+    def __repr__(self):
+        return f'GUID("{self}")'
+
+    def __eq__(self, other):
+        if isinstance(other, GUID):
+            return bytes(self) == bytes(other)
+        return str(self) == str(other)
+
+    def __hash__(self):
+        return hash(str(self))
+
+
+DOT11_MAC_ADDRESS = c_uint8 * 6
+WCHAR_ARRAY = c_uint16 * WLAN_MAX_NAME_LENGTH
+
+
+class DOT11_SSID(LittleEndianStructure):
+    _fields_ = [("SSIDLength", c_uint32),
+                ("SSID", c_char * DOT11_SSID_MAX_LENGTH)]
+
+
+class WLAN_RATE_SET(LittleEndianStructure):
+    _fields_ = [("RateSetLength", c_uint32),
+                ("RateSet", c_uint16 * DOT11_RATE_SET_MAX_LENGTH)]
+
+
+class WLAN_INTERFACE_INFO(LittleEndianStructure):
+    _fields_ = [("InterfaceGuid", GUID),
+                ("strInterfaceDescription", WCHAR_ARRAY),
+                ("isState", c_uint32)]
+
+
+class WLAN_INTERFACE_INFO_LIST(LittleEndianStructure):
+    _fields_ = [("NumberOfItems", c_uint32),
+                ("Index", c_uint32),
+                ("InterfaceInfo", WLAN_INTERFACE_INFO * 1)]
+
+
+class WLAN_BSS_ENTRY(LittleEndianStructure):
+    # 'InRegDomain' is a one byte BOOLEAN, which does not change the layout
+    # compared to the (four byte) BOOL used by win32wifi.
+    _fields_ = [("dot11Ssid", DOT11_SSID),
+                ("PhyId", c_uint32),
+                ("dot11Bssid", DOT11_MAC_ADDRESS),
+                ("dot11BssType", c_uint32),
+                ("dot11BssPhyType", c_uint32),
+                ("Rssi", c_int32),
+                ("LinkQuality", c_uint32),
+                ("InRegDomain", c_uint8),
+                ("BeaconPeriod", c_uint16),
+                ("Timestamp", c_uint64),
+                ("HostTimestamp", c_uint64),
+                ("CapabilityInformation", c_uint16),
+                ("ChCenterFrequency", c_uint32),
+                ("wlanRateSet", WLAN_RATE_SET),
+                ("IeOffset", c_uint32),
+                ("IeSize", c_uint32)]
+
+
+class WLAN_BSS_LIST(LittleEndianStructure):
+    _fields_ = [("TotalSize", c_uint32),
+                ("NumberOfItems", c_uint32),
+                ("wlanBssEntries", WLAN_BSS_ENTRY * 1)]
+
+
+class WLAN_AVAILABLE_NETWORK(LittleEndianStructure):
+    _fields_ = [("ProfileName", WCHAR_ARRAY),
+                ("dot11Ssid", DOT11_SSID),
+                ("dot11BssType", c_uint32),
+                ("NumberOfBssids", c_uint32),
+                ("NetworkConnectable", c_int32),
+                ("wlanNotConnectableReason", c_uint32),
+                ("NumberOfPhyTypes", c_uint32),
+                ("dot11PhyTypes", c_uint32 * WLAN_MAX_PHY_TYPE_NUMBER),
+                ("MorePhyTypes", c_int32),
+                ("wlanSignalQuality", c_uint32),
+                ("SecurityEnabled", c_int32),
+                ("dot11DefaultAuthAlgorithm", c_uint32),
+                ("dot11DefaultCipherAlgorithm", c_uint32),
+                ("Flags", c_uint32),
+                ("Reserved", c_uint32)]
+
+
+class WLAN_AVAILABLE_NETWORK_LIST(LittleEndianStructure):
+    _fields_ = [("NumberOfItems", c_uint32),
+                ("Index", c_uint32),
+                ("Network", WLAN_AVAILABLE_NETWORK * 1)]
+
+
+class WLAN_PROFILE_INFO(LittleEndianStructure):
+    _fields_ = [("ProfileName", WCHAR_ARRAY),
+                ("Flags", c_uint32)]
+
+
+class WLAN_PROFILE_INFO_LIST(LittleEndianStructure):
+    _fields_ = [("NumberOfItems", c_uint32),
+                ("Index", c_uint32),
+                ("ProfileInfo", WLAN_PROFILE_INFO * 1)]
+
+
+class WLAN_NOTIFICATION_DATA(Structure):
+    # Only used in-process, pData is a native pointer
+    _fields_ = [("NotificationSource", c_uint32),
+                ("NotificationCode", c_uint32),
+                ("InterfaceGuid", GUID),
+                ("dwDataSize", c_uint32),
+                ("pData", c_void_p)]
+
+
+class WLAN_MSM_NOTIFICATION_DATA(LittleEndianStructure):
+    _fields_ = [("wlanConnectionMode", c_uint32),
+                ("strProfileName", WCHAR_ARRAY),
+                ("dot11Ssid", DOT11_SSID),
+                ("dot11BssType", c_uint32),
+                ("dot11MacAddr", DOT11_MAC_ADDRESS),
+                ("bSecurityEnabled", c_int32),
+                ("bFirstPeer", c_int32),
+                ("bLastPeer", c_int32),
+                ("wlanReasonCode", c_uint32)]
+
+
+class WLAN_CONNECTION_NOTIFICATION_DATA(LittleEndianStructure):
+    _fields_ = [("wlanConnectionMode", c_uint32),
+                ("strProfileName", WCHAR_ARRAY),
+                ("dot11Ssid", DOT11_SSID),
+                ("dot11BssType", c_uint32),
+                ("bSecurityEnabled", c_int32),
+                ("wlanReasonCode", c_uint32),
+                ("dwFlags", c_uint32),
+                ("strProfileXml", c_uint16 * 1)]
+
+
+class WLAN_ASSOCIATION_ATTRIBUTES(LittleEndianStructure):
+    _fields_ = [("dot11Ssid", DOT11_SSID),
+                ("dot11BssType", c_uint32),
+                ("dot11Bssid", DOT11_MAC_ADDRESS),
+                ("dot11PhyType", c_uint32),
+                ("uDot11PhyIndex", c_uint32),
+                ("wlanSignalQuality", c_uint32),
+                ("ulRxRate", c_uint32),
+                ("ulTxRate", c_uint32)]
+
+
+class WLAN_SECURITY_ATTRIBUTES(LittleEndianStructure):
+    _fields_ = [("bSecurityEnabled", c_int32),
+                ("bOneXEnabled", c_int32),
+                ("dot11AuthAlgorithm", c_uint32),
+                ("dot11CipherAlgorithm", c_uint32)]
+
+
+class WLAN_CONNECTION_ATTRIBUTES(LittleEndianStructure):
+    _fields_ = [("isState", c_uint32),
+                ("wlanConnectionMode", c_uint32),
+                ("strProfileName", WCHAR_ARRAY),
+                ("wlanAssociationAttributes", WLAN_ASSOCIATION_ATTRIBUTES),
+                ("wlanSecurityAttributes", WLAN_SECURITY_ATTRIBUTES)]
+
+
+class NDIS_OBJECT_HEADER(Structure):
+    _fields_ = [("Type", c_char),
+                ("Revision", c_char),
+                ("Size", c_ushort)]
+
+
+class DOT11_BSSID_LIST(Structure):
+    _fields_ = [("Header", NDIS_OBJECT_HEADER),
+                ("uNumOfEntries", c_ulong),
+                ("uTotalNumOfEntries", c_ulong),
+                ("BSSIDs", DOT11_MAC_ADDRESS * 1)]
+
+
+class WLAN_CONNECTION_PARAMETERS(Structure):
+    # Only used in-process, named (pDot11_ssid included) and typed after win32wifi
+    _fields_ = [("wlanConnectionMode", WLAN_CONNECTION_MODE),
+                ("strProfile", LPCWSTR),
+                ("pDot11_ssid", POINTER(DOT11_SSID)),
+                ("pDesiredBssidList", POINTER(DOT11_BSSID_LIST)),
+                ("dot11BssType", DOT11_BSS_TYPE),
+                ("dwFlags", DWORD)]
+
+
+# Offset of the first item in every WLAN_*_LIST buffer (two DWORD headers)
+LIST_HEADER_SIZE = 8
+
+# Data type of each notification code (None: no data), the codes missing from the native
+# dictionaries are missing here too
+WLAN_NOTIFICATION_DATA_MSM_TYPES_DICT = {
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_associating: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_associated: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_authenticating: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_connected: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_roaming_start: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_roaming_end: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_radio_state_change: None,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_signal_quality_change: c_uint32,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_disassociating: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_disconnected: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_peer_join: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_peer_leave: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_adapter_removal: WLAN_MSM_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_MSM_ENUM.wlan_notification_msm_adapter_operation_mode_change: c_uint32,
+}
+
+WLAN_NOTIFICATION_DATA_ACM_TYPES_DICT = {
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_autoconf_enabled: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_autoconf_disabled: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_background_scan_enabled: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_background_scan_disabled: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_bss_type_change: c_uint32,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_power_setting_change: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_scan_complete: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_scan_fail: c_uint32,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_connection_start: WLAN_CONNECTION_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_connection_complete: WLAN_CONNECTION_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_connection_attempt_fail: WLAN_CONNECTION_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_filter_list_change: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_interface_arrival: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_interface_removal: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_profile_change: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_profile_name_change: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_profiles_exhausted: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_network_not_available: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_network_available: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_disconnecting: WLAN_CONNECTION_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_disconnected: WLAN_CONNECTION_NOTIFICATION_DATA,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_adhoc_network_state_change: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_profile_unblocked: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_screen_power_change: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_profile_blocked: None,
+    WLAN_NOTIFICATION_ACM_ENUM.wlan_notification_acm_scan_list_refresh: None,
+}
+
+
+def wchar_to_str(wchars):
+    return bytes(wchars).decode('utf-16-le', 'replace').split('\0', 1)[0]
+
+
+def str_to_wchar(s, length=WLAN_MAX_NAME_LENGTH):
+    data = (s or '').encode('utf-16-le')[:(length - 1) * 2]
+    return (c_uint16 * length).from_buffer_copy(data.ljust(length * 2, b'\0'))
+
+
+def make_ssid(ssid):
+    if isinstance(ssid, str):
+        ssid = ssid.encode('utf-8')
+    ssid = ssid[:DOT11_SSID_MAX_LENGTH]
+    return DOT11_SSID(len(ssid), ssid)
+
+
+def make_mac_address(mac):
+    if isinstance(mac, str):
+        mac = [int(b, 16) for b in mac.split(':')]
+    return DOT11_MAC_ADDRESS(*mac)
+
+
+def _writable(buffer):
+    if isinstance(buffer, bytearray):
+        return buffer
+    return bytearray(buffer)
+
+
+def _pack_list(header, items, item_type):
+    data = bytearray(header)
+    for item in items:
+        assert isinstance(item, item_type)
+        data += bytes(item)
+    return data
+
+
+def pack_interface_info_list(infos):
+    """Builds a WLAN_INTERFACE_INFO_LIST buffer."""
+    header = len(infos).to_bytes(4, 'little') + (0).to_bytes(4, 'little')
+    return bytes(_pack_list(header, infos, WLAN_INTERFACE_INFO))
+
+
+def pack_available_network_list(networks):
+    """Builds a WLAN_AVAILABLE_NETWORK_LIST buffer."""
+    header = len(networks).to_bytes(4, 'little') + (0).to_bytes(4, 'little')
+    return bytes(_pack_list(header, networks, WLAN_AVAILABLE_NETWORK))
+
+
+def pack_profile_info_list(infos):
+    """Builds a WLAN_PROFILE_INFO_LIST buffer."""
+    header = len(infos).to_bytes(4, 'little') + (0).to_bytes(4, 'little')
+    return bytes(_pack_list(header, infos, WLAN_PROFILE_INFO))
+
+
+def pack_bss_list(entries):
+    """
+    Builds a WLAN_BSS_LIST buffer.
+
+    :Args:
+     - entries: (list) Tuples of (WLAN_BSS_ENTRY, information element blob).
+                Like the WlanApi does, the blobs are stored after the entry
+                array and referenced through each entry's IeOffset/IeSize.
+    """
+    entry_size = sizeof(WLAN_BSS_ENTRY)
+    blob_offset = LIST_HEADER_SIZE + len(entries) * entry_size
+    blobs = bytearray()
+    data = bytearray(LIST_HEADER_SIZE)
+    for idx, (entry, blob) in enumerate(entries):
+        entry_offset = LIST_HEADER_SIZE + idx * entry_size
+        entry.IeOffset = blob_offset + len(blobs) - entry_offset
+        entry.IeSize = len(blob)
+        data += bytes(entry)
+        blobs += blob
+        blobs += bytes(-len(blobs) % 8)  # Keep the blobs 8-byte aligned
+    data += blobs
+    data[0:4] = len(data).to_bytes(4, 'little')
+    data[4:8] = len(entries).to_bytes(4, 'little')
+    return bytes(data)
+
+
+def list_size(list_pointer):
+    """
+    Returns the size (bytes) of the WLAN_*_LIST structure <list_pointer>
+    points to, including all of its items.
+    """
+    contents = list_pointer.contents
+    if hasattr(contents, 'TotalSize'):
+        return contents.TotalSize
+    _, item_array_type = contents._fields_[-1]
+    return LIST_HEADER_SIZE + contents.NumberOfItems * sizeof(item_array_type._type_)
+
+
+def list_count(buffer, bss_list=False):
+    """Returns the number of items of a WLAN_*_LIST buffer."""
+    offset = 4 if bss_list else 0
+    return int.from_bytes(bytes(buffer[offset:offset+4]), 'little')
+
+
+def unpack_list(buffer, item_type, bss_list=False):
+    """
+    Returns a ctypes array of <item_type> structures viewing the items of a
+    WLAN_*_LIST buffer. Immutable buffers are copied first.
+    """
+    buffer = _writable(buffer)
+    count = list_count(buffer, bss_list=bss_list)
+    return (item_type * count).from_buffer(buffer, LIST_HEADER_SIZE)
+
+
+def information_elements_blob(bss_entry):
+    """Returns the raw information element bytes of a WLAN_BSS_ENTRY view."""
+    return string_at(addressof(bss_entry) + bss_entry.IeOffset, bss_entry.IeSize)